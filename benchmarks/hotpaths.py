@@ -0,0 +1,262 @@
+"""
+Benchmarks of the hot paths: rolling dice, moving a player, moving
+a board, building roll matrices as the board grows, and importing
+the package. Results are saved to a JSON baseline, and later runs can
+be compared against it to catch slowdowns; benchmarks that look
+slower are run again before they count, since a busy machine slows
+down whole runs. Run from the top of the repository with
+
+    python benchmarks/hotpaths.py --save benchmarks/baseline.json
+    python benchmarks/hotpaths.py --compare benchmarks/baseline.json
+
+or through pytest, which compares against the baseline if there is one:
+
+    pytest benchmarks/hotpaths.py
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+from startup import IMPORT_SNIPPET, time_snippet
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS))
+import monopolymath as mm
+
+BASELINE_PATH = os.path.join(BENCHMARKS, "baseline.json")
+#Fractional slowdown allowed before a benchmark counts as a regression;
+#timings on shared machines vary by about a quarter from run to run
+TOLERANCE = 0.5
+#The import starts a fresh interpreter each run, and varies more
+IMPORT_TOLERANCE = 1.
+#Board sizes the roll matrix is built for
+ROLL_MATRIX_SIZES = [40, 400, 4000]
+#Each timed run lasts at least this long, in seconds, so that short
+#calls are not lost to the clock and the odd interruption
+MINIMUM_RUN_TIME = 0.05
+
+def best_time(function, number=1, repeats=9) -> float:
+    """
+    The best time of `repeats` runs of `number` calls of a function,
+    which is the least disturbed by other work on the machine. More
+    calls are made per run if `number` take less than
+    `MINIMUM_RUN_TIME`.
+
+    Returns:
+        float: seconds per call
+    """
+    start = time.perf_counter()
+    for _ in range(number):
+        function()
+    elapsed = time.perf_counter() - start
+    if elapsed < MINIMUM_RUN_TIME:
+        number = int(np.ceil(number*MINIMUM_RUN_TIME/max(elapsed, 1e-9)))
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append(time.perf_counter() - start)
+    return min(times)/number
+
+def _result(value, unit, higher_is_better, tolerance=None) -> dict:
+    result = {"value": float(value), "unit": unit,
+              "higher_is_better": higher_is_better}
+    if tolerance is not None:
+        result["tolerance"] = tolerance
+    return result
+
+def bench_diceroller_roll(number=20000) -> dict:
+    dr = mm.DiceRoller(rng=np.random.default_rng(0))
+    return _result(1./best_time(dr.roll, number), "rolls/s", True)
+
+def bench_diceroller_roll_buffered(number=20000) -> dict:
+    dr = mm.DiceRoller(rng=np.random.default_rng(0), buffer_size=4096)
+    return _result(1./best_time(dr.roll, number), "rolls/s", True)
+
+def bench_rollmover_update_position(number=20000) -> dict:
+    mr = mm.MonopolyRollMover(mm.DiceRoller(rng=np.random.default_rng(0)))
+    return _result(1./best_time(lambda: mr.update_position(0), number),
+                   "moves/s", True)
+
+def bench_move_player(number=5000, via_roll=True) -> dict:
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    mb.diceroller.rng = np.random.default_rng(0)
+    return _result(1./best_time(lambda: mb.move_player(via_roll), number),
+                   "moves/s", True)
+
+def bench_batch_mover(number_of_players=10000, number_of_turns=20) -> dict:
+    mover = mm.BatchRollMover(mm.DiceRoller(), number_of_players,
+                              rng=np.random.default_rng(0))
+    seconds = best_time(lambda: mover.run(number_of_turns))
+    return _result(number_of_players*number_of_turns/seconds, "moves/s",
+                   True)
+
+def bench_compute_roll_matrix(number_of_spaces: int) -> dict:
+    dr = mm.DiceRoller()
+    if number_of_spaces == 40:
+        mb = mm.MonopolyBoard()
+        mb.diceroller = dr
+        seconds = best_time(mb._compute_roll_matrix, 200)
+    else:
+        board = mm.board.Board(number_of_spaces)
+        seconds = best_time(lambda: board.compute_roll_matrix(dr), 10)
+    return _result(seconds*1e3, "ms", False)
+
+def bench_import(runs=10) -> dict:
+    return _result(np.median(time_snippet(IMPORT_SNIPPET, runs))*1e3, "ms",
+                   False, IMPORT_TOLERANCE)
+
+def _benchmarks() -> dict:
+    benchmarks = {"diceroller_roll": bench_diceroller_roll,
+                  "diceroller_roll_buffered": bench_diceroller_roll_buffered,
+                  "rollmover_update_position":
+                  bench_rollmover_update_position,
+                  "move_player_via_roll":
+                  lambda: bench_move_player(via_roll=True),
+                  "move_player_via_matrix":
+                  lambda: bench_move_player(via_roll=False),
+                  "batch_mover": bench_batch_mover}
+    for N in ROLL_MATRIX_SIZES:
+        benchmarks["compute_roll_matrix_%d"%N] = \
+            lambda N=N: bench_compute_roll_matrix(N)
+    benchmarks["import_monopolymath"] = bench_import
+    return benchmarks
+
+def run_benchmarks(names=None) -> dict:
+    """
+    Run every benchmark, or some of them.
+
+    Args:
+        names (list of str): the benchmarks to run; all if None
+
+    Returns:
+        dict: the result of each benchmark by name, with its "value",
+            "unit" and whether higher is better
+    """
+    benchmarks = _benchmarks()
+    if names is None:
+        names = list(benchmarks)
+    return {name: benchmarks[name]() for name in names}
+
+def _better(result, other) -> dict:
+    if result["higher_is_better"] == (other["value"] > result["value"]):
+        return other
+    return result
+
+def save_baseline(results: dict, path=BASELINE_PATH) -> None:
+    """
+    Save benchmark results, with a note of the machine they ran on.
+    """
+    baseline = {"machine": {"python": platform.python_version(),
+                            "numpy": np.__version__,
+                            "platform": platform.platform(),
+                            "processor": platform.processor()},
+                "results": results}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+    return
+
+def compare(results: dict, baseline: dict, tolerance=TOLERANCE) -> list:
+    """
+    Compare results against a baseline. Benchmarks missing from
+    either side are ignored.
+
+    Args:
+        results (dict): results of `run_benchmarks()`
+        baseline (dict): saved results of `run_benchmarks()`
+        tolerance (float): fractional slowdown allowed, unless a
+            benchmark allows more
+
+    Returns:
+        list: (name, value, baseline value, ratio, regressed) for
+            every benchmark in both, where the ratio is above one
+            when the result is faster than the baseline
+    """
+    rows = []
+    for name in sorted(set(results) & set(baseline)):
+        value = results[name]["value"]
+        reference = baseline[name]["value"]
+        if results[name]["higher_is_better"]:
+            ratio = value/reference
+        else:
+            ratio = reference/value
+        allowed = max(tolerance, results[name].get("tolerance", 0.))
+        rows.append((name, value, reference, ratio,
+                     ratio < 1./(1. + allowed)))
+    return rows
+
+def confirm_regressions(results: dict, baseline: dict, tolerance=TOLERANCE,
+                        reruns=2) -> list:
+    """
+    Compare results against a baseline, running the benchmarks that
+    look slower again, as a busy machine slows down a whole run at a
+    time. The best result of every benchmark is kept in `results`.
+
+    Args:
+        results (dict): results of `run_benchmarks()`
+        baseline (dict): saved results of `run_benchmarks()`
+        tolerance (float): fractional slowdown allowed
+        reruns (int): the most times a benchmark is run again
+
+    Returns:
+        list: the rows of `compare()`
+    """
+    rows = compare(results, baseline, tolerance)
+    for _ in range(reruns):
+        regressed = [row[0] for row in rows if row[-1]]
+        if not regressed:
+            break
+        for name, result in run_benchmarks(regressed).items():
+            results[name] = _better(results[name], result)
+        rows = compare(results, baseline, tolerance)
+    return rows
+
+def print_comparison(rows: list, results: dict) -> None:
+    print("%-28s %12s %12s %8s"%("benchmark", "value", "baseline",
+                                 "speedup"))
+    for name, value, reference, ratio, regressed in rows:
+        print("%-28s %12.4g %12.4g %7.2fx %s %s"%(
+            name, value, reference, ratio, results[name]["unit"],
+            "REGRESSION" if regressed else ""))
+    return
+
+def test_hotpaths():
+    results = run_benchmarks()
+    if not os.path.exists(BASELINE_PATH):
+        return
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)["results"]
+    rows = confirm_regressions(results, baseline)
+    regressed = [row[0] for row in rows if row[-1]]
+    assert not regressed, "Slower than the baseline: %s"%", ".join(regressed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--save", metavar="PATH",
+                        help="save the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH",
+                        help="compare the results against a baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="fractional slowdown allowed (default %(default)s)")
+    args = parser.parse_args()
+    results = run_benchmarks()
+    if args.save:
+        save_baseline(results, args.save)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        rows = confirm_regressions(results, baseline, args.tolerance)
+        print_comparison(rows, results)
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+    else:
+        for name, result in results.items():
+            print("%-28s %12.4g %s"%(name, result["value"], result["unit"]))
+
+if __name__ == "__main__":
+    main()
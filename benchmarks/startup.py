@@ -0,0 +1,56 @@
+"""
+Startup benchmark: the time to import monopolymath, and to make the first
+board, in fresh interpreters. Run from the top of the repository with
+
+    python benchmarks/startup.py [runs]
+"""
+import os
+import subprocess
+import sys
+import numpy as np
+
+REPOSITORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#Times are measured inside the child, after numpy is imported, so that
+#only the cost of monopolymath itself is counted
+IMPORT_SNIPPET = """
+import time
+import numpy
+start = time.perf_counter()
+import monopolymath
+print(time.perf_counter() - start)
+"""
+FIRST_BOARD_SNIPPET = """
+import time
+import numpy
+import monopolymath
+start = time.perf_counter()
+monopolymath.MonopolyBoard()
+print(time.perf_counter() - start)
+"""
+
+def time_snippet(snippet: str, runs=20) -> np.ndarray:
+    """
+    Run a snippet printing a time in `runs` fresh interpreters.
+
+    Returns:
+        float array: the time printed by each run, in seconds
+    """
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", snippet],
+                                cwd=REPOSITORY, check=True,
+                                stdout=subprocess.PIPE).stdout
+        times.append(float(output))
+    return np.array(times)
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for name, snippet in [("import monopolymath", IMPORT_SNIPPET),
+                          ("first MonopolyBoard()", FIRST_BOARD_SNIPPET)]:
+        times = time_snippet(snippet, runs)*1e3
+        print("%-22s median %7.2f ms  min %7.2f ms"%(name, np.median(times),
+                                                     times.min()))
+
+if __name__ == "__main__":
+    main()
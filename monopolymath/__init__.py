@@ -1,10 +1,12 @@
 from .diceroller import DiceRoller
 from .monopolyboard import MonopolyBoard
 from .monopolyroller import MonopolyRollMover
+from .batchmover import BatchRollMover
 #Asserts to make pyflakes work
 assert DiceRoller
 assert MonopolyBoard
 assert MonopolyRollMover
+assert BatchRollMover
 
 __version__ = "0.0.1"
 __author__ = "Thomas McClintock"
@@ -0,0 +1,7 @@
+"""
+Run a sweep of analyses with `python -m monopolymath`; see `runner`.
+"""
+from .runner import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Finite-horizon and first-passage properties of the Markov chain of a
+player: where a player is after exactly n turns from every starting
+space, how many turns it takes to first land on a set of spaces, and
+how long it takes to come back. Everything is found from the transition
+matrix of a `MonopolyBoard` with matrix products and linear solves.
+"""
+from bisect import bisect_right
+import numpy as np
+from . import markovchain
+
+class MatrixPowers(object):
+    """
+    Powers of a square matrix by exponentiation by squaring. The
+    squares T, T^2, T^4, ... and every power computed are cached, and
+    a new power starts from the largest cached power below it, so a
+    run of consecutive powers costs one product each.
+
+    Args:
+        T (float array): (states, states) dense matrix
+    """
+    def __init__(self, T):
+        self.T = np.asarray(T, dtype=float)
+        self.identity = np.identity(len(self.T))
+        self._squares = [self.T]
+        self._powers = {0: self.identity, 1: self.T}
+
+    def _square(self, k: int) -> np.ndarray:
+        #T^(2^k)
+        while len(self._squares) <= k:
+            self._squares.append(self._squares[-1] @ self._squares[-1])
+        return self._squares[k]
+
+    def _by_squaring(self, n: int) -> np.ndarray:
+        result = None
+        k = 0
+        while n:
+            if n & 1:
+                square = self._square(k)
+                result = square if result is None else result @ square
+            n >>= 1
+            k += 1
+        return self.identity if result is None else result
+
+    def power(self, n: int) -> np.ndarray:
+        """
+        The nth power of the matrix.
+
+        Args:
+            n (int): a non-negative power
+
+        Returns:
+            float array: T^n
+        """
+        if n < 0:
+            raise Exception("Only non-negative powers can be taken.")
+        if n not in self._powers:
+            below = max(m for m in self._powers if m <= n)
+            self._powers[n] = self._powers[below] @ \
+                self._by_squaring(n - below)
+        return self._powers[n]
+
+    def powers(self, steps) -> np.ndarray:
+        """
+        Many powers of the matrix, computed in increasing order.
+
+        Args:
+            steps (int array): the powers
+
+        Returns:
+            float array: (len(steps), states, states) powers
+        """
+        steps = np.asarray(steps, dtype=int)
+        for n in np.sort(steps):
+            self.power(int(n))
+        return np.stack([self._powers[int(n)] for n in steps])
+
+    def left_products(self, V, steps, cache=None) -> np.ndarray:
+        """
+        The products V T^n of a few row vectors with many powers,
+        e.g. distributions after n steps. Each product is found from
+        the one for the next lower n, times the cached power of the gap
+        between them, so only the gaps are ever squared.
+
+        Args:
+            V (float array): (vectors, states) row vectors
+            steps (int array): the powers
+            cache (dict): products of V by power, which is used and
+                filled in, for repeated queries with the same V
+
+        Returns:
+            float array: (len(steps), vectors, states) products
+        """
+        steps = np.asarray(steps, dtype=int)
+        if np.any(steps < 0):
+            raise Exception("Only non-negative powers can be taken.")
+        if cache is None:
+            cache = {}
+        cache.setdefault(0, np.asarray(V, dtype=float))
+        known = sorted(cache)
+        previous = 0
+        for n in np.unique(steps):
+            n = int(n)
+            if n not in cache:
+                below = max(previous, known[bisect_right(known, n) - 1])
+                cache[n] = cache[below] @ self.power(n - below)
+            previous = n
+        return np.stack([cache[int(n)] for n in steps])
+
+    def clear(self) -> None:
+        """
+        Forget every cached power.
+        """
+        self.__init__(self.T)
+        return
+
+def _transition_matrix(board) -> np.ndarray:
+    if not hasattr(board, "transition_matrix"):
+        raise Exception("Must assign dice to the board first.")
+    T = board.transition_matrix
+    if markovchain._is_sparse(T):
+        T = T.toarray()
+    return T
+
+def matrix_powers(board) -> MatrixPowers:
+    """
+    The cached powers of the transition matrix of a board. The cache
+    is kept on the board and rebuilt when the matrix changes.
+    """
+    powers = getattr(board, "_matrix_powers", None)
+    #Keyed on the board's own matrix, as a sparse one is densified
+    #into a new array every time
+    if powers is None or powers.source is not \
+       getattr(board, "transition_matrix", None):
+        powers = MatrixPowers(_transition_matrix(board))
+        powers.source = board.transition_matrix
+        board._matrix_powers = powers
+    return powers
+
+def start_states(number_of_spaces=40, jail_position=30,
+                 max_doubles=3) -> np.ndarray:
+    """
+    The state of a player starting on each space: free with no doubles
+    rolled, or in jail on their first turn when on the jail position.
+    """
+    states = np.arange(number_of_spaces)
+    states[jail_position] = markovchain.state_index(
+        jail_position, in_jail=True, number_of_spaces=number_of_spaces,
+        max_doubles=max_doubles)
+    return states
+
+def _board_start_states(board) -> np.ndarray:
+    rules = getattr(board, "rules", None)
+    if rules is None:
+        return start_states(board.number_of_spaces)
+    return start_states(board.number_of_spaces, rules.jail_position,
+                        rules.max_doubles)
+
+def n_step_distributions(board, steps) -> np.ndarray:
+    """
+    The probability of being on each space after exactly n turns,
+    from every starting space, for many n at once.
+
+    Args:
+        board (:obj: MonopolyBoard): a board with dice assigned
+        steps (int or int array): the numbers of turns
+
+    Returns:
+        float array: (len(steps), starting spaces, spaces) distributions,
+            without the first axis for a single number of turns
+    """
+    N = board.number_of_spaces
+    steps_array = np.atleast_1d(steps)
+    #Distributions over the states and over the spaces are both cached
+    #with the powers, and are dropped with them when the matrix changes
+    powers = matrix_powers(board)
+    if not hasattr(powers, "start_distributions"):
+        powers.start_distributions = {}
+        powers.space_distributions = {}
+    cache = powers.space_distributions
+    missing = [int(n) for n in np.unique(steps_array) if int(n) not in cache]
+    if missing:
+        S = len(board.state_positions)
+        projection = np.zeros((S, N))
+        projection[np.arange(S), board.state_positions] = 1.
+        starts = np.identity(S)[_board_start_states(board)]
+        rows = powers.left_products(starts, missing,
+                                    powers.start_distributions)
+        cache.update(zip(missing, rows @ projection))
+    distributions = np.stack([cache[int(n)] for n in steps_array])
+    return distributions if np.ndim(steps) else distributions[0]
+
+def _target_states(board, spaces) -> np.ndarray:
+    targets = np.isin(board.state_positions, spaces)
+    if not np.any(targets):
+        raise Exception("There must be at least one target space.")
+    return targets
+
+def hitting_times(T, targets) -> np.ndarray:
+    """
+    The expected number of steps until a chain first enters a set of
+    target states, from every state. Found with one linear solve of
+    (I - Q) h = 1, where Q is T restricted to the other states.
+
+    Args:
+        T (float array): (states, states) transition matrix
+        targets (boolean array): which states are targets
+
+    Returns:
+        float array: expected steps, zero for the target states
+    """
+    T = np.asarray(T)
+    others = ~np.asarray(targets)
+    Q = T[others][:, others]
+    h = np.zeros(len(T))
+    h[others] = np.linalg.solve(np.identity(len(Q)) - Q, np.ones(len(Q)))
+    return h
+
+def first_passage_times(T, targets) -> np.ndarray:
+    """
+    The expected number of steps, at least one, until a chain next
+    enters a set of target states, from every state. For the target
+    states themselves these are the return times.
+
+    Returns:
+        float array: expected steps from each state
+    """
+    T = np.asarray(T)
+    return 1. + T @ hitting_times(T, targets)
+
+def expected_turns_to_land(board, spaces) -> np.ndarray:
+    """
+    The expected number of turns until a player first lands on any
+    of a set of spaces, e.g. a color group, from every starting space.
+    A player starting on one of the spaces must land on it again.
+
+    Args:
+        board (:obj: MonopolyBoard): a board with dice assigned
+        spaces (int array): the target spaces
+
+    Returns:
+        float array: expected turns from each starting space
+    """
+    T = _transition_matrix(board)
+    passage = first_passage_times(T, _target_states(board, spaces))
+    return passage[_board_start_states(board)]
+
+def expected_return_times(board, spaces) -> np.ndarray:
+    """
+    The expected number of turns between landings on a set of spaces,
+    for a player in the long run. By Kac's lemma this is the inverse
+    of the stationary probability of the set.
+
+    Args:
+        board (:obj: MonopolyBoard): a board with dice assigned
+        spaces (int array): the target spaces
+
+    Returns:
+        float: expected turns between landings
+    """
+    T = _transition_matrix(board)
+    targets = _target_states(board, spaces)
+    pi = markovchain.stationary_distribution(T)[targets]
+    return np.dot(pi/pi.sum(), first_passage_times(T, targets)[targets])
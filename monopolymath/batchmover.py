@@ -0,0 +1,297 @@
+"""
+The rules for moving many monopoly players at once via rolling.
+Every player is an independent imaginary player, and the state of all
+of them is held in numpy arrays so that a single turn is a handful of
+array operations rather than a Python call per player.
+"""
+import numpy as np
+from .cards import CardDeck
+from .rules import Rules
+
+class BatchRollMover(object):
+    """
+    An object for moving many independent monopoly players at once
+    via rolling. Applies the same rules as the `MonopolyRollMover`
+    (doubles, triple doubles, jail, chance and community chest) to
+    every player each turn, or the house rules it is given.
+
+    Args:
+        diceroller (:obj: DiceRoller): dice that the players roll
+        number_of_players (int): number of independent players
+        number_of_spaces (int): number of spaces on the board
+        rng (:obj: numpy.random.Generator): random number generator;
+            a new unseeded one is made if None
+        shuffled_decks (bool): each player deals cards from their own
+            shuffled decks instead of drawing with replacement
+        instrumentation (:obj: Instrumentation): counts the rules that
+            fire and times every turn; off if None
+        rules (:obj: Rules): the house rules; the standard rules if None
+        antithetic (bool): the second half of the players roll the
+            mirror image of the dice and cards of the first half, e.g.
+            a 6 for a 1, which needs an even number of players
+    """
+    def __init__(self, diceroller, number_of_players, number_of_spaces=40,
+                 rng=None, shuffled_decks=False, instrumentation=None,
+                 rules=None, antithetic=False):
+        if type(number_of_players) is not int:
+            raise Exception("'number_of_players' must be an integer.")
+        assert number_of_players > 0
+        if antithetic and (number_of_players % 2 or shuffled_decks):
+            raise Exception("Antithetic draws need an even number of "+\
+                            "players and cards drawn with replacement.")
+        self.antithetic = antithetic
+        self.diceroller = diceroller
+        self.number_of_players = number_of_players
+        self.number_of_spaces = number_of_spaces
+        if rng is None:
+            rng = np.random.default_rng()
+        self.rng = rng
+        self.instrumentation = instrumentation
+        if diceroller.dice_array is not None:
+            self._dice_high = np.asarray(diceroller.dice_array) + 1
+        else:
+            self._dice_high = diceroller.sides + 1
+        if rules is None:
+            rules = Rules(number_of_spaces)
+        if rules.number_of_spaces != number_of_spaces:
+            raise Exception("The rules are for a board of %d spaces."%
+                            rules.number_of_spaces)
+        self.rules = rules
+        #Flattened card tables, indexed by position*cards+draw; the
+        #community chest table also sends players to jail
+        chance, community_chest = rules.card_tables()
+        self._chance_cards = chance.shape[1]
+        self._community_chest_cards = community_chest.shape[1]
+        self._chance = chance.ravel()
+        self._community_chest = community_chest.ravel()
+        chance_passes_go, community_chest_passes_go = \
+            rules.card_passes_go_tables()
+        self._chance_passes_go = chance_passes_go.ravel()
+        self._community_chest_passes_go = community_chest_passes_go.ravel()
+        if instrumentation is not None:
+            instrumentation.size_decks(self._chance_cards,
+                                       self._community_chest_cards)
+        self.shuffled_decks = shuffled_decks
+        self._is_chance = np.isin(np.arange(number_of_spaces),
+                                  rules.chance_spaces)
+        self._is_community_chest = np.isin(np.arange(number_of_spaces),
+                                           rules.community_chest_spaces)
+        self._go_to_jail = np.isin(np.arange(number_of_spaces),
+                                   rules.go_to_jail_spaces)
+        if shuffled_decks:
+            self.chance_deck = CardDeck(self._chance_cards, shuffled=True,
+                                        rng=rng,
+                                        number_of_players=number_of_players)
+            self.community_chest_deck = CardDeck(
+                self._community_chest_cards, shuffled=True, rng=rng,
+                number_of_players=number_of_players)
+        #The state of every player
+        n = number_of_players
+        self.position = np.zeros(n, dtype=np.int64)
+        self.N_doubles = np.zeros(n, dtype=np.int64)
+        self.in_jail = np.zeros(n, dtype=bool)
+        self.time_in_jail = np.zeros(n, dtype=np.int64)
+        #Histogram of the spaces landed on at the end of each turn
+        self.space_visits = np.zeros(number_of_spaces)
+
+    def roll(self):
+        """
+        Roll the dice for every player.
+
+        Returns:
+            (int array, int array, boolean array): total of rolls,
+                the individual rolls with shape (dice, players),
+                and whether doubles were rolled
+        """
+        high = self._dice_high
+        if np.ndim(high):
+            high = high[:, None]
+        n = self.number_of_players
+        if self.antithetic:
+            n //= 2
+        dice = self.rng.integers(1, high, size=(self.diceroller.number, n))
+        if self.antithetic:
+            dice = np.concatenate([dice, high - dice], axis=1)
+        #Summing and comparing row by row is much faster than
+        #reducing along the short axis
+        totals = dice[0].copy()
+        doubles = np.ones(self.number_of_players, dtype=bool)
+        for row in dice[1:]:
+            totals += row
+            doubles &= row == dice[0]
+        return totals, dice, doubles
+
+    def update_positions(self):
+        """
+        Move every player by a single roll. The dice, roll totals,
+        whether they were doubles and whether each player passed Go are
+        kept in `dice`, `roll_totals`, `doubles` and `passed_go` until
+        the next roll, and the cards drawn are given by `card_draws()`.
+
+        Returns:
+            int array: the new position of each player
+        """
+        N = self.number_of_spaces
+        rules = self.rules
+        J = rules.jail_position
+        V = rules.visiting_position
+        counters = self.instrumentation
+        if counters is not None:
+            turn_start = counters.begin_turn()
+        roll, dice, doubles = self.roll()
+        in_jail = self.in_jail
+
+        #Rule - getting out of jail on doubles, by paying or on time
+        time_in_jail = self.time_in_jail + in_jail
+        if rules.jail_strategy == "pay":
+            escaped = in_jail
+        else:
+            escaped = in_jail & doubles
+        timed_out = in_jail & ~escaped & (time_in_jail >= rules.jail_turns)
+        #Players leaving jail move from just visiting
+        start = np.where(escaped, V, self.position)
+        new_position = (start + roll) % N
+        new_position = np.where(in_jail & ~escaped, J, new_position)
+        new_position = np.where(timed_out, V, new_position)
+        in_jail = in_jail & ~(escaped | timed_out)
+        time_in_jail = np.where(in_jail, time_in_jail, 0)
+
+        #Rule - doubles
+        N_doubles = np.where(doubles, self.N_doubles + 1, 0)
+        tripled = N_doubles == rules.max_doubles
+        new_position = np.where(tripled, J, new_position)
+        moved = ~(self.in_jail & ~escaped) & ~tripled
+        if counters is not None:
+            if rules.jail_strategy == "pay":
+                counters.jail_exits_paid += np.count_nonzero(escaped)
+            else:
+                counters.jail_exits_doubles += np.count_nonzero(escaped)
+            counters.jail_exits_timeout += np.count_nonzero(timed_out)
+            counters.triple_doubles += np.count_nonzero(tripled)
+            counters.go_to_jail += np.count_nonzero(
+                moved & self._go_to_jail[new_position])
+
+        #Rule - chance then community chest cards
+        new_position = self._draw_cards(new_position)
+
+        #Players pass Go when the roll takes them around the board, or
+        #a card sends them to Go or forward past it
+        self.passed_go = (moved & (start + roll >= N)) | \
+            (new_position == 0) | self._card_passed_go
+        self.roll_totals = roll
+        self.dice = dice
+        self.doubles = doubles
+
+        #Rule - going into jail
+        jailed = new_position == J
+        in_jail = in_jail | jailed
+        N_doubles[jailed] = 0
+
+        self.position = new_position
+        self.N_doubles = N_doubles
+        self.in_jail = in_jail
+        self.time_in_jail = time_in_jail
+        self.space_visits += np.bincount(new_position, minlength=N)
+        if counters is not None:
+            counters.end_turn(turn_start, new_position,
+                              self.number_of_players)
+        return new_position
+
+    def _draw_cards(self, new_position):
+        counters = self.instrumentation
+        if self.shuffled_decks:
+            drawing = self._is_chance[new_position]
+            chance_draws = self.chance_deck.draw(drawing)
+            chance_positions = new_position
+            new_position = self._chance[new_position*self._chance_cards
+                                        + chance_draws]
+            if counters is not None:
+                self._count_draws(counters.chance_draws, chance_draws,
+                                  drawing)
+            drawing = self._is_community_chest[new_position]
+            community_chest_draws = self.community_chest_deck.draw(drawing)
+            self._card_draws = (chance_positions, chance_draws,
+                                new_position, community_chest_draws)
+            self._record_passed_go()
+            if counters is not None:
+                self._count_draws(counters.community_chest_draws,
+                                  community_chest_draws, drawing)
+            return self._community_chest[
+                new_position*self._community_chest_cards
+                + community_chest_draws]
+        #Both draws come from one draw of two digits, in base
+        #the number of chance cards
+        n_draws = self._chance_cards*self._community_chest_cards
+        if self.antithetic:
+            draws = self.rng.integers(0, n_draws,
+                                      size=self.number_of_players//2,
+                                      dtype=np.int64)
+            #Mirroring the combined draw mirrors both of the cards
+            draws = np.concatenate([draws, n_draws - 1 - draws])
+        else:
+            draws = self.rng.integers(0, n_draws,
+                                      size=self.number_of_players,
+                                      dtype=np.int64)
+        chance_draws = draws % self._chance_cards
+        community_chest_draws = draws // self._chance_cards
+        if counters is not None:
+            self._count_draws(counters.chance_draws, chance_draws,
+                              self._is_chance[new_position])
+        chance_positions = new_position
+        new_position = self._chance[new_position*self._chance_cards
+                                    + chance_draws]
+        if counters is not None:
+            self._count_draws(counters.community_chest_draws,
+                              community_chest_draws,
+                              self._is_community_chest[new_position])
+        self._card_draws = (chance_positions, chance_draws,
+                            new_position, community_chest_draws)
+        self._record_passed_go()
+        return self._community_chest[new_position*self._community_chest_cards
+                                     + community_chest_draws]
+
+    def _record_passed_go(self) -> None:
+        #Whether the cards just drawn moved each player forward past Go
+        chance_positions, chance_draws, community_chest_positions, \
+            community_chest_draws = self._card_draws
+        self._card_passed_go = \
+            self._chance_passes_go[chance_positions*self._chance_cards
+                                   + chance_draws] | \
+            self._community_chest_passes_go[
+                community_chest_positions*self._community_chest_cards
+                + community_chest_draws]
+        return
+
+    def card_draws(self):
+        """
+        The cards drawn by every player on the last roll.
+
+        Returns:
+            (int array, int array): the chance and community chest card
+                drawn by each player, or -1 if they did not draw one
+        """
+        chance_positions, chance_draws, community_chest_positions, \
+            community_chest_draws = self._card_draws
+        return (np.where(self._is_chance[chance_positions], chance_draws, -1),
+                np.where(self._is_community_chest[community_chest_positions],
+                         community_chest_draws, -1))
+
+    @staticmethod
+    def _count_draws(counts, draws, drawing) -> None:
+        counts += np.bincount(draws[drawing], minlength=len(counts))
+        return
+
+    def run(self, number_of_turns: int):
+        """
+        Move every player `number_of_turns` times, accumulating
+        the landings in `space_visits`.
+
+        Args:
+            number_of_turns (int): number of rolls for each player
+
+        Returns:
+            float array: the `space_visits` histogram
+        """
+        for _ in range(number_of_turns):
+            self.update_positions()
+        return self.space_visits
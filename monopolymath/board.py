@@ -4,6 +4,9 @@ It has a set of spaces that can be landed on that can have attributes.
 """
 import numpy as np
 
+#Boards with at least this many spaces get sparse roll matrices
+SPARSE_MINIMUM_SPACES = 1000
+
 class Space(object):
     """
     A boardgame space.
@@ -11,6 +14,8 @@ class Space(object):
     Args:
         name (:obj:str): the name of the space
     """
+    __slots__ = ("name",)
+
     def __init__(self, name):
         self.name = name
 
@@ -36,6 +41,44 @@ class Board(object):
         #Create the spaces on the board
         self.spaces = [Space(name) for name in names]
 
+    def compute_roll_matrix(self, diceroller, sparse=None):
+        """
+        Compute the roll matrix, which encodes the probability of going
+        from one space to any other space by rolling the dice. It is
+        built with array operations from the roll distribution.
+
+        Args:
+            diceroller (:obj: DiceRoller): dice rolled on this board
+            sparse (bool): whether to make a `scipy.sparse` matrix;
+                by default large boards get sparse matrices
+
+        Returns:
+            float array: the (spaces, spaces) roll matrix
+        """
+        from .markovchain import roll_matrix
+        if sparse is None:
+            sparse = self.number_of_spaces >= SPARSE_MINIMUM_SPACES
+        return roll_matrix(diceroller.probability_array(),
+                           diceroller.minimum_roll(),
+                           self.number_of_spaces, sparse)
+
+    def jump_table(self, overshoot="wrap", max_rolls=None):
+        """
+        A table of jumps for this board, on which teleports, random and
+        conditional jumps and roll again spaces are declared.
+
+        Args:
+            overshoot (str): what a roll past the last space does:
+                "wrap", "clip" or "stay"
+            max_rolls (int): the most rolls in a turn with roll again
+                spaces; no limit if None
+
+        Returns:
+            :obj: JumpTable: the empty table
+        """
+        from .jumps import JumpTable
+        return JumpTable(self, overshoot, max_rolls)
+
     def print_space_names(self):
         print("Space names:")
         for i,s in enumerate(self.spaces):
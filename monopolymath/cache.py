@@ -0,0 +1,309 @@
+"""
+A content-addressed cache of computed results, such as roll and
+transition matrices, stationary distributions and economics tables.
+
+Every result is stored under a hash of everything it was computed from:
+the board, the dice, the rules and any other arguments. A result is
+kept in memory, and in a directory on disk that is shared between
+processes and runs. Both tiers forget the least recently used results
+once they are over their size limits.
+
+Processes can share a directory: results are written to a temporary
+file and renamed into place, so they are never read half written, and
+eviction is done under a file lock.
+"""
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+import numpy as np
+try:
+    import fcntl
+except ImportError: #pragma: no cover
+    fcntl = None
+
+#Changing the version invalidates every result cached before
+CACHE_VERSION = 1
+LOCK_FILE = ".lock"
+
+def _is_sparse(value) -> bool:
+    #A scipy.sparse matrix, without importing scipy
+    return hasattr(value, "tocsr")
+
+def _update_hash(h, part) -> None:
+    if part is None or isinstance(part, (bool, int, float, str, bytes)):
+        h.update(("%s:%r;"%(type(part).__name__, part)).encode())
+    elif isinstance(part, np.ndarray):
+        part = np.ascontiguousarray(part)
+        h.update(("ndarray:%s:%s;"%(part.dtype.str, part.shape)).encode())
+        h.update(part.tobytes())
+    elif isinstance(part, np.generic):
+        _update_hash(h, part.item())
+    elif isinstance(part, (list, tuple)):
+        h.update(("%s:%d;"%(type(part).__name__, len(part))).encode())
+        for item in part:
+            _update_hash(h, item)
+    elif isinstance(part, dict):
+        h.update(("dict:%d;"%len(part)).encode())
+        for key in sorted(part, key=str):
+            _update_hash(h, str(key))
+            _update_hash(h, part[key])
+    elif _is_sparse(part):
+        _update_hash(h, part.toarray())
+    else:
+        _update_hash(h, type(part).__name__)
+        _update_hash(h, _definition(part))
+    return
+
+def _definition(obj) -> dict:
+    """
+    What defines a dice roller, a board or a set of rules: the public
+    attributes that results are computed from.
+    """
+    from .diceroller import DiceRoller
+    from .rules import Rules
+    from .board import Board
+    if isinstance(obj, DiceRoller):
+        return {"sides": obj.sides, "number": obj.number,
+                "dice_array": obj.dice_array}
+    if isinstance(obj, Rules):
+        return {name: value for name, value in vars(obj).items()
+                if not name.startswith("_")}
+    if isinstance(obj, Board):
+        definition = {"number_of_spaces": obj.number_of_spaces,
+                      "names": [space.name for space in obj.spaces]}
+        for column in ["kind_codes", "groups", "costs", "house_costs",
+                       "rents", "building_rents", "RR_rents", "mortgages"]:
+            if hasattr(obj, column):
+                definition[column] = getattr(obj, column)
+        return definition
+    raise Exception("Cannot make a cache key from a %s."%
+                    type(obj).__name__)
+
+def fingerprint(*parts) -> str:
+    """
+    The hash of a result's inputs. The parts can be numbers, strings,
+    arrays, lists, tuples and dicts of them, or dice rollers, boards
+    and rules, which are hashed by their definitions.
+
+    Returns:
+        str: a hexadecimal SHA-256 digest
+    """
+    h = hashlib.sha256()
+    _update_hash(h, CACHE_VERSION)
+    _update_hash(h, parts)
+    return h.hexdigest()
+
+def _number_of_bytes(value) -> int:
+    if _is_sparse(value):
+        return value.data.nbytes + value.indices.nbytes + \
+            value.indptr.nbytes
+    return np.asarray(value).nbytes
+
+class ResultCache(object):
+    """
+    A cache of arrays and sparse matrices, in memory and optionally on
+    disk. Results handed out are shared, so dense arrays are made
+    read-only.
+
+    Args:
+        directory (str): where results are kept on disk; in memory
+            only if None
+        max_bytes (int): size of the results kept on disk
+        memory_bytes (int): size of the results kept in memory
+    """
+    def __init__(self, directory=None, max_bytes=2**30,
+                 memory_bytes=2**28):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _paths(self, key: str):
+        return [os.path.join(self.directory, key + suffix)
+                for suffix in [".npy", ".npz"]]
+
+    def _remember(self, key: str, value) -> None:
+        if key in self._memory:
+            self._memory_size -= _number_of_bytes(self._memory.pop(key))
+        size = _number_of_bytes(value)
+        if size > self.memory_bytes:
+            return
+        self._memory[key] = value
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_size -= _number_of_bytes(old)
+        return
+
+    def _load(self, key: str):
+        if self.directory is None:
+            return None
+        dense, sparse = self._paths(key)
+        #Another process may evict the file at any moment
+        try:
+            if os.path.exists(dense):
+                value = np.load(dense)
+                path = dense
+            elif os.path.exists(sparse):
+                import scipy.sparse
+                value = scipy.sparse.load_npz(sparse)
+                path = sparse
+            else:
+                return None
+            #The modification time orders the results for eviction
+            os.utime(path)
+        except OSError:
+            return None
+        return value
+
+    def get(self, key: str):
+        """
+        A cached result.
+
+        Args:
+            key (str): the `fingerprint` of the inputs
+
+        Returns:
+            array: the result, or None if it is not cached
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        value = self._load(key)
+        if value is None:
+            self.misses += 1
+            return None
+        value = self._freeze(value)
+        self._remember(key, value)
+        self.hits += 1
+        self.disk_hits += 1
+        return value
+
+    @staticmethod
+    def _freeze(value):
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+        return value
+
+    def put(self, key: str, value):
+        """
+        Cache a result.
+
+        Args:
+            key (str): the `fingerprint` of the inputs
+            value (array or sparse matrix): the result
+
+        Returns:
+            the cached result, read-only if a dense array
+        """
+        if not _is_sparse(value):
+            value = self._freeze(np.array(value))
+        self._remember(key, value)
+        if self.directory is None:
+            return value
+        dense, sparse = self._paths(key)
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory,
+                                                 suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                if _is_sparse(value):
+                    import scipy.sparse
+                    scipy.sparse.save_npz(f, value.tocsr())
+                    path = sparse
+                else:
+                    np.save(f, value)
+                    path = dense
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        self.evict()
+        return value
+
+    def get_or_compute(self, kind: str, compute, *parts):
+        """
+        A cached result, computed and cached if it is missing.
+
+        Args:
+            kind (str): the name of the kind of result, e.g.
+                "transition_matrix"
+            compute (callable): computes the result with no arguments
+            parts: everything the result is computed from
+
+        Returns:
+            the result
+        """
+        key = fingerprint(kind, *parts)
+        value = self.get(key)
+        if value is None:
+            value = self.put(key, compute())
+        return value
+
+    def _lock(self):
+        f = open(os.path.join(self.directory, LOCK_FILE), "a")
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        return f
+
+    def _entries(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith((".npy", ".npz")):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def disk_size(self) -> int:
+        """
+        The number of bytes of results on disk.
+        """
+        if self.directory is None:
+            return 0
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used results on disk until they fit
+        in `max_bytes`.
+        """
+        if self.directory is None:
+            return
+        with self._lock():
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+        return
+
+    def clear(self) -> None:
+        """
+        Forget every result, in memory and on disk.
+        """
+        self._memory.clear()
+        self._memory_size = 0
+        if self.directory is None:
+            return
+        with self._lock():
+            for _, _, path in self._entries():
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return
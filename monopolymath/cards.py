@@ -0,0 +1,200 @@
+"""
+The chance and community chest cards. Each deck is declared as a list
+of card effects, which is compiled once into a lookup table of where a
+player ends up after drawing each card on each space.
+"""
+import numpy as np
+
+#Card spaces and the spaces that cards can point to
+CHANCE_SPACES = [7, 22, 36]
+COMMUNITY_CHEST_SPACES = [2, 17, 33]
+RAILROAD_SPACES = [5, 15, 25, 35]
+UTILITY_SPACES = [12, 28]
+
+#The cards in each deck. A card either does nothing to the position
+#of the player (None), or moves them to a space ("to", space), back a
+#number of spaces ("back", spaces) or to the nearest of a set of spaces
+#in either direction ("nearest", spaces).
+CHANCE_CARDS = [("to", 0), #Proceed to Go
+                ("to", 24), #Illinois Ave
+                ("to", 11), #St. Charles Pl.
+                ("nearest", UTILITY_SPACES),
+                ("nearest", RAILROAD_SPACES),
+                None, None,
+                ("back", 3),
+                ("to", 30), #Go to jail
+                None, None,
+                ("to", 5), #Reading Railroad
+                ("to", 39), #Boardwalk
+                None, None, None]
+COMMUNITY_CHEST_CARDS = [("to", 0), #Proceed to Go
+                         None, None, None, None,
+                         ("to", 30), #Go to jail
+                         None, None, None, None,
+                         None, None, None, None, None, None]
+NUMBER_OF_CARDS = len(CHANCE_CARDS)
+
+def _card_destination(card, space: int, number_of_spaces: int) -> int:
+    if card is None:
+        return space
+    action, target = card
+    if action == "to":
+        return target
+    elif action == "back":
+        return (space - target) % number_of_spaces
+    elif action == "nearest":
+        #Circular distance, with ties going forward
+        targets = np.asarray(target)
+        forward = (targets - space) % number_of_spaces
+        distance = np.minimum(forward, number_of_spaces - forward)
+        return int(targets[np.lexsort((forward, distance))[0]])
+    raise Exception("Unknown card action '%s'."%action)
+
+def _card_passes_go(card, space: int, number_of_spaces: int) -> bool:
+    #Whether a card moves the player forward around the end of the board
+    if card is None or card[0] == "back":
+        return False
+    destination = _card_destination(card, space, number_of_spaces)
+    forward = (destination - space) % number_of_spaces
+    if card[0] == "nearest" and forward > number_of_spaces - forward:
+        return False
+    return destination < space
+
+def compile_passes_go(cards, card_spaces, number_of_spaces=40):
+    """
+    Compile which cards move a player forward past Go, as a lookup
+    table like that of `compile_deck`.
+
+    Returns:
+        boolean array: the (spaces, cards) table
+    """
+    table = np.zeros((number_of_spaces, len(cards)), dtype=bool)
+    for space in card_spaces:
+        for i, card in enumerate(cards):
+            table[space, i] = _card_passes_go(card, space, number_of_spaces)
+    return table
+
+def compile_deck(cards, card_spaces, number_of_spaces=40) -> np.ndarray:
+    """
+    Compile a deck into a lookup table. Entry [position, card] is
+    where a player on `position` ends up after drawing `card`.
+    Positions that are not card spaces map onto themselves.
+
+    Args:
+        cards (list): the effect of every card in the deck
+        card_spaces (list of ints): spaces where the deck is drawn from
+        number_of_spaces (int): number of spaces on the board
+
+    Returns:
+        int array: the (spaces, cards) lookup table
+    """
+    N = number_of_spaces
+    table = np.repeat(np.arange(N)[:, None], len(cards), axis=1)
+    for space in card_spaces:
+        for i, card in enumerate(cards):
+            table[space, i] = _card_destination(card, space, N)
+    return table
+
+def card_tables(number_of_spaces=40):
+    """
+    Lookup tables of the standard chance and community chest decks.
+
+    Args:
+        number_of_spaces (int): number of spaces on the board
+
+    Returns:
+        (int array, int array): chance and community chest tables
+    """
+    return (compile_deck(CHANCE_CARDS, CHANCE_SPACES, number_of_spaces),
+            compile_deck(COMMUNITY_CHEST_CARDS, COMMUNITY_CHEST_SPACES,
+                         number_of_spaces))
+
+def table_matrix(table) -> np.ndarray:
+    """
+    The probability of ending up on each space after landing on a
+    space and drawing a card with replacement, i.e. the rows of the
+    transition matrix contributed by a deck.
+
+    Args:
+        table (int array): (spaces, cards) lookup table
+
+    Returns:
+        float array: the (spaces, spaces) matrix of the deck
+    """
+    N, N_cards = table.shape
+    C = np.zeros((N, N))
+    np.add.at(C, (np.repeat(np.arange(N), N_cards), table.ravel()),
+              1./N_cards)
+    return C
+
+class CardDeck(object):
+    """
+    A deck of cards drawn by one or many players. By default every
+    draw is independent, as if the card were put back and the deck
+    reshuffled. A shuffled deck is instead dealt in a fixed random
+    order, each card going to the bottom after it is drawn, so every
+    card comes up once per pass through the deck.
+
+    Args:
+        number_of_cards (int): number of cards in the deck
+        shuffled (bool): deal from a shuffled deck instead of
+            drawing with replacement
+        number_of_players (int): number of players each holding their
+            own copy of the deck; None for a single player
+        rng (:obj: numpy.random.Generator): random number generator;
+            the global `numpy.random` state if None
+    """
+    def __init__(self, number_of_cards=NUMBER_OF_CARDS, shuffled=False,
+                 number_of_players=None, rng=None):
+        self.number_of_cards = number_of_cards
+        self.shuffled = shuffled
+        self.number_of_players = number_of_players
+        self.rng = rng
+        if shuffled:
+            if number_of_players is None:
+                self.order = self._permutation(number_of_cards)
+                self.top = 0
+            else:
+                rng = self.rng if self.rng is not None \
+                    else np.random.default_rng(np.random.randint(2**31))
+                self.order = rng.permuted(
+                    np.tile(np.arange(number_of_cards),
+                            (number_of_players, 1)), axis=1)
+                self.top = np.zeros(number_of_players, dtype=np.int64)
+
+    def _permutation(self, n):
+        if self.rng is None:
+            return np.random.permutation(n)
+        return self.rng.permutation(n)
+
+    def _integers(self, size=None):
+        if self.rng is None:
+            return np.random.randint(0, self.number_of_cards, size=size)
+        return self.rng.integers(0, self.number_of_cards, size=size)
+
+    def draw(self, drawing=None):
+        """
+        Draw a card.
+
+        Args:
+            drawing (boolean array): for many players, which players
+                draw a card; all of them if None. Players that do not
+                draw keep their place in a shuffled deck.
+
+        Returns:
+            int or int array: the index of the card drawn, for every
+                player when there are many
+        """
+        if not self.shuffled:
+            return self._integers(self.number_of_players)
+        if self.number_of_players is None:
+            card = self.order[self.top]
+            self.top = (self.top + 1) % self.number_of_cards
+            return card
+        card = self.order[np.arange(self.number_of_players), self.top]
+        if drawing is None:
+            self.top = (self.top + 1) % self.number_of_cards
+        else:
+            self.top = np.where(drawing, (self.top + 1) % self.number_of_cards,
+                                self.top)
+        return card
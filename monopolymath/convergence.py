@@ -0,0 +1,156 @@
+"""
+Streaming estimates of the landing frequencies, with confidence
+intervals that account for the correlation between successive moves,
+so that a simulation can stop as soon as it has converged.
+"""
+from statistics import NormalDist
+import numpy as np
+from .batchmover import BatchRollMover
+
+class ConvergenceMonitor(object):
+    """
+    Running landing frequencies with batch-means confidence intervals.
+
+    The simulation is fed in chunks, for instance the landings of many
+    players over a number of turns. Each chunk is one batch: moves are
+    correlated within a batch, but the means of batches that are long
+    compared to the time it takes to forget the starting space are
+    nearly independent, so their spread gives the standard error.
+
+    Args:
+        number_of_spaces (int): number of spaces on the board
+        tolerance (float): the half-width of the confidence interval
+            that every space must reach for convergence
+        confidence (float): confidence level of the intervals
+        minimum_batches (int): number of batches needed before the
+            intervals are trusted
+    """
+    def __init__(self, number_of_spaces=40, tolerance=1e-3, confidence=0.95,
+                 minimum_batches=20):
+        self.number_of_spaces = number_of_spaces
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.minimum_batches = minimum_batches
+        self.z = NormalDist().inv_cdf(0.5 + confidence/2.)
+        self.space_visits = np.zeros(number_of_spaces)
+        self.number_of_batches = 0
+        #Running mean and sum of squared deviations of the batch means
+        self._batch_mean = np.zeros(number_of_spaces)
+        self._batch_M2 = np.zeros(number_of_spaces)
+
+    def update(self, visits) -> bool:
+        """
+        Add one batch of landings.
+
+        Args:
+            visits (float array): landings on each space in the batch
+
+        Returns:
+            bool: whether the frequencies have converged
+        """
+        visits = np.asarray(visits, dtype=float)
+        total = visits.sum()
+        if total <= 0:
+            raise Exception("A batch must contain at least one move.")
+        self.space_visits += visits
+        self.number_of_batches += 1
+        frequency = visits/total
+        delta = frequency - self._batch_mean
+        self._batch_mean += delta/self.number_of_batches
+        self._batch_M2 += delta*(frequency - self._batch_mean)
+        return self.converged()
+
+    def get_total_number_of_moves(self) -> int:
+        return np.sum(self.space_visits)
+
+    def frequencies(self) -> np.ndarray:
+        """
+        The landing frequency of each space so far.
+        """
+        return self.space_visits/self.get_total_number_of_moves()
+
+    def standard_errors(self) -> np.ndarray:
+        """
+        The batch-means standard error of each frequency.
+        """
+        B = self.number_of_batches
+        if B < 2:
+            return np.full(self.number_of_spaces, np.inf)
+        return np.sqrt(self._batch_M2/(B - 1)/B)
+
+    def half_widths(self) -> np.ndarray:
+        """
+        The half-width of the confidence interval of each frequency.
+        """
+        return self.z*self.standard_errors()
+
+    def confidence_intervals(self) -> np.ndarray:
+        """
+        Returns:
+            float array: (spaces, 2) lower and upper interval bounds
+        """
+        f = self.frequencies()
+        h = self.half_widths()
+        return np.stack([f - h, f + h], axis=1)
+
+    def effective_sample_size(self) -> np.ndarray:
+        """
+        The number of independent moves that would give the same
+        standard error as the correlated moves simulated, per space.
+        """
+        f = self.frequencies()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return f*(1 - f)/self.standard_errors()**2
+
+    def converged(self) -> bool:
+        """
+        Whether every space is within the tolerance.
+        """
+        return self.number_of_batches >= self.minimum_batches and \
+            bool(np.all(self.half_widths() <= self.tolerance))
+
+def run_until_converged(diceroller, tolerance=1e-3, number_of_players=10000,
+                        turns_per_batch=50, burn_in_turns=50,
+                        max_batches=10000, number_of_spaces=40, rng=None,
+                        confidence=0.95, minimum_batches=20,
+                        instrumentation=None, rules=None):
+    """
+    Move a batch of players until the landing frequency of every space
+    is known to within a tolerance.
+
+    Args:
+        diceroller (:obj: DiceRoller): dice that the players roll
+        tolerance (float): half-width of the confidence intervals
+        number_of_players (int): number of players moved at once
+        turns_per_batch (int): number of turns in each batch
+        burn_in_turns (int): turns discarded at the start, while the
+            players still remember starting on Go
+        max_batches (int): the most batches to run if not converged
+        number_of_spaces (int): number of spaces on the board; that of
+            the rules if they are given
+        rng (:obj: numpy.random.Generator): random number generator
+        confidence (float): confidence level of the intervals
+        minimum_batches (int): number of batches needed before the
+            intervals are trusted
+        instrumentation (:obj: Instrumentation): optional counters of
+            the rules that fire, including during the burn in
+        rules (:obj: Rules): the house rules; the standard rules if None
+
+    Returns:
+        :obj: ConvergenceMonitor: the monitor holding the frequencies,
+            intervals and effective sample size; check `converged()`
+    """
+    if rules is not None:
+        number_of_spaces = rules.number_of_spaces
+    mover = BatchRollMover(diceroller, number_of_players, number_of_spaces,
+                           rng=rng, instrumentation=instrumentation,
+                           rules=rules)
+    monitor = ConvergenceMonitor(number_of_spaces, tolerance, confidence,
+                                 minimum_batches)
+    mover.run(burn_in_turns)
+    for _ in range(max_batches):
+        before = mover.space_visits.copy()
+        mover.run(turns_per_batch)
+        if monitor.update(mover.space_visits - before):
+            break
+    return monitor
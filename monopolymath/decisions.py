@@ -0,0 +1,243 @@
+"""
+When to build houses: the optimal building policy of a player owning a
+whole color group, found by value iteration over a Markov decision
+process.
+
+The state of the process is the development of the group, from
+unimproved up to hotels, and the player's cash on a grid of buckets.
+Each turn the player may build up any number of levels they can pay
+for, with houses bought evenly across the group. Then the opponents
+move, landing on the group with the board's landing probabilities and
+paying rent; the player collects their salary and pays their own
+expenses. A player who cannot pay sells houses back at half price, and
+goes bankrupt, ending the income of the group, when that is not enough.
+
+The value of a state is the expected discounted cash the group brings
+in: rents and refunds, less the price of the houses. The discount is
+the chance per turn that the game goes on. Every transition of the
+process is fixed by the state and the level built to, so it is
+compiled once into a matrix, and each iteration is a matrix-vector
+product and a maximum over the levels.
+"""
+import numpy as np
+from .economics import DEVELOPMENT_LEVELS, HOUSES_PER_LEVEL, rent_table
+from .gamesimulator import GO_SALARY, TAXES
+from .monopolyboard import KIND_CODES
+
+#The levels of a whole color group: unimproved, 1 to 4 houses, hotel
+GROUP_LEVELS = DEVELOPMENT_LEVELS[1:]
+
+def _distribution(amounts, probabilities):
+    #Merge equal amounts of a discrete distribution
+    amounts, inverse = np.unique(np.round(amounts, 6), return_inverse=True)
+    return amounts, np.bincount(inverse.ravel(),
+                                weights=np.ravel(probabilities))
+
+def income_distribution(rents, landing, number_of_opponents=1):
+    """
+    The distribution of the rent a group collects in one turn, when
+    every opponent moves once.
+
+    Args:
+        rents (float array): rent of each property of the group
+        landing (float array): probability of an opponent landing on
+            each property of the group
+        number_of_opponents (int): number of opponents moving each turn
+
+    Returns:
+        (float array, float array): the possible amounts collected and
+            their probabilities
+    """
+    amounts = np.append(0., rents)
+    probabilities = np.append(1. - np.sum(landing), landing)
+    total, p = np.zeros(1), np.ones(1)
+    for _ in range(number_of_opponents):
+        total, p = _distribution(total[:, None] + amounts[None, :],
+                                 p[:, None]*probabilities[None, :])
+    return total, p
+
+class BuildPolicy(object):
+    """
+    The optimal building policy of one color group.
+
+    Attributes:
+        group (int): the color group
+        spaces (int array): the properties of the group
+        cash (float array): the cash at each bucket
+        levels (list of str): the names of the development levels
+        values (float array): (levels, cash) expected discounted
+            cash of the group in every state
+        policy (int array): (levels, cash) the level to build up to in
+            every state
+        iterations (int): value iterations until convergence
+    """
+    def __init__(self, group, spaces, cash, values, policy, iterations):
+        self.group = group
+        self.spaces = spaces
+        self.cash = cash
+        self.levels = GROUP_LEVELS
+        self.values = values
+        self.policy = policy
+        self.iterations = iterations
+
+    def __repr__(self):
+        return "BuildPolicy(group=%d, thresholds=%s)"%(
+            self.group, self.thresholds().tolist())
+
+    def build_to(self, level: int, cash: float) -> int:
+        """
+        The level to build up to from a level with an amount of cash.
+        """
+        index = int(np.clip(np.searchsorted(self.cash, cash, side="right")
+                            - 1, 0, len(self.cash) - 1))
+        return int(self.policy[level, index])
+
+    def thresholds(self) -> np.ndarray:
+        """
+        The least cash with which the player builds beyond each level,
+        or infinity where they never do.
+
+        Returns:
+            float array: a threshold for every level
+        """
+        builds = self.policy > np.arange(len(self.levels))[:, None]
+        first = np.argmax(builds, axis=1)
+        return np.where(builds.any(axis=1), self.cash[first], np.inf)
+
+class _GroupProcess(object):
+    """
+    The compiled decision process of one color group: the expected
+    reward and the transitions after building up to each level, and
+    the levels that can be built to from every state.
+    """
+    def __init__(self, rents, landing, level_cost, number_of_opponents,
+                 cash, salary, expenses):
+        L = len(GROUP_LEVELS)
+        C = len(cash)
+        step = cash[1] - cash[0]
+        S = L*C
+        self.shape = (L, C)
+        self.reward = np.zeros(S)
+        self.P = np.zeros((S, S))
+        half = level_cost/2.
+        expense_amounts, expense_p = expenses
+        for level in range(L):
+            income, income_p = income_distribution(
+                rents[:, level], landing, number_of_opponents)
+            #Every combination of income and expenses
+            change = (income[:, None] - expense_amounts[None, :]).ravel() \
+                + salary
+            p = (income_p[:, None]*expense_p[None, :]).ravel()
+            x = cash[:, None] + change[None, :] #(cash, outcomes)
+            #Houses sold to pay what is owed, and whether that is enough
+            sold = np.where(x < 0, np.ceil(-x/half - 1e-9), 0).astype(int)
+            solvent = sold <= HOUSES_PER_LEVEL[1:][level]
+            x = np.clip(x + sold*half, 0, cash[-1])
+            new_level = level - sold
+            rows = level*C + np.repeat(np.arange(C), len(p))
+            f = x/step
+            low = np.minimum(np.floor(f).astype(int), C - 1)
+            high = np.minimum(low + 1, C - 1)
+            weight = f - low
+            probability = np.broadcast_to(p, x.shape)*solvent
+            for index, w in [(low, 1. - weight), (high, weight)]:
+                columns = np.where(solvent, new_level*C + index, 0)
+                np.add.at(self.P, (rows, columns.ravel()),
+                          (probability*w).ravel())
+            #Rent and refunds only count while the player is solvent
+            collected = np.repeat(income, len(expense_amounts))
+            self.reward[level*C:(level + 1)*C] = \
+                np.sum(probability*(collected[None, :] + sold*half), axis=1)
+        #Building from (level, cash) up to each target level
+        levels = np.arange(L)
+        cost = np.maximum(levels[None, :] - levels[:, None], 0)*level_cost
+        cost_buckets = np.ceil(cost/step - 1e-9).astype(int)
+        after = np.arange(C)[None, None, :] - cost_buckets[:, :, None]
+        self.allowed = (levels[None, :, None] >= levels[:, None, None]) & \
+            (after >= 0)
+        self.targets = levels[None, :, None]*C + np.maximum(after, 0)
+        self.cost = np.broadcast_to(cost[:, :, None], self.allowed.shape)
+
+    def q_values(self, values, discount) -> np.ndarray:
+        #(levels, target levels, cash)
+        W = self.reward + discount*(self.P @ values.ravel())
+        return np.where(self.allowed, W[self.targets] - self.cost, -np.inf)
+
+def _group_properties(board):
+    properties = board.kind_codes == KIND_CODES["Property"]
+    return [(int(g), np.flatnonzero(properties & (board.groups == g)))
+            for g in np.unique(board.groups[properties])]
+
+def optimal_build_policies(board, landing=None, number_of_opponents=1,
+                           discount=0.98, cash_step=50., max_cash=3000.,
+                           salary=None, expenses=None, tol=1e-6,
+                           max_iterations=10000, previous=None) -> dict:
+    """
+    The optimal building policy of every color group, by value
+    iteration.
+
+    Args:
+        board (:obj: MonopolyBoard): a board with dice assigned
+        landing (float array): probability of an opponent's move ending
+            on each space; the board's stationary distribution if None
+        number_of_opponents (int): number of opponents moving each turn
+        discount (float): the probability that the game goes on for
+            another turn
+        cash_step (float): width of a cash bucket; the default divides
+            the price of every level of the standard board exactly
+        max_cash (float): the most cash tracked; more counts as this
+        salary (float): cash the player collects each turn; the salary
+            for passing Go times the chance of passing it if None
+        expenses ((float array, float array)): the amounts the player
+            may have to pay each turn, e.g. in rents and taxes, and
+            their probabilities; the taxes of the spaces they land on
+            if None
+        tol (float): largest change of a value at convergence
+        max_iterations (int): the most value iterations
+        previous (dict): policies of a similar problem, e.g. from a
+            slightly different landing distribution, whose values the
+            iteration starts from
+
+    Returns:
+        dict: the `BuildPolicy` of each color group, by group
+    """
+    if not 0 < discount < 1:
+        raise Exception("The discount must be between 0 and 1.")
+    if landing is None:
+        landing = board.stationary_distribution()
+    landing = np.asarray(landing, dtype=float)
+    if salary is None:
+        dice = board.diceroller
+        mean_roll = np.dot(dice.get_possible_rolls(),
+                           dice.probability_array())
+        salary = GO_SALARY*mean_roll/board.number_of_spaces
+    if expenses is None:
+        taxed = [space for space in TAXES if space < len(landing)]
+        p = landing[taxed]
+        expenses = (np.append(0., [TAXES[s] for s in taxed]),
+                    np.append(1. - p.sum(), p))
+    expenses = (np.atleast_1d(np.asarray(expenses[0], dtype=float)),
+                np.atleast_1d(np.asarray(expenses[1], dtype=float)))
+    cash = np.arange(0., max_cash + cash_step/2., cash_step)
+    rents = rent_table(board)[:, 1:]
+    policies = {}
+    for group, spaces in _group_properties(board):
+        level_cost = board.house_costs[spaces].sum()
+        process = _GroupProcess(rents[spaces], landing[spaces], level_cost,
+                                number_of_opponents, cash, salary, expenses)
+        values = np.zeros(process.shape)
+        if previous is not None and group in previous:
+            values = previous[group].values.copy()
+        for iteration in range(1, max_iterations + 1):
+            q = process.q_values(values, discount)
+            new_values = q.max(axis=1)
+            change = np.abs(new_values - values).max()
+            values = new_values
+            if change < tol:
+                break
+        else:
+            raise Exception("Value iteration did not converge in "+\
+                            "%d iterations."%max_iterations)
+        policies[group] = BuildPolicy(group, spaces, cash, values,
+                                      np.argmax(q, axis=1), iteration)
+    return policies
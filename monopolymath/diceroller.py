@@ -1,8 +1,50 @@
 """
 A tool used to simulate a player playing the game Monopoly. This tool tracks the rolls that the player makes.
 """
+from functools import lru_cache
 import numpy as np
 
+#Pools of at least this many dice are combined with FFTs
+#rather than by direct convolution
+FFT_MINIMUM_DICE = 16
+
+@lru_cache(maxsize=None)
+def _roll_distribution(dice):
+    """
+    The distribution of the total of a set of dice, memoized per
+    dice configuration. Totals start at the number of dice.
+
+    Args:
+        dice (tuple of ints): sorted sides of every die
+
+    Returns:
+        (float array, float array): probability of each total, and
+            the part of that probability from rolling doubles
+    """
+    number = len(dice)
+    N_totals = sum(dice) - number + 1
+    if number < FFT_MINIMUM_DICE:
+        probability = np.ones(1)
+        for sides in dice:
+            probability = np.convolve(probability, np.ones(sides)/sides)
+    else:
+        #Multiply the transforms of each distinct die
+        transform = np.ones(N_totals//2 + 1, dtype=complex)
+        sides, counts = np.unique(dice, return_counts=True)
+        for s, count in zip(sides, counts):
+            transform *= np.fft.rfft(np.ones(s)/s, N_totals)**count
+        probability = np.fft.irfft(transform, N_totals)
+        probability = np.clip(probability, 0, None)
+        probability /= probability.sum()
+    #All dice show the same face v, for a total of number*v
+    doubles = np.zeros(N_totals)
+    faces = np.arange(1, min(dice) + 1)
+    doubles[number*faces - number] = 1./np.prod(np.array(dice, dtype=float))
+    doubles = np.minimum(doubles, probability)
+    probability.setflags(write=False)
+    doubles.setflags(write=False)
+    return probability, doubles
+
 class DiceRoller(object):
     """
     An object used to roll the dice during the game.
@@ -11,12 +53,18 @@ class DiceRoller(object):
         sides (int): number of sides on the dice to roll
         number (int): number of dice to roll
         dice_array (list of ints): a specialized array of dice
+        rng (:obj: numpy.random.Generator): random number generator;
+            the global `numpy.random` state if None
+        buffer_size (int): number of rolls drawn at once ahead of time
+            and handed out one by one; every roll is drawn when it is
+            made if 0
 
     Returns:
         (int, list of ints, boolean): total of rolls, list of rolls, 
             and whether doubles were rolled
     """
-    def __init__(self, sides=6, number=2, dice_array=None):
+    def __init__(self, sides=6, number=2, dice_array=None, rng=None,
+                 buffer_size=0):
         if type(sides) is not int:
             raise Exception("'sides' must be an integer.")
         if type(number) is not int:
@@ -24,9 +72,15 @@ class DiceRoller(object):
         self.sides = sides
         self.number = number
         self.dice_array = dice_array
+        self.rng = rng
         if self.dice_array is not None:
             self.sides = -1
             self.number = len(dice_array)
+        if type(buffer_size) is not int or buffer_size < 0:
+            raise Exception("'buffer_size' must be a non-negative integer.")
+        self.buffer_size = buffer_size
+        self._buffer_position = 0
+        self._totals = self._rolls = self._doubles = []
 
     def minimum_roll(self):
         """
@@ -55,21 +109,55 @@ class DiceRoller(object):
         each dice of sides self.sides for each self.number of dice,
         or a dice of each integer in the self.dice_array list.
         """
+        if self.buffer_size:
+            i = self._buffer_position
+            if i == len(self._doubles):
+                self._fill_buffer()
+                i = 0
+            self._buffer_position = i + 1
+            return self._totals[i], self._rolls[i], self._doubles[i]
         rolls = []
+        randint = np.random.randint if self.rng is None else self.rng.integers
         if self.dice_array is not None:
             for dice in self.dice_array:
-                rolls.append(np.random.randint(1, dice+1))
+                rolls.append(randint(1, dice+1))
         else:
             for _ in range(0,self.number):
-                rolls.append(np.random.randint(1, self.sides+1))
+                rolls.append(randint(1, self.sides+1))
         #Fast way from stack overflow to determine if all
         #entries in "rolls" are equal, i.e. when doubles are rolled
         #but for arbitrary number of dice
         doubles = not rolls or [rolls[0]]*len(rolls) == rolls
         return np.sum(rolls), rolls, doubles
 
+    def _fill_buffer(self) -> None:
+        """
+        Draw the next `buffer_size` rolls at once, and keep them as
+        lists, which are the fastest to hand out one at a time.
+        """
+        if self.dice_array is not None:
+            high = np.asarray(self.dice_array) + 1
+        else:
+            high = np.full(self.number, self.sides + 1)
+        size = (self.buffer_size, self.number)
+        if self.rng is None:
+            dice = np.random.randint(1, high, size=size)
+        else:
+            dice = self.rng.integers(1, high, size=size)
+        #Totals stay numpy integers, like the sums of unbuffered rolls
+        self._totals = dice.sum(axis=1)
+        self._rolls = dice.tolist()
+        self._doubles = np.all(dice == dice[:, :1], axis=1).tolist()
+        self._buffer_position = 0
+        return
+
     def get_possible_rolls(self):
-        return np.arange(self.number, self.number*self.sides+1)
+        return np.arange(self.minimum_roll(), self.maximum_roll()+1)
+
+    def _dice(self):
+        if self.dice_array is not None:
+            return tuple(sorted(int(dice) for dice in self.dice_array))
+        return (self.sides,)*self.number
 
     def probability_array(self, unnormalized=False):
         """
@@ -80,16 +168,27 @@ class DiceRoller(object):
         Returns:
             float array: Probability of each possible roll.
         """
-        if self.dice_array is not None:
-            raise Exception("P-array when using a dice_array not implemented yet.")
-        else:
-            if (self.sides is not 6) or (self.number is not 2):
-                raise Exception("Anything but two six-sided dice not supported yet.")
-            N_combinations = self.sides**self.number
-            #Hack for 2d6
-            combinations = np.array([1,2,3,4,5,6,5,4,3,2,1])
-            probability = combinations/float(N_combinations)
+        dice = self._dice()
+        probability, _ = _roll_distribution(dice)
+        N_combinations = int(np.prod(dice, dtype=object))
         self.N_combinations = N_combinations
         if unnormalized:
-            probability = combinations #don't do the divide
-        return probability
+            #The number of combinations giving each roll
+            probability = probability*N_combinations
+            if N_combinations < 2**53:
+                probability = np.rint(probability)
+            return probability
+        return probability.copy()
+
+    def split_probability_array(self):
+        """
+        Return the probability of each number that can be rolled,
+        split into rolls that are not doubles and rolls that are.
+        The two arrays sum to the `probability_array()`.
+
+        Returns:
+            (float array, float array): Probability of each possible
+                roll without doubles, and with doubles.
+        """
+        probability, doubles = _roll_distribution(self._dice())
+        return probability - doubles, doubles.copy()
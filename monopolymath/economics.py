@@ -0,0 +1,172 @@
+"""
+The economics of owning spaces: expected rent, income and how many
+turns it takes for a purchase to pay for itself. Everything is computed
+from the columns of a `MonopolyBoard` and a landing distribution with
+whole-board array operations. Landing distributions can be stacked
+along leading axes, e.g. one per dice or rule variant, and every result
+gains the same leading axes.
+"""
+import numpy as np
+from .monopolyboard import KIND_CODES, RAILROAD_GROUP, UTILITY_GROUP
+
+#Development levels of a property: unimproved, unimproved with the
+#whole color group owned (double rent), 1 to 4 houses, and a hotel
+DEVELOPMENT_LEVELS = ["rent", "monopoly", "1 house", "2 houses",
+                      "3 houses", "4 houses", "hotel"]
+#Number of houses bought to reach each development level
+HOUSES_PER_LEVEL = np.array([0, 0, 1, 2, 3, 4, 5])
+#Utility rent per pip rolled with 1 or 2 utilities owned
+UTILITY_MULTIPLIERS = np.array([4., 10.])
+
+def rent_table(board) -> np.ndarray:
+    """
+    The rent of every property at every development level.
+
+    Args:
+        board (:obj: MonopolyBoard): the board
+
+    Returns:
+        float array: (spaces, levels) rents, zero for other spaces
+    """
+    return np.concatenate([board.rents[:, None], 2*board.rents[:, None],
+                           board.building_rents], axis=1)
+
+def development_costs(board) -> np.ndarray:
+    """
+    The total cost of buying every property and developing it
+    to each level.
+
+    Returns:
+        float array: (spaces, levels) costs, zero for other spaces
+    """
+    properties = board.kind_codes == KIND_CODES["Property"]
+    costs = board.costs[:, None] + \
+        board.house_costs[:, None]*HOUSES_PER_LEVEL[None, :]
+    return costs*properties[:, None]
+
+def group_matrix(board) -> np.ndarray:
+    """
+    One-hot matrix of the color group of each property.
+
+    Returns:
+        float array: (spaces, color groups) matrix
+    """
+    properties = board.kind_codes == KIND_CODES["Property"]
+    groups = np.unique(board.groups[properties])
+    return ((board.groups[:, None] == groups[None, :]) &
+            properties[:, None]).astype(float)
+
+def expected_rents(board, landing) -> np.ndarray:
+    """
+    The expected rent collected by each property at each development
+    level per opponent move, i.e. the rent times the probability
+    that a move ends on the property.
+
+    Args:
+        board (:obj: MonopolyBoard): the board
+        landing (float array): (..., spaces) landing probabilities
+
+    Returns:
+        float array: (..., spaces, levels) expected rents
+    """
+    landing = np.asarray(landing)
+    return landing[..., :, None]*rent_table(board)
+
+def railroad_income(board, landing) -> np.ndarray:
+    """
+    The expected rent collected by each railroad per opponent
+    move when 1 to 4 railroads are owned.
+
+    Returns:
+        float array: (..., spaces, 4) expected rents, zero for
+            spaces that are not railroads
+    """
+    landing = np.asarray(landing)
+    return landing[..., :, None]*board.RR_rents
+
+def utility_income(board, landing, diceroller) -> np.ndarray:
+    """
+    The expected rent collected by each utility per opponent move
+    when 1 or 2 utilities are owned. The rent is a multiple of the
+    roll, which is taken to be the mean roll of the dice.
+
+    Args:
+        board (:obj: MonopolyBoard): the board
+        landing (float array): (..., spaces) landing probabilities
+        diceroller (:obj: DiceRoller): the dice that are rolled
+
+    Returns:
+        float array: (..., spaces, 2) expected rents, zero for
+            spaces that are not utilities
+    """
+    landing = np.asarray(landing)
+    mean_roll = np.dot(diceroller.get_possible_rolls(),
+                       diceroller.probability_array())
+    utilities = board.kind_codes == KIND_CODES["Utility"]
+    rents = utilities[:, None]*UTILITY_MULTIPLIERS[None, :]*mean_roll
+    return landing[..., :, None]*rents
+
+def group_income(board, landing) -> np.ndarray:
+    """
+    The expected rent collected by each whole color group per opponent
+    move, with every property at the same development level.
+
+    Returns:
+        float array: (..., color groups, levels) expected rents
+    """
+    return np.einsum("...sl,sg->...gl", expected_rents(board, landing),
+                     group_matrix(board))
+
+def break_even_turns(board, landing, number_of_opponents=1) -> np.ndarray:
+    """
+    The number of turns for each color group, fully developed to each
+    level, to collect as much rent as it cost. Each turn every opponent
+    makes one move. The unimproved level assumes only one property of
+    the group is owned, so it is the break-even of the group's best
+    single property.
+
+    Args:
+        board (:obj: MonopolyBoard): the board
+        landing (float array): (..., spaces) landing probabilities
+        number_of_opponents (int): number of opponents moving each turn
+
+    Returns:
+        float array: (..., color groups, levels) turns to break even
+    """
+    G = group_matrix(board)
+    income = number_of_opponents*group_income(board, landing)
+    costs = G.T @ development_costs(board) #(groups, levels)
+    #A single unimproved property, rather than the whole group
+    single = expected_rents(board, landing)[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        single_turns = board.costs/(number_of_opponents*single)
+        single_turns = np.where(G.T > 0, single_turns[..., None, :], np.inf)
+        turns = costs/income
+    turns[..., 0] = single_turns.min(axis=-1)
+    return turns
+
+def railroad_break_even_turns(board, landing, number_of_opponents=1):
+    """
+    The number of turns for all the railroads, when all are
+    owned, to pay for themselves.
+
+    Returns:
+        float array: turns, with the leading axes of the landing
+    """
+    railroads = board.groups == RAILROAD_GROUP
+    income = railroad_income(board, landing)[..., railroads, -1].sum(axis=-1)
+    return board.costs[railroads].sum()/(number_of_opponents*income)
+
+def utility_break_even_turns(board, landing, diceroller,
+                             number_of_opponents=1):
+    """
+    The number of turns for all the utilities, when all are owned,
+    to pay for themselves.
+
+    Returns:
+        float array: turns, with the leading axes of the landing
+    """
+    utilities = board.groups == UTILITY_GROUP
+    income = utility_income(board, landing,
+                            diceroller)[..., utilities, -1].sum(axis=-1)
+    return board.costs[utilities].sum()/(number_of_opponents*income)
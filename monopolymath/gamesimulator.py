@@ -0,0 +1,297 @@
+"""
+A simulator of complete games of monopoly between 2 to 8 players. Many
+games are played at once: the state of every game is held in numpy
+arrays, and each step the current player of every game makes one move
+with the rules of the `BatchRollMover`, then buys, pays rent or builds.
+
+The rules are simplified: players always buy what they can afford,
+build one house at a time evenly on their complete color groups, sell
+their houses back at half price when short of cash and go bankrupt
+when that is not enough. Chance and community chest cards only move
+players, and there are no trades, auctions or mortgages.
+"""
+import time
+import numpy as np
+from .batchmover import BatchRollMover
+from .monopolyboard import KIND_CODES
+from .economics import UTILITY_MULTIPLIERS
+
+#Taxes charged on landing on a space
+TAXES = {4: 200., 38: 100.}
+#Salary for passing Go, and the fine for leaving jail after three rolls
+GO_SALARY = 200.
+JAIL_FINE = 50.
+MAXIMUM_HOUSES = 5 #a hotel
+
+class GameSimulator(object):
+    """
+    Plays many games of monopoly at once, by the house rules the
+    board's dice were assigned with.
+
+    Args:
+        board (:obj: MonopolyBoard): the board; dice must be assigned
+        number_of_games (int): number of games played at once
+        number_of_players (int): number of players in each game, 2 to 8
+        starting_cash (float): cash each player starts with
+        buy_reserve (float): cash a player keeps after buying a space
+        build_reserve (float): cash a player keeps after building
+        rng (:obj: numpy.random.Generator): random number generator
+    """
+    def __init__(self, board, number_of_games, number_of_players=4,
+                 starting_cash=1500., buy_reserve=0., build_reserve=200.,
+                 rng=None):
+        if not hasattr(board, "diceroller"):
+            raise Exception("Must assign dice to the board before "+\
+                            "simulating games.")
+        if not 2 <= number_of_players <= 8:
+            raise Exception("Games must have 2 to 8 players.")
+        G = number_of_games
+        P = number_of_players
+        N = board.number_of_spaces
+        self.board = board
+        self.number_of_games = G
+        self.number_of_players = P
+        self.buy_reserve = buy_reserve
+        self.build_reserve = build_reserve
+        #The house rules the dice were assigned with
+        self.rules = board.rules
+        self.mover = BatchRollMover(board.diceroller, G, N, rng=rng,
+                                    rules=self.rules)
+        self.rng = self.mover.rng
+
+        #Board columns used every step
+        kinds = board.kind_codes
+        self._purchasable = kinds != KIND_CODES["Blank"]
+        self._is_property = kinds == KIND_CODES["Property"]
+        self._is_railroad = kinds == KIND_CODES["Railroad"]
+        self._is_utility = kinds == KIND_CODES["Utility"]
+        self._taxes = np.zeros(N)
+        for space, tax in TAXES.items():
+            self._taxes[space] = tax
+        #Rent by number of houses, where 0 houses is the base rent
+        self._property_rents = np.concatenate([board.rents[:, None],
+                                               board.building_rents], axis=1)
+        #Groups of every space (-1 for blank spaces) and their sizes
+        self._groups = board.groups
+        self._group_sizes = np.bincount(board.groups[board.groups >= 0])
+        self._railroad_group = board.groups[self._is_railroad][0]
+        self._utility_group = board.groups[self._is_utility][0]
+        self._color_groups = np.isin(np.arange(len(self._group_sizes)),
+                                     board.groups[self._is_property])
+
+        #The state of every game
+        self.position = np.zeros((G, P), dtype=np.int64)
+        self.N_doubles = np.zeros((G, P), dtype=np.int64)
+        self.in_jail = np.zeros((G, P), dtype=bool)
+        self.time_in_jail = np.zeros((G, P), dtype=np.int64)
+        self.cash = np.full((G, P), float(starting_cash))
+        self.alive = np.ones((G, P), dtype=bool)
+        self.owner = np.full((G, N), -1, dtype=np.int64)
+        #Number of spaces of each group owned by each player
+        self.group_counts = np.zeros((G, P, len(self._group_sizes)),
+                                     dtype=np.int64)
+        self.houses = np.zeros((G, N), dtype=np.int64)
+        self.current_player = np.zeros(G, dtype=np.int64)
+        self.finished = np.zeros(G, dtype=bool)
+        self.game_length = np.zeros(G, dtype=np.int64)
+        self.winner = np.full(G, -1, dtype=np.int64)
+
+    def _complete_groups(self, games, player) -> np.ndarray:
+        """
+        Whether each player owns the whole of each group.
+
+        Returns:
+            boolean array: (games, groups)
+        """
+        return self.group_counts[games, player] == self._group_sizes
+
+    def step(self) -> None:
+        """
+        The current player of every unfinished game makes one move.
+        """
+        games = np.arange(self.number_of_games)
+        active = ~self.finished
+        player = self.current_player
+        mover = self.mover
+        cash = self.cash
+
+        #Move with the rules of the batch roll mover
+        was_in_jail = self.in_jail[games, player]
+        mover.position = self.position[games, player]
+        mover.N_doubles = self.N_doubles[games, player]
+        mover.in_jail = was_in_jail
+        mover.time_in_jail = self.time_in_jail[games, player]
+        space = mover.update_positions()
+        moving = games[active]
+        self.position[moving, player[active]] = space[active]
+        self.N_doubles[moving, player[active]] = mover.N_doubles[active]
+        self.in_jail[moving, player[active]] = mover.in_jail[active]
+        self.time_in_jail[moving, player[active]] = \
+            mover.time_in_jail[active]
+        self.game_length += active
+
+        #Go, jail fines and taxes
+        payment = np.where(mover.passed_go, -GO_SALARY, 0.)
+        if self.rules.jail_strategy == "pay":
+            #Every player leaving jail has paid
+            fined = was_in_jail
+        else:
+            #Players let out after their last turn in jail pay
+            fined = was_in_jail & (space == self.rules.visiting_position)
+        payment += np.where(fined, JAIL_FINE, 0.)
+        payment += self._taxes[space]
+
+        #Rent to the owner of the space
+        owner = self.owner[games, space]
+        renting = active & (owner >= 0) & (owner != player)
+        counts = self.group_counts[games, np.maximum(owner, 0)]
+        group = self._groups[space]
+        houses = self.houses[games, space]
+        rent = self._property_rents[space, houses]
+        doubled = self._is_property[space] & (houses == 0) & \
+            (counts[games, group] == self._group_sizes[group])
+        rent = np.where(doubled, 2*rent, rent)
+        railroads = np.maximum(counts[:, self._railroad_group], 1)
+        rent = np.where(self._is_railroad[space],
+                        self.board.RR_rents[space, railroads - 1], rent)
+        utilities = np.maximum(counts[:, self._utility_group], 1)
+        rent = np.where(self._is_utility[space],
+                        UTILITY_MULTIPLIERS[utilities - 1]*mover.roll_totals,
+                        rent)
+        rent = np.where(renting, rent, 0.)
+        payment = np.where(active, payment, 0.)
+        cash[games, player] -= payment + rent
+        #Houses are sold to pay, and the owner gets what the player
+        #could pay in the end
+        shortfall = self._resolve_debts(games, active, player)
+        paid = np.maximum(rent - shortfall, 0.)
+        np.add.at(cash, (games[renting], owner[renting]), paid[renting])
+
+        #Buy the space
+        cost = self.board.costs[space]
+        buying = active & (owner < 0) & self._purchasable[space] & \
+            (cash[games, player] - cost >= self.buy_reserve)
+        self.owner[games[buying], space[buying]] = player[buying]
+        self.group_counts[games[buying], player[buying], group[buying]] += 1
+        cash[games[buying], player[buying]] -= cost[buying]
+
+        self._build(games, active, player)
+
+        #Doubles roll again, unless in jail or bankrupt
+        again = mover.doubles & ~mover.in_jail & \
+            self.alive[games, player]
+        P = self.number_of_players
+        order = (player[:, None] + np.arange(1, P + 1)[None, :]) % P
+        following = order[games, np.argmax(self.alive[games[:, None], order],
+                                           axis=1)]
+        self.current_player = np.where(active & ~again, following, player)
+
+        #A game ends when only one player is left
+        done = active & (self.alive.sum(axis=1) <= 1)
+        self.winner[done] = np.argmax(self.alive[done], axis=1)
+        self.finished |= done
+        return
+
+    def _build(self, games, active, player) -> None:
+        """
+        The current player builds one house on the least developed
+        property of their complete color groups, if they can afford it.
+        """
+        complete = self._complete_groups(games, player) & \
+            self._color_groups
+        builders = games[active & complete.any(axis=1)]
+        if len(builders) == 0:
+            return
+        player = player[builders]
+        houses = self.houses[builders]
+        candidates = complete[builders][:, self._groups] & \
+            self._is_property & (self.owner[builders] == player[:, None]) & \
+            (houses < MAXIMUM_HOUSES)
+        #Least developed first, then the most valuable
+        score = np.where(candidates, houses*10**6 - self.board.costs, np.inf)
+        choice = np.argmin(score, axis=1)
+        house_cost = self.board.house_costs[choice]
+        building = candidates[np.arange(len(builders)), choice] & \
+            (self.cash[builders, player] - house_cost >= self.build_reserve)
+        self.houses[builders[building], choice[building]] += 1
+        self.cash[builders[building], player[building]] -= \
+            house_cost[building]
+        return
+
+    def _resolve_debts(self, games, active, player) -> np.ndarray:
+        """
+        Players in debt sell houses at half price, one at a time from
+        their most developed properties, until they are out of debt.
+        They go bankrupt if selling every house is not enough,
+        returning their spaces to the bank.
+
+        Returns:
+            float array: the debt left unpaid in each game, by players
+                going bankrupt
+        """
+        shortfall = np.zeros(self.number_of_games)
+        debtors = games[active & (self.cash[games, player] < 0)]
+        if len(debtors) == 0:
+            return shortfall
+        player = player[debtors]
+        owned = self.owner[debtors] == player[:, None]
+        houses = self.houses[debtors]
+        refunds = self.board.house_costs/2
+        rows = np.arange(len(debtors))
+        for _ in range(MAXIMUM_HOUSES*len(refunds)):
+            selling = (self.cash[debtors, player] < 0) & \
+                np.any(owned & (houses > 0), axis=1)
+            if not selling.any():
+                break
+            #The most developed property, then the most valuable
+            score = np.where(owned, houses*10**6 + self.board.costs, -1)
+            choice = np.argmax(score, axis=1)
+            houses[rows[selling], choice[selling]] -= 1
+            self.cash[debtors[selling], player[selling]] += \
+                refunds[choice[selling]]
+        self.houses[debtors] = houses
+        bankrupt = self.cash[debtors, player] < 0
+        owners = self.owner[debtors]
+        owners[owned & bankrupt[:, None]] = -1
+        self.owner[debtors] = owners
+        debtors, player = debtors[bankrupt], player[bankrupt]
+        shortfall[debtors] = -self.cash[debtors, player]
+        self.alive[debtors, player] = False
+        self.cash[debtors, player] = 0.
+        self.group_counts[debtors, player] = 0
+        return shortfall
+
+    def run(self, max_moves=2000, record_every=10) -> dict:
+        """
+        Play until every game is over or `max_moves` moves have been
+        made in each. Games still going at the end have no winner.
+
+        Args:
+            max_moves (int): the most moves made in each game
+            record_every (int): steps between snapshots of the cash
+
+        Returns:
+            dict: the results of the games, with entries
+                "game_length" (int array): moves made in each game
+                "winner" (int array): the winning player, or -1
+                "win_rates" (float array): fraction of games won by
+                    each seat, over all games
+                "cash" (float array): (snapshots, games, players) cash
+                "games_per_second" (float): throughput of the run
+        """
+        start = time.perf_counter()
+        snapshots = [self.cash.copy()]
+        for step in range(1, max_moves + 1):
+            self.step()
+            if step % record_every == 0:
+                snapshots.append(self.cash.copy())
+            if np.all(self.finished):
+                break
+        elapsed = time.perf_counter() - start
+        won = self.winner[self.winner >= 0]
+        return {"game_length": self.game_length.copy(),
+                "winner": self.winner.copy(),
+                "win_rates": np.bincount(won, minlength=self.number_of_players)
+                             /float(self.number_of_games),
+                "cash": np.array(snapshots),
+                "games_per_second": self.number_of_games/elapsed}
@@ -0,0 +1,218 @@
+"""
+Keeping the stationary distribution of a Markov chain up to date
+through small edits of the transition matrix, such as changing where
+one card sends a player, without solving for it again.
+
+Most rule edits change only a few columns or rows of the transition
+matrix T, so the change is E = U V^T with U and V of low rank k. The
+fundamental matrix Z = (I - T + 1 pi^T)^-1 turns the new stationary
+distribution into a Woodbury update of size k:
+
+    pi'^T = pi^T + (pi^T U) (I - V^T Z U)^-1 V^T Z
+
+which costs O(k S^2) for S states instead of O(S^3). Z itself is
+updated the same way, so edits can follow one another. Edits of high
+rank, and matrices after many updates, are solved again from scratch.
+"""
+import numpy as np
+from . import markovchain
+
+def low_rank_factors(E, tol=0.):
+    """
+    Factor a change of a matrix as E = U V^T, by the columns or by the
+    rows that change, whichever are fewer.
+
+    Args:
+        E (float array): (states, states) change of the matrix
+        tol (float): entries at most this large count as unchanged
+
+    Returns:
+        (float array, float array): (states, k) U and V
+    """
+    changed = np.abs(E) > tol
+    columns = np.flatnonzero(changed.any(axis=0))
+    rows = np.flatnonzero(changed.any(axis=1))
+    identity = np.identity(len(E))
+    if len(columns) <= len(rows):
+        return E[:, columns], identity[:, columns]
+    return identity[:, rows], E[rows].T
+
+class IncrementalChain(object):
+    """
+    The stationary distribution and fundamental matrix of a chain,
+    updated in place as its transition matrix is edited.
+
+    Args:
+        T (float array): (states, states) transition matrix
+        max_rank (int): edits of higher rank are solved from scratch;
+            a quarter of the number of states if None
+        refresh_every (int): number of updates after which the
+            solution is computed from scratch, so that rounding errors
+            cannot build up
+    """
+    def __init__(self, T, max_rank=None, refresh_every=1000):
+        if markovchain._is_sparse(T):
+            T = T.toarray()
+        self.T = np.array(T, dtype=float)
+        S = len(self.T)
+        self.max_rank = S//4 if max_rank is None else max_rank
+        self.refresh_every = refresh_every
+        self._ones = np.ones(S)
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Solve for the stationary distribution and fundamental matrix
+        from scratch.
+        """
+        self.pi = markovchain.stationary_distribution(self.T)
+        S = len(self.T)
+        self.Z = np.linalg.inv(np.identity(S) - self.T +
+                               np.outer(self._ones, self.pi))
+        self.number_of_updates = 0
+        return
+
+    def _woodbury(self, U, V):
+        #The new pi for T + U V^T, and what Z needs for its own update
+        ZU = self.Z @ U
+        VZ = V.T @ self.Z
+        core = np.identity(U.shape[1]) - V.T @ ZU
+        pi = self.pi + (self.pi @ U) @ np.linalg.solve(core, VZ)
+        return pi
+
+    def stationary_distribution(self, T_new) -> np.ndarray:
+        """
+        The stationary distribution of an edited transition matrix,
+        without changing the chain.
+
+        Args:
+            T_new (float array): the edited transition matrix
+
+        Returns:
+            float array: the stationary distribution
+        """
+        U, V = low_rank_factors(np.asarray(T_new) - self.T)
+        if U.shape[1] == 0:
+            return self.pi.copy()
+        if U.shape[1] > self.max_rank:
+            return markovchain.stationary_distribution(np.asarray(T_new))
+        return self._woodbury(U, V)
+
+    def update(self, T_new) -> np.ndarray:
+        """
+        Edit the transition matrix, updating the stationary
+        distribution and the fundamental matrix.
+
+        Args:
+            T_new (float array): the edited transition matrix
+
+        Returns:
+            float array: the new stationary distribution
+        """
+        T_new = np.array(T_new, dtype=float)
+        U, V = low_rank_factors(T_new - self.T)
+        return self.update_low_rank(U, V, T_new)
+
+    def update_low_rank(self, U, V, T_new=None) -> np.ndarray:
+        """
+        Add U V^T to the transition matrix, updating the stationary
+        distribution and the fundamental matrix.
+
+        Args:
+            U (float array): (states, k) left factor
+            V (float array): (states, k) right factor
+            T_new (float array): the edited matrix, if already known
+
+        Returns:
+            float array: the new stationary distribution
+        """
+        if T_new is None:
+            T_new = self.T + U @ V.T
+        self.T = T_new
+        k = U.shape[1]
+        if k == 0:
+            return self.pi
+        self.number_of_updates += 1
+        if k > self.max_rank or self.number_of_updates >= self.refresh_every:
+            self.refresh()
+            return self.pi
+        pi = self._woodbury(U, V)
+        #Z^-1 changes by -E + 1 (pi' - pi)^T, one more rank
+        U = np.concatenate([U, -self._ones[:, None]], axis=1)
+        V = np.concatenate([V, (pi - self.pi)[:, None]], axis=1)
+        ZU = self.Z @ U
+        core = np.identity(k + 1) - V.T @ ZU
+        self.Z = self.Z + ZU @ np.linalg.solve(core, V.T @ self.Z)
+        self.pi = pi
+        return self.pi
+
+    def warm_start(self, T_new, tol=1e-12, max_iterations=10000):
+        """
+        The stationary distribution of an edited transition matrix by
+        power iteration from the current solution, which is close to
+        the new one after a small edit. Suits sparse matrices, for which
+        the fundamental matrix would be too large.
+
+        Returns:
+            float array: the stationary distribution
+        """
+        return markovchain.stationary_distribution(
+            T_new, "power", tol, max_iterations, initial=self.pi)
+
+    def mean_first_passage_times(self) -> np.ndarray:
+        """
+        The expected number of steps to go from each state to each
+        other state, from the fundamental matrix; the diagonal holds
+        the expected return times, 1/pi.
+
+        Returns:
+            float array: (states, states) passage times from the row
+                state to the column state
+        """
+        Z = self.Z
+        with np.errstate(divide="ignore", invalid="ignore"):
+            M = (np.diag(Z)[None, :] - Z)/self.pi[None, :]
+            M[np.diag_indices_from(M)] = 1./self.pi
+        #States that are never visited are never reached
+        M[:, self.pi <= 0] = np.inf
+        return M
+
+def incremental_chain(board) -> IncrementalChain:
+    """
+    The incremental chain of the transition matrix of a board. It is
+    kept on the board and rebuilt when the matrix changes.
+    """
+    if not hasattr(board, "transition_matrix"):
+        raise Exception("Must assign dice to the board first.")
+    chain = getattr(board, "_incremental_chain", None)
+    if chain is None or chain.source is not board.transition_matrix:
+        chain = IncrementalChain(board.transition_matrix)
+        chain.source = board.transition_matrix
+        chain.rolls = markovchain.roll_matrices(board.diceroller,
+                                                board.number_of_spaces)
+        board._incremental_chain = chain
+    return chain
+
+def what_if(board, rules) -> np.ndarray:
+    """
+    The long-run probability of being on each space of a board if it
+    were played by other rules, e.g. with one card changed. The rules
+    must have the same states as those of the board: the same number
+    of doubles sending a player to jail and turns in jail.
+
+    Args:
+        board (:obj: MonopolyBoard): a board with dice assigned
+        rules (:obj: Rules): the edited rules
+
+    Returns:
+        float array: probability of being on each space
+    """
+    chain = incremental_chain(board)
+    positions = rules.state_positions()
+    if len(positions) != len(chain.T):
+        raise Exception("The rules must have the same states as those "+\
+                        "of the board.")
+    pi = chain.stationary_distribution(
+        rules.transition_matrix(board.diceroller, chain.rolls))
+    return np.bincount(positions, weights=pi,
+                       minlength=board.number_of_spaces)
@@ -0,0 +1,133 @@
+"""
+Counters of the rules that fire while players are moved, and hooks
+called with the time each turn took. An `Instrumentation` is handed to
+a roll mover to switch it on; movers without one skip all of it.
+"""
+import time
+import numpy as np
+from .cards import NUMBER_OF_CARDS
+
+class Instrumentation(object):
+    """
+    Counts of the rule events of moved players, and the time spent
+    moving them.
+
+    Args:
+        hooks (list of callables): functions called at the end of
+            every turn as `hook(seconds, positions)`, with the time the
+            turn took and the new position(s). For a batch of players
+            a turn is one roll of every player.
+
+    Attributes:
+        triple_doubles (int): players jailed for rolling three doubles
+        go_to_jail (int): rolls landing on Go To Jail
+        chance_draws (int array): draws of each chance card, with a
+            slot for every card of the largest deck moved with
+        community_chest_draws (int array): draws of each community
+            chest card, likewise
+        jail_exits_doubles (int): players leaving jail by rolling
+            doubles
+        jail_exits_paid (int): players leaving jail by paying, under
+            the "pay" jail strategy
+        jail_exits_timeout (int): players leaving jail after three turns
+        moves (int): number of moves made
+        turns (int): number of turns timed
+        turn_time (float): total time of the turns, in seconds
+    """
+    COUNTERS = ["triple_doubles", "go_to_jail", "jail_exits_doubles",
+                "jail_exits_paid", "jail_exits_timeout", "moves", "turns"]
+
+    def __init__(self, hooks=None):
+        self.hooks = list(hooks) if hooks is not None else []
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Set every counter back to zero.
+        """
+        for name in self.COUNTERS:
+            setattr(self, name, 0)
+        #Decks keep the sizes a mover gave them
+        chance_cards, community_chest_cards = getattr(
+            self, "deck_sizes", (NUMBER_OF_CARDS, NUMBER_OF_CARDS))
+        self.chance_draws = np.zeros(chance_cards, dtype=np.int64)
+        self.community_chest_draws = np.zeros(community_chest_cards,
+                                              dtype=np.int64)
+        self.deck_sizes = (chance_cards, community_chest_cards)
+        self.turn_time = 0.
+        return
+
+    def size_decks(self, chance_cards: int,
+                   community_chest_cards: int) -> None:
+        """
+        Make room in the draw counters for decks of some sizes. Called
+        by the movers, whose decks can have any number of cards.
+
+        Args:
+            chance_cards (int): number of chance cards
+            community_chest_cards (int): number of community chest cards
+        """
+        self.chance_draws = _padded(self.chance_draws, chance_cards)
+        self.community_chest_draws = _padded(self.community_chest_draws,
+                                             community_chest_cards)
+        self.deck_sizes = (len(self.chance_draws),
+                           len(self.community_chest_draws))
+        return
+
+    def begin_turn(self) -> float:
+        return time.perf_counter()
+
+    def end_turn(self, start: float, positions, number_of_moves=1) -> None:
+        """
+        Finish timing a turn that started at `start`, and call the hooks.
+
+        Args:
+            start (float): the value returned by `begin_turn()`
+            positions (int or int array): the new position(s)
+            number_of_moves (int): number of players moved in the turn
+        """
+        seconds = time.perf_counter() - start
+        self.moves += number_of_moves
+        self.turns += 1
+        self.turn_time += seconds
+        for hook in self.hooks:
+            hook(seconds, positions)
+        return
+
+    def merge(self, other):
+        """
+        Add the counts of another instrumentation, for instance one
+        filled in by a worker process.
+
+        Returns:
+            :obj: Instrumentation: this instrumentation
+        """
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        #Counters of decks of different sizes are padded with zeros
+        self.size_decks(len(other.chance_draws),
+                        len(other.community_chest_draws))
+        self.chance_draws[:len(other.chance_draws)] += other.chance_draws
+        self.community_chest_draws[:len(other.community_chest_draws)] += \
+            other.community_chest_draws
+        self.turn_time += other.turn_time
+        return self
+
+    def as_dict(self) -> dict:
+        """
+        Returns:
+            dict: every counter by name, and the mean time per turn
+        """
+        counts = {name: int(getattr(self, name)) for name in self.COUNTERS}
+        counts["chance_draws"] = self.chance_draws.copy()
+        counts["community_chest_draws"] = self.community_chest_draws.copy()
+        counts["turn_time"] = self.turn_time
+        counts["mean_turn_time"] = self.turn_time/max(self.turns, 1)
+        return counts
+
+
+def _padded(counts, size):
+    #Counts with at least `size` slots, the new ones zero
+    if len(counts) >= size:
+        return counts
+    return np.pad(counts, (0, size - len(counts)))
@@ -0,0 +1,357 @@
+"""
+A generic engine for moving players on any `Board` by rolling dice,
+with the jumps a board declares:
+
+- teleports, which always send a player landing on a space to another,
+  like the snakes and ladders of snakes and ladders, or go to jail;
+- random jumps, which send a player to one of several spaces with given
+  probabilities, like a deck of cards;
+- conditional jumps, which only happen for some roll totals, e.g. a
+  ladder that must be reached with an exact roll;
+- roll again spaces, where a player landing rolls and moves again in
+  the same turn.
+
+The declarations compile once into integer lookup tables: where a roll
+from each space ends up, and the outcomes of every random jump. The
+same tables drive a vectorized simulator of many players and the exact
+transition matrix, so other board layouts are analyzed the same way as
+the Monopoly board. The rules of doubles and jail turns are particular
+to Monopoly and are left to `Rules`.
+"""
+import numpy as np
+
+OVERSHOOTS = ["wrap", "clip", "stay"]
+
+class JumpTable(object):
+    """
+    The jumps of a board, declared one at a time and compiled into
+    lookup tables. Spaces can be given by number or by name.
+
+    Args:
+        board (:obj: Board): the board
+        overshoot (str): what a roll past the last space does: "wrap"
+            around the board, "clip" to the last space, or "stay" put
+        max_rolls (int): the most rolls in a turn with roll again
+            spaces; no limit if None
+    """
+    def __init__(self, board, overshoot="wrap", max_rolls=None):
+        if overshoot not in OVERSHOOTS:
+            raise Exception("Unknown overshoot '%s'."%overshoot)
+        if max_rolls is not None and max_rolls < 1:
+            raise Exception("'max_rolls' must be at least 1.")
+        self.board = board
+        self.number_of_spaces = board.number_of_spaces
+        self.overshoot = overshoot
+        self.max_rolls = max_rolls
+        self.teleports = {}
+        self.random_jumps = {}
+        self.conditional_jumps = []
+        self.roll_again_spaces = set()
+        self._compiled = None
+
+    def _space(self, space) -> int:
+        if isinstance(space, str):
+            names = [str(s.name) for s in self.board.spaces]
+            if space not in names:
+                raise Exception("No space is named '%s'."%space)
+            return names.index(space)
+        space = int(space)
+        if not 0 <= space < self.number_of_spaces:
+            raise Exception("Space %d is not on the board."%space)
+        return space
+
+    def teleport(self, source, destination):
+        """
+        Always send a player landing on `source` to `destination`.
+
+        Returns:
+            :obj: JumpTable: this table, to chain declarations
+        """
+        self.teleports[self._space(source)] = self._space(destination)
+        self._compiled = None
+        return self
+
+    def random_jump(self, source, destinations, probabilities=None):
+        """
+        Send a player landing on `source` to one of some destinations.
+        A destination may be `source` itself, for staying put; a
+        player sent on to another space with a random jump jumps again,
+        as from a card sending them to another card space.
+
+        Args:
+            source (int or str): the space
+            destinations (list): the spaces a player may be sent to
+            probabilities (float array): the probability of each
+                destination; all equal if None
+
+        Returns:
+            :obj: JumpTable: this table, to chain declarations
+        """
+        destinations = [self._space(d) for d in destinations]
+        if probabilities is None:
+            probabilities = np.ones(len(destinations))/len(destinations)
+        probabilities = np.asarray(probabilities, dtype=float)
+        if len(probabilities) != len(destinations) or \
+           np.any(probabilities < 0) or \
+           not np.isclose(probabilities.sum(), 1):
+            raise Exception("Every destination needs a probability, "+\
+                            "and they must sum to one.")
+        self.random_jumps[self._space(source)] = (destinations,
+                                                  probabilities)
+        self._compiled = None
+        return self
+
+    def conditional_jump(self, source, destination, rolls):
+        """
+        Send a player landing on `source` to `destination` only when
+        they got there with one of some roll totals.
+
+        Args:
+            source (int or str): the space
+            destination (int or str): where the player is sent
+            rolls (list of ints): the roll totals that make the jump
+
+        Returns:
+            :obj: JumpTable: this table, to chain declarations
+        """
+        self.conditional_jumps.append((self._space(source),
+                                       self._space(destination),
+                                       [int(r) for r in rolls]))
+        self._compiled = None
+        return self
+
+    def roll_again(self, space):
+        """
+        Let a player landing on `space` roll and move again.
+
+        Returns:
+            :obj: JumpTable: this table, to chain declarations
+        """
+        self.roll_again_spaces.add(self._space(space))
+        self._compiled = None
+        return self
+
+    def _teleport_table(self) -> np.ndarray:
+        #Follow chains of teleports to where they finally end, doubling
+        #the steps followed each time
+        N = self.number_of_spaces
+        table = np.arange(N)
+        sources = list(self.teleports)
+        table[sources] = [self.teleports[s] for s in sources]
+        for _ in range(int(np.ceil(np.log2(N))) + 1):
+            table = table[table]
+        if np.isin(table, sources).any():
+            raise Exception("The teleports go around in a loop.")
+        return table
+
+    def compile(self, diceroller):
+        """
+        Compile the declarations for some dice into lookup tables,
+        which are cached until the next declaration.
+
+        Args:
+            diceroller (:obj: DiceRoller): the dice that are rolled
+
+        Returns:
+            (int array, int array, float array): the (spaces, rolls)
+                space each roll total from each space ends up on before
+                any random jump, and the (spaces, outcomes) destinations
+                and cumulative probabilities of the random jumps
+        """
+        minimum_roll = diceroller.minimum_roll()
+        key = (minimum_roll, int(diceroller.maximum_roll()))
+        if self._compiled is not None and self._compiled[0] == key:
+            return self._compiled[1]
+        N = self.number_of_spaces
+        rolls = np.arange(key[0], key[1] + 1)
+        target = np.arange(N)[:, None] + rolls[None, :]
+        if self.overshoot == "wrap":
+            target = target % N
+        elif self.overshoot == "clip":
+            target = np.minimum(target, N - 1)
+        else:
+            target = np.where(target < N, target,
+                              np.arange(N)[:, None])
+        for source, destination, jump_rolls in self.conditional_jumps:
+            columns = [r - minimum_roll for r in jump_rolls
+                       if 0 <= r - minimum_roll < len(rolls)]
+            for column in columns:
+                target[:, column] = np.where(target[:, column] == source,
+                                             destination, target[:, column])
+        teleports = self._teleport_table()
+        moves = teleports[target]
+        #Random jumps, with destinations that then teleport; spaces
+        #without one jump to themselves
+        K = max([len(d) for d, _ in self.random_jumps.values()] + [1])
+        destinations = np.repeat(np.arange(N)[:, None], K, axis=1)
+        cumulative = np.ones((N, K))
+        for source, (ends, p) in self.random_jumps.items():
+            destinations[source, :len(ends)] = teleports[ends]
+            destinations[source, len(ends):] = teleports[ends[-1]]
+            cumulative[source, :len(ends)] = np.cumsum(p)
+            cumulative[source, len(ends) - 1:] = 1.
+        tables = (moves, destinations, cumulative)
+        if self.max_rolls is None:
+            self._check_roll_again(self._move_matrix(
+                tables, diceroller.probability_array()))
+        self._compiled = (key, tables)
+        return tables
+
+    def _check_roll_again(self, M) -> None:
+        #Without a limit on rolls, a turn must be able to end: find the
+        #largest set of roll again spaces that cannot be left
+        looping = np.zeros(self.number_of_spaces, dtype=bool)
+        looping[list(self.roll_again_spaces)] = True
+        while looping.any():
+            leaving = M[:, ~looping].sum(axis=1) > 1e-12
+            if not np.any(looping & leaving):
+                raise Exception("The roll again spaces go around in a "
+                                "loop; set 'max_rolls'.")
+            looping &= ~leaving
+        return
+
+    def jump_matrix(self, diceroller) -> np.ndarray:
+        """
+        The probability of ending up on each space after landing on a
+        space, following every random jump and teleport from it.
+
+        Returns:
+            float array: (spaces, spaces) jump matrix
+        """
+        return self._jump_matrix(self.compile(diceroller))
+
+    def _jump_matrix(self, tables) -> np.ndarray:
+        N = self.number_of_spaces
+        _, destinations, cumulative = tables
+        outcomes = np.diff(cumulative, axis=1, prepend=0.)
+        J = np.zeros((N, N))
+        np.add.at(J, (np.repeat(np.arange(N), destinations.shape[1]),
+                      destinations.ravel()), outcomes.ravel())
+        #Staying put or reaching a space without a jump ends the jumps,
+        #and going on to another jump space jumps again
+        jumps = np.zeros(N, dtype=bool)
+        jumps[list(self.random_jumps)] = True
+        stay = np.where(jumps, np.diag(J), 1.)
+        onward = J*jumps[:, None]
+        onward[np.diag_indices(N)] = 0.
+        try:
+            return np.linalg.solve(np.identity(N) - onward, np.diag(stay))
+        except np.linalg.LinAlgError:
+            raise Exception("The random jumps go around in a loop.")
+
+    def move_matrix(self, diceroller) -> np.ndarray:
+        """
+        The probability of going from each space to each other space
+        with a single roll and the jumps after it.
+
+        Returns:
+            float array: (spaces, spaces) matrix
+        """
+        return self._move_matrix(self.compile(diceroller),
+                                 diceroller.probability_array())
+
+    def _move_matrix(self, tables, probability) -> np.ndarray:
+        N = self.number_of_spaces
+        moves = tables[0]
+        rolls = np.zeros((N, N))
+        np.add.at(rolls, (np.repeat(np.arange(N), moves.shape[1]),
+                          moves.ravel()), np.tile(probability, N))
+        return rolls @ self._jump_matrix(tables)
+
+    def transition_matrix(self, diceroller) -> np.ndarray:
+        """
+        The probability of going from each space to each other space in
+        a turn, with the rolls again from roll again spaces.
+
+        Returns:
+            float array: (spaces, spaces) transition matrix
+        """
+        N = self.number_of_spaces
+        M = self.move_matrix(diceroller)
+        again = np.zeros(N)
+        again[list(self.roll_again_spaces)] = 1.
+        if not again.any():
+            return M
+        #Each roll ends the turn, or lands on a roll again space
+        stop = M*(1. - again)[None, :]
+        go_on = M*again[None, :]
+        if self.max_rolls is None:
+            return np.linalg.solve(np.identity(N) - go_on, stop)
+        T = np.zeros((N, N))
+        reach = np.identity(N)
+        for _ in range(self.max_rolls - 1):
+            T += reach @ stop
+            reach = reach @ go_on
+        #The last roll ends the turn wherever it lands
+        return T + reach @ M
+
+    def stationary_distribution(self, diceroller) -> np.ndarray:
+        """
+        The long-run probability of ending a turn on each space.
+        """
+        from .markovchain import stationary_distribution
+        return stationary_distribution(self.transition_matrix(diceroller))
+
+    def simulate(self, diceroller, number_of_players: int,
+                 number_of_turns: int, rng=None, start=0):
+        """
+        Move many independent players for a number of turns.
+
+        Args:
+            diceroller (:obj: DiceRoller): the dice that are rolled
+            number_of_players (int): number of players moved at once
+            number_of_turns (int): number of turns of each player
+            rng (:obj: numpy.random.Generator): random number generator
+            start (int or int array): the starting spaces
+
+        Returns:
+            (float array, int array): the number of turns ending on
+                each space, and the final space of every player
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        N = self.number_of_spaces
+        moves, destinations, cumulative = self.compile(diceroller)
+        roll_cumulative = np.cumsum(diceroller.probability_array())
+        again = np.zeros(N, dtype=bool)
+        again[list(self.roll_again_spaces)] = True
+        jumps = np.zeros(N, dtype=bool)
+        jumps[list(self.random_jumps)] = True
+        position = np.zeros(number_of_players, dtype=np.int64) + start
+        visits = np.zeros(N)
+        for _ in range(number_of_turns):
+            moving = np.arange(number_of_players)
+            rolls = 0
+            while len(moving):
+                position[moving] = self._move(position[moving], moves,
+                                              destinations, cumulative,
+                                              roll_cumulative, jumps, rng)
+                rolls += 1
+                if self.max_rolls is not None and rolls >= self.max_rolls:
+                    break
+                moving = moving[again[position[moving]]]
+            visits += np.bincount(position, minlength=N)
+        return visits, position
+
+    @staticmethod
+    def _move(position, moves, destinations, cumulative, roll_cumulative,
+              jumps, rng):
+        n = len(position)
+        roll = np.minimum(np.searchsorted(roll_cumulative, rng.random(n),
+                                          side="right"),
+                          len(roll_cumulative) - 1)
+        position = moves[position, roll]
+        #Jump until staying put or reaching a space without a jump
+        jumping = np.flatnonzero(jumps[position])
+        for _ in range(len(jumps)):
+            if not len(jumping):
+                break
+            start = position[jumping]
+            u = rng.random(len(jumping))
+            outcome = np.minimum(
+                (u[:, None] >= cumulative[start]).sum(axis=1),
+                cumulative.shape[1] - 1)
+            position[jumping] = destinations[start, outcome]
+            moved = position[jumping] != start
+            jumping = jumping[moved & jumps[position[jumping]]]
+        return position
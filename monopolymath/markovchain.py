@@ -0,0 +1,308 @@
+"""
+The exact Markov chain of a monopoly player. The state of a player is
+their position, the number of consecutive doubles they have rolled and
+how many turns they have spent in jail. The transition matrix over these
+states encodes every rule applied by the `MonopolyRollMover`.
+"""
+import numpy as np
+from .cards import card_tables, table_matrix
+
+def _roll_distributions(diceroller):
+    """
+    The probability of each roll total, split by whether
+    or not the roll was doubles.
+
+    Args:
+        diceroller (:obj: DiceRoller): dice that the player rolls
+
+    Returns:
+        (int, float array, float array): the minimum roll, and the
+            probability of rolling each total from the minimum roll
+            up as non-doubles and as doubles
+    """
+    p_non_doubles, p_doubles = diceroller.split_probability_array()
+    return diceroller.minimum_roll(), p_non_doubles, p_doubles
+
+def roll_matrix(probability, minimum_roll, number_of_spaces, sparse=False):
+    """
+    The matrix of moving from one space to any other space by rolling.
+    Rolling is the same from every space, so the matrix is circulant:
+    each row is the first row shifted along by one space.
+
+    Args:
+        probability (float array): probability of each roll total,
+            starting from the minimum roll
+        minimum_roll (int): the smallest possible roll
+        number_of_spaces (int): number of spaces on the board
+        sparse (bool): return a `scipy.sparse` CSR matrix holding only
+            the reachable spaces, instead of a dense array
+
+    Returns:
+        float array: the (spaces, spaces) roll matrix
+    """
+    N = number_of_spaces
+    probability = np.asarray(probability, dtype=float)
+    offsets = np.flatnonzero(probability)
+    #Rolls longer than the board wrap around onto the same spaces
+    first_row = np.bincount((offsets + minimum_roll) % N,
+                            weights=probability[offsets], minlength=N)
+    if sparse:
+        import scipy.sparse
+        columns = np.flatnonzero(first_row)
+        indices = (np.arange(N)[:, None] + columns[None, :]) % N
+        indptr = np.arange(0, N*len(columns) + 1, len(columns))
+        R = scipy.sparse.csr_matrix((np.tile(first_row[columns], N),
+                                     indices.ravel(), indptr), shape=(N, N))
+        R.sort_indices()
+        return R
+    spaces = np.arange(N)
+    return first_row[(spaces[None, :] - spaces[:, None]) % N]
+
+def roll_matrices(diceroller, number_of_spaces=40):
+    """
+    The roll matrices of non-doubles and of doubles, which are the
+    only part of the transition matrix that depends on the dice. They
+    can be computed once and shared by every variant of the rules.
+
+    Args:
+        diceroller (:obj: DiceRoller): dice that the player rolls
+        number_of_spaces (int): number of spaces on the board
+
+    Returns:
+        (float array, float array): the (spaces, spaces) roll matrices
+            of rolls that are not doubles and of doubles
+    """
+    minroll, p_non_doubles, p_doubles = _roll_distributions(diceroller)
+    return (roll_matrix(p_non_doubles, minroll, number_of_spaces),
+            roll_matrix(p_doubles, minroll, number_of_spaces))
+
+def card_matrix(number_of_spaces=40):
+    """
+    The action matrix of the chance and community chest cards, i.e.
+    the probability of ending up on each space after landing on a
+    space and drawing any cards there.
+
+    Args:
+        number_of_spaces (int): number of spaces on the board
+
+    Returns:
+        float array: the (spaces, spaces) card matrix
+    """
+    chance, community_chest = card_tables(number_of_spaces)
+    #Chance is resolved first, since "back 3 spaces" can
+    #land on a community chest space
+    return table_matrix(chance) @ table_matrix(community_chest)
+
+def number_of_states(number_of_spaces=40, max_doubles=3, jail_turns=3) -> int:
+    """
+    The number of states a player can be in: a position and a
+    consecutive doubles count when free, or a turn in jail.
+    """
+    return number_of_spaces*max_doubles + jail_turns
+
+def state_positions(number_of_spaces=40, max_doubles=3, jail_turns=3,
+                    jail_position=30) -> np.ndarray:
+    """
+    The board position of every state. State k*N+i is position i after
+    k consecutive doubles, and state D*N+t is turn t in jail.
+
+    Returns:
+        int array: the position of each state
+    """
+    N = number_of_spaces
+    return np.concatenate([np.tile(np.arange(N), max_doubles),
+                           np.full(jail_turns, jail_position)])
+
+def state_index(position, N_doubles=0, in_jail=False, time_in_jail=0,
+                number_of_spaces=40, max_doubles=3) -> int:
+    """
+    The index of the state of a player, as tracked
+    by a `MonopolyRollMover`, in the transition matrix.
+    """
+    if in_jail:
+        return number_of_spaces*max_doubles + time_in_jail
+    return N_doubles*number_of_spaces + position
+
+def transition_matrix(diceroller, number_of_spaces=40, action_matrix=None,
+                      jail_position=30, visiting_position=10,
+                      max_doubles=3, jail_turns=3, jail_strategy="wait",
+                      rolls=None) -> np.ndarray:
+    """
+    The transition matrix over the expanded states of a player.
+
+    A free player rolls and moves, then the actions of the space landed
+    on are applied. Rolling `max_doubles` doubles in a row or landing on
+    the jail position puts the player in jail. A player in jail leaves
+    from `visiting_position` on doubles, and is put on
+    `visiting_position` after `jail_turns` failed rolls. With the
+    "pay" jail strategy a player instead pays to leave on their next
+    turn, and moves from `visiting_position` like a free player.
+
+    Args:
+        diceroller (:obj: DiceRoller): dice that the player rolls
+        number_of_spaces (int): number of spaces on the board
+        action_matrix (float array): action taken after landing on each
+            space; the chance and community chest cards if None
+        jail_position (int): the space that sends a player to jail
+        visiting_position (int): the space a player leaves jail from
+        max_doubles (int): number of doubles in a row sending a
+            player to jail
+        jail_turns (int): number of rolls a player spends in jail
+        jail_strategy (str): "wait" to roll for doubles in jail, or
+            "pay" to pay out of jail immediately
+        rolls (float arrays): the roll matrices of non-doubles and
+            doubles from `roll_matrices`, if already computed
+
+    Returns:
+        float array: the (states, states) transition matrix, with rows
+            indexed as in `state_positions`
+    """
+    N = number_of_spaces
+    D = max_doubles
+    J = jail_position
+    V = visiting_position
+    if jail_strategy not in ("wait", "pay"):
+        raise Exception("Unknown jail strategy '%s'."%jail_strategy)
+    if action_matrix is None:
+        action_matrix = card_matrix(N)
+    if rolls is None:
+        rolls = roll_matrices(diceroller, N)
+    R_non_doubles, R_doubles = rolls
+    #Rows of a circulant matrix all sum to the probability of the rolls
+    p_non_doubles = R_non_doubles[0].sum()
+    p_doubles = R_doubles[0].sum()
+    M_non_doubles = R_non_doubles @ action_matrix
+    M_doubles = R_doubles @ action_matrix
+
+    S = number_of_states(N, D, jail_turns)
+    jail = D*N #index of the first turn in jail
+    T = np.zeros((S, S))
+    #Free players
+    for k in range(D):
+        rows = slice(k*N, (k+1)*N)
+        T[rows, 0:N] += M_non_doubles
+        if k + 1 < D:
+            T[rows, (k+1)*N:(k+2)*N] += M_doubles
+        else:
+            T[rows, jail] += p_doubles #Go to jail!
+    #Players in jail
+    for t in range(jail_turns):
+        row = jail + t
+        if D > 1:
+            T[row, N:2*N] += M_doubles[V]
+        else:
+            T[row, jail] += p_doubles
+        if jail_strategy == "pay":
+            T[row, 0:N] += M_non_doubles[V]
+        elif t + 1 < jail_turns:
+            T[row, jail + t + 1] += p_non_doubles
+        else:
+            T[row, 0:N] += p_non_doubles*action_matrix[V]
+    #Landing on the jail position puts a free player in jail
+    for k in range(D):
+        T[:, jail] += T[:, k*N + J]
+        T[:, k*N + J] = 0
+    return T
+
+def _is_sparse(T) -> bool:
+    return not isinstance(T, np.ndarray)
+
+def stationary_distribution(T, method="direct", tol=1e-12,
+                            max_iterations=10000, initial=None) -> np.ndarray:
+    """
+    The stationary distribution of a transition matrix, i.e. the
+    long-run fraction of time spent in each state. The matrix can be
+    a dense array or a `scipy.sparse` matrix; a sparse matrix is never
+    made dense.
+
+    Args:
+        T (float array): (states, states) transition matrix
+        method (str): "direct" for a linear solve, or "power"
+            for power iteration
+        tol (float): convergence tolerance for power iteration
+        max_iterations (int): maximum number of power iterations
+        initial (float array): the distribution power iteration starts
+            from, e.g. the solution for a similar matrix; uniform if None
+
+    Returns:
+        float array: the stationary distribution
+    """
+    S = T.shape[0]
+    if method == "direct":
+        #Solve pi (T - I) = 0 with the last equation
+        #replaced by the normalization sum(pi) = 1
+        b = np.zeros(S)
+        b[-1] = 1.
+        if _is_sparse(T):
+            return _sparse_stationary_distribution(T)
+        A = T.T - np.identity(S)
+        A[-1] = 1.
+        return np.linalg.solve(A, b)
+    elif method == "power":
+        step = _right_multiplier(T)
+        if initial is None:
+            pi = np.ones(S)/S
+        else:
+            pi = np.asarray(initial, dtype=float)
+            pi = pi/pi.sum()
+        for _ in range(max_iterations):
+            new_pi = step(pi)
+            if np.abs(new_pi - pi).sum() < tol:
+                return new_pi
+            pi = new_pi
+        raise Exception("Power iteration did not converge in "+\
+                        "%d iterations."%max_iterations)
+    else:
+        raise Exception("Unknown method '%s'."%method)
+
+def _sparse_stationary_distribution(T) -> np.ndarray:
+    """
+    Solve for the stationary distribution of a sparse matrix. A dense
+    normalization row would fill in the LU factors, so instead one
+    state that is surely visited (the one with the most incoming
+    probability) is fixed to 1, the rest of the balance equations are
+    solved, and the result normalized.
+    """
+    import scipy.sparse
+    import scipy.sparse.linalg
+    T = T.tocsr()
+    S = T.shape[0]
+    fixed = int(np.argmax(np.asarray(T.sum(axis=0)).ravel()))
+    others = np.delete(np.arange(S), fixed)
+    A = (scipy.sparse.identity(S, format="csr") - T)[others][:, others]
+    b = np.asarray(T[fixed][:, others].todense()).ravel()
+    pi = np.empty(S)
+    pi[fixed] = 1.
+    pi[others] = scipy.sparse.linalg.spsolve(A.T.tocsc(), b)
+    return pi/pi.sum()
+
+def _right_multiplier(T):
+    """
+    A function taking a distribution v to v.T, which for a sparse
+    matrix multiplies by a precomputed CSR transpose.
+    """
+    if _is_sparse(T):
+        TT = T.T.tocsr()
+        return TT.dot
+    return lambda v: v @ T
+
+def n_step_distribution(T, initial, number_of_steps: int) -> np.ndarray:
+    """
+    The distribution after a number of steps of a Markov chain,
+    found by repeated vector-matrix products so that no power of
+    the transition matrix (which would fill in) is ever formed.
+
+    Args:
+        T (float array): (states, states) transition matrix, dense
+            or `scipy.sparse`
+        initial (float array): the starting distribution
+        number_of_steps (int): number of steps to take
+
+    Returns:
+        float array: the distribution after the steps
+    """
+    step = _right_multiplier(T)
+    v = np.asarray(initial, dtype=float)
+    for _ in range(number_of_steps):
+        v = step(v)
+    return v
@@ -5,26 +5,91 @@ from typing import List
 from .board import Space, Board
 from .diceroller import DiceRoller
 from .monopolyroller import MonopolyRollMover
-import os, inspect
+from .batchmover import BatchRollMover
+from .parallel import simulate_parallel
+from .trajectory import TrajectoryRecorder, TrajectoryReader
+from .rules import Rules
+from . import markovchain
+import os
 import numpy as np
 
-#The property data are loaded in from a txt file
-#note that the top line is a header
-data_path = os.path.dirname(os.path.abspath(inspect.stack()[0][1]))
-property_data = np.loadtxt(data_path+"/property_data.txt", skiprows=1)
+#The property data are loaded in from a txt file the first time a board
+#is made; note that the top line is a header. A precompiled .npy copy
+#next to it is memory-mapped instead when it is at least as new.
+data_path = os.path.dirname(os.path.abspath(__file__))
+_property_data = None
+
+def _property_data_paths():
+    return (os.path.join(data_path, "property_data.txt"),
+            os.path.join(data_path, "property_data.npy"))
+
+def load_property_data() -> np.ndarray:
+    """
+    The property data table, loaded once per process and shared
+    by every board. Read-only when memory-mapped.
+
+    Returns:
+        float array: one row per property, with the columns in the
+            header of property_data.txt
+    """
+    global _property_data
+    if _property_data is None:
+        txt_path, npy_path = _property_data_paths()
+        if os.path.exists(npy_path) and \
+           os.path.getmtime(npy_path) >= os.path.getmtime(txt_path):
+            _property_data = np.load(npy_path, mmap_mode="r")
+        else:
+            _property_data = np.loadtxt(txt_path, skiprows=1)
+    return _property_data
+
+def compile_property_data(path=None) -> str:
+    """
+    Write the property data as a binary .npy file, which
+    later processes memory-map instead of parsing the text.
+
+    Args:
+        path (str): where to write the file; by default next to
+            property_data.txt, where `load_property_data` looks for it
+
+    Returns:
+        str: the path of the file written
+    """
+    txt_path, npy_path = _property_data_paths()
+    if path is None:
+        path = npy_path
+    np.save(path, np.loadtxt(txt_path, skiprows=1))
+    return path
+
+def __getattr__(name):
+    #The module level table is loaded on first access
+    if name == "property_data":
+        return load_property_data()
+    raise AttributeError("module %r has no attribute %r"%(__name__, name))
+
+#Codes of the kinds of spaces in the columnar view of the board
+KIND_CODES = {"Blank": 0, "Property": 1, "Railroad": 2, "Utility": 3}
+#Railroad rent for owning 1 to 4 railroads
+RAILROAD_RENTS = [25, 50, 100, 200]
+RAILROAD_GROUP = 8
+UTILITY_GROUP = 9
+#Rolls drawn at once, ahead of time, by the dice of a board
+DICE_BUFFER_SIZE = 1024
 
 class MonopolySpace(Space):
     """
     Object to represent a space on th Monopoly board. Each space has
     a name, what kind of space it is (property, utility, railroad, etc.),
-    and other information.
+    and other information. Blank spaces are in group -1.
     """
+    __slots__ = ("kind", "cost", "group", "rent", "building_rents",
+                 "RR_rents")
+
     def __init__(self, name: str,
-                 kind=None, cost=0, group=0, rent=None, building_rents=None, RR_rents=None):
+                 kind=None, cost=0, group=-1, rent=None, building_rents=None, RR_rents=None):
         self.name = name
         self.kind = kind
         self.cost = cost
-        self.group = group,
+        self.group = group
         self.rent = rent
         self.building_rents = building_rents
         self.RR_rents = RR_rents
@@ -32,6 +97,22 @@ class MonopolySpace(Space):
 class MonopolyBoard(Board):
     """
     A monopoly board. Extends the `board` class.
+
+    Besides the list of spaces, the board keeps a columnar view with
+    one array entry per space, for code that works on the whole board
+    at once:
+        kind_codes (int array): the kind of space, see `KIND_CODES`
+        groups (int array): the group, or -1 for blank spaces
+        costs (float array): the purchase price
+        house_costs (float array): the price of a house on a property
+        rents (float array): the base rent of a property
+        building_rents (float array): (spaces, 5) rents of a property
+            with 1 to 4 houses and a hotel
+        RR_rents (float array): (spaces, 4) rents of a railroad when
+            1 to 4 railroads are owned
+        mortgages (float array): the mortgage value
+    Non-applicable entries are 0. The spaces' `building_rents` and
+    `RR_rents` are views into these arrays.
     """
     def __init__(self):
         names = ["Go", "Mediterranean Ave", "Community Chest 1",
@@ -55,40 +136,62 @@ class MonopolyBoard(Board):
                  "Property","Utility","Property","Blank","Property",
                  "Property","Blank","Property","Railroad","Blank","Property",
                  "Blank","Property"]
-        groups = property_data[:,0]
-        costs = property_data[:,1]
-        rents = property_data[:,3]
-        building_rents = property_data[:,4:9]
-        self.number_of_spaces = len(names)
-        #Create the spaces on the board
+        self.number_of_spaces = N = len(names)
+        self._compute_columns(kinds)
+        #Create the spaces on the board, sharing the columns
         self.spaces = []
-        counter = 0 #add one each time we add a property to the spaces
-        for i in range(self.number_of_spaces):
-            if kinds[i] == "Property":
-                self.spaces.append(MonopolySpace(names[i], kinds[i],
-                                                 cost=costs[counter],
-                                                 group=int(groups[counter]),
-                                                 rent=rents[counter],
-                                                 building_rents=building_rents[counter]))
-                counter += 1
-            elif kinds[i] == "Railroad":
-                self.spaces.append(MonopolySpace(names[i], kinds[i], group=8, cost=200,
-                                                 RR_rents = [25,50,100,200]))
-            elif kinds[i] == "Utility":
-                self.spaces.append(MonopolySpace(names[i], kinds[i], group=9, cost=150))
-            elif kinds[i] == "Blank":
-                self.spaces.append(MonopolySpace(names[i], kinds[i], group=0, cost=0))
+        for i in range(N):
+            kind = kinds[i]
+            self.spaces.append(MonopolySpace(
+                names[i], kind, cost=self.costs[i], group=int(self.groups[i]),
+                rent=self.rents[i] if kind == "Property" else None,
+                building_rents=self.building_rents[i] \
+                    if kind == "Property" else None,
+                RR_rents=self.RR_rents[i] if kind == "Railroad" else None))
         self.space_names = names
+        self.space_index = {name: i for i, name in enumerate(names)}
         #Set the current position of an imaginary player to 0 (Go)
         self.space_visits = np.zeros(self.number_of_spaces)
         self.position_vector = np.zeros(self.number_of_spaces)
         self._update_position(0)
 
+    def _compute_columns(self, kinds: List[str]) -> None:
+        """
+        Fill the columnar view of the board from the kinds of
+        spaces and the property data table.
+        """
+        N = self.number_of_spaces
+        property_data = load_property_data()
+        self.kind_codes = np.array([KIND_CODES[kind] for kind in kinds])
+        properties = self.kind_codes == KIND_CODES["Property"]
+        railroads = self.kind_codes == KIND_CODES["Railroad"]
+        utilities = self.kind_codes == KIND_CODES["Utility"]
+        self.groups = np.full(N, -1)
+        self.groups[properties] = property_data[:,0]
+        self.groups[railroads] = RAILROAD_GROUP
+        self.groups[utilities] = UTILITY_GROUP
+        self.costs = np.zeros(N)
+        self.costs[properties] = property_data[:,1]
+        self.costs[railroads] = 200
+        self.costs[utilities] = 150
+        self.house_costs = np.zeros(N)
+        self.house_costs[properties] = property_data[:,2]
+        self.rents = np.zeros(N)
+        self.rents[properties] = property_data[:,3]
+        self.building_rents = np.zeros((N, 5))
+        self.building_rents[properties] = property_data[:,4:9]
+        self.RR_rents = np.zeros((N, len(RAILROAD_RENTS)))
+        self.RR_rents[railroads] = RAILROAD_RENTS
+        self.mortgages = np.zeros(N)
+        self.mortgages[properties] = property_data[:,9]
+        self.mortgages[railroads | utilities] = self.costs[railroads | utilities]/2
+        return
+
     def _space_names(self) -> List[str]:
         return [sp.name for sp in self.spaces]
 
     def _space_index_from_name(self, name: str) -> int:
-        return self._space_names.index(name)
+        return self.space_index[name]
 
     def _update_from_move(self, move_amount: int) -> None:
         self._update_position(self.position + move_amount)
@@ -101,6 +204,7 @@ class MonopolyBoard(Board):
         self.position = new_position
         self.position_vector *= 0
         self.position_vector[self.position] = 1
+        self.state_vector = None #rebuilt from the position when needed
         self.space_visits[new_position] += 1
         return
 
@@ -118,14 +222,29 @@ class MonopolyBoard(Board):
         """
         return self.spaces[self.position]
         
-    def assign_dice(self,  sides=6, number=2, dice_array=None) -> None:
+    def assign_dice(self,  sides=6, number=2, dice_array=None,
+                    shuffled_decks=False, rules=None, cache=None) -> None:
         """
         Assign dice to the board. By default this will be
         the standard monopoly set of two six-sided die.
+        With `shuffled_decks` the player moved by rolling deals
+        cards from shuffled decks instead of drawing with replacement.
+        The house `rules` are used for moving players and for the
+        transition matrix; the standard rules if None. The matrices
+        and stationary distributions are kept in the `ResultCache`
+        given as `cache`, and taken from it when already there.
         """
-        self.diceroller = DiceRoller(sides, number, dice_array)
-        self.rollmover = MonopolyRollMover(self.diceroller)
+        if rules is None:
+            rules = Rules(self.number_of_spaces)
+        self.rules = rules
+        self.cache = cache
+        self.diceroller = DiceRoller(sides, number, dice_array,
+                                     buffer_size=DICE_BUFFER_SIZE)
+        self.rollmover = MonopolyRollMover(self.diceroller, shuffled_decks,
+                                           rules=rules)
         self._compute_roll_matrix()
+        self._compute_action_matrix()
+        self._compute_transition_matrix()
         return
 
     def _compute_roll_matrix(self) -> None:
@@ -136,41 +255,78 @@ class MonopolyBoard(Board):
         """
         if not hasattr(self, "diceroller"):
             raise Exception("Must assign dice before roll matrix is computed.")
-        N = self.number_of_spaces
-        self.roll_matrix = np.zeros((N,N))
-        p = self.diceroller.probability_array()
-        minroll = self.diceroller.minimum_roll()
-        #Loop over the current row
-        for i in range(N):
-            #Add probability to each space that can be reached
-            for j in range(minroll, len(p)+minroll):
-                self.roll_matrix[i, (i+j)%N] += p[j-minroll]
-                continue
-            continue
+        self.roll_matrix = self._cached(
+            "roll_matrix", lambda: self.compute_roll_matrix(self.diceroller))
         return
 
+    def _cached(self, kind: str, compute, *parts):
+        #A result for the board, dice and rules, from the cache if any
+        if getattr(self, "cache", None) is None:
+            return compute()
+        return self.cache.get_or_compute(kind, compute, self, self.diceroller,
+                                         self.rules, *parts)
+
     def _compute_action_matrix(self) -> None:
         """
-        Compute the action matrix that encodes rules such as the jail,
-        chance, community chest, and doubles. This function simply creates 
-        the matrix from a-priori rules, and doesn't actually compute anything, 
-        unlike the roll matrix. This is because the action matrix is set by 
-        the game rules themselves.
+        Compute the action matrix that encodes what happens after landing
+        on a space. This function simply creates the matrix from a-priori
+        rules, and doesn't actually compute anything, unlike the roll
+        matrix. This is because the action matrix is set by the game
+        rules themselves.
 
-        As more rules are added, this function will get longer. The following
-        rules are implemented:
-        - None
-        The following rules need to be implemented:
+        The following rules are implemented:
         - Chance cards
         - Community chest cards
-        - Jail jump
-        - Jail doubles
+        - Go to jail spaces
+        The jail rules depend on more than the position of the player,
+        and are part of the transition matrix instead.
         """
-        N = self.number_of_spaces
-        A = np.identity(N, dtype=np.int32)
-        self.action_matrix = A
+        self.action_matrix = self.rules.action_matrix()
+        return
+
+    def _compute_transition_matrix(self) -> None:
+        """
+        Compute the transition matrix (T) over the states of a player:
+        a position and a consecutive doubles count, or a turn in jail.
+        Together with the action matrix this encodes the jail jump,
+        getting out of jail on doubles or time, and triple doubles.
+        """
+        if not hasattr(self, "diceroller"):
+            raise Exception("Must assign dice before transition "+\
+                            "matrix is computed.")
+        rules = self.rules
+        self.transition_matrix = self._cached(
+            "transition_matrix", lambda: markovchain.transition_matrix(
+                self.diceroller, self.number_of_spaces, self.action_matrix,
+                rules.jail_position, rules.visiting_position,
+                rules.max_doubles, rules.jail_turns, rules.jail_strategy))
+        self.state_positions = rules.state_positions()
         return
 
+    def _positions_from_states(self, state_vector: np.ndarray) -> np.ndarray:
+        return np.bincount(self.state_positions, weights=state_vector,
+                           minlength=self.number_of_spaces)
+
+    def stationary_distribution(self, method="direct") -> np.ndarray:
+        """
+        The long-run probability of being on each space, found
+        exactly from the transition matrix.
+
+        Args:
+            method (str): "direct" for a linear solve, or "power"
+                for power iteration
+
+        Returns:
+            float array: probability of being on each space
+        """
+        if not hasattr(self, "transition_matrix"):
+            raise Exception("Must assign dice before the stationary "+\
+                            "distribution is computed.")
+        pi = self._cached("stationary_distribution",
+                          lambda: markovchain.stationary_distribution(
+                              self.transition_matrix, method), method)
+        return self._positions_from_states(pi)
+
     def move_player(self, via_roll=True) -> None:
         """
         Move the player, either via rolling the dice (simulation)
@@ -185,12 +341,127 @@ class MonopolyBoard(Board):
                                                           self.number_of_spaces)
             self._update_position(new_position)
         else:
-            #v = self.position_vector
-            #T = self.transition_matrix #Roll \dot Action
-            raise Exception("Moving via the transition matrix is "+\
-                            "not implemented yet.")
+            if not hasattr(self, "transition_matrix"):
+                raise Exception("Must assign dice before moving via the "+\
+                                "transition matrix, by calling assign_dice().")
+            if self.state_vector is None:
+                #Start from the state of the player moved by rolling
+                mover = self.rollmover
+                self.state_vector = np.zeros(len(self.transition_matrix))
+                self.state_vector[markovchain.state_index(
+                    self.position, mover.N_doubles, mover.in_jail,
+                    mover.time_in_jail, self.number_of_spaces,
+                    self.rules.max_doubles)] = 1
+            self.state_vector = self.state_vector @ self.transition_matrix
+            self.position_vector = self._positions_from_states(
+                self.state_vector)
+            #Visits are now expected visits
+            self.space_visits += self.position_vector
         return
 
+    def move_players(self, number_of_players: int, number_of_turns: int,
+                     rng=None, shuffled_decks=False,
+                     instrumentation=None) -> np.ndarray:
+        """
+        Move many independent imaginary players at once by rolling
+        and add their landings to `space_visits`. The single tracked
+        `position` is not changed.
+
+        Args:
+            number_of_players (int): number of players to simulate
+            number_of_turns (int): number of rolls for each player
+            rng (:obj: numpy.random.Generator): optional random
+                number generator
+            shuffled_decks (bool): deal cards from shuffled decks
+                instead of drawing with replacement
+            instrumentation (:obj: Instrumentation): optional counters
+                of the rules that fire
+
+        Returns:
+            float array: the landings of the simulated players only
+        """
+        if not hasattr(self, "diceroller"):
+            raise Exception("Must assign dice before rolling via move, "+\
+                            "by calling assign_dice().")
+        mover = BatchRollMover(self.diceroller, number_of_players,
+                               self.number_of_spaces, rng=rng,
+                               shuffled_decks=shuffled_decks,
+                               instrumentation=instrumentation,
+                               rules=self.rules)
+        visits = mover.run(number_of_turns)
+        self.space_visits += visits
+        return visits
+
+    def record_players(self, directory: str, number_of_players: int,
+                       number_of_turns: int, rng=None, shuffled_decks=False,
+                       chunk_turns=1024):
+        """
+        Move many independent imaginary players at once, like
+        `move_players`, and record every turn of every player
+        to memory-mapped files in a directory.
+
+        Args:
+            directory (str): where the recording is written
+            number_of_players (int): number of players to simulate
+            number_of_turns (int): number of rolls for each player
+            rng (:obj: numpy.random.Generator): optional random
+                number generator
+            shuffled_decks (bool): deal cards from shuffled decks
+                instead of drawing with replacement
+            chunk_turns (int): number of turns in each file
+
+        Returns:
+            :obj: TrajectoryReader: a reader of the recording
+        """
+        if not hasattr(self, "diceroller"):
+            raise Exception("Must assign dice before rolling via move, "+\
+                            "by calling assign_dice().")
+        mover = BatchRollMover(self.diceroller, number_of_players,
+                               self.number_of_spaces, rng=rng,
+                               shuffled_decks=shuffled_decks,
+                               rules=self.rules)
+        with TrajectoryRecorder(directory, number_of_players,
+                                self.number_of_spaces,
+                                self.diceroller.number,
+                                chunk_turns) as recorder:
+            recorder.run(mover, number_of_turns)
+        self.space_visits += mover.space_visits
+        return TrajectoryReader(directory)
+
+    def move_players_parallel(self, number_of_players: int,
+                              number_of_turns: int, seed=None,
+                              number_of_workers=None,
+                              shuffled_decks=False,
+                              instrumentation=None) -> np.ndarray:
+        """
+        Move many independent imaginary players on a pool of processes
+        and add their landings to `space_visits`. The result is
+        reproducible for a given seed and number of workers.
+
+        Args:
+            number_of_players (int): number of players to simulate
+            number_of_turns (int): number of rolls for each player
+            seed (int): root seed for the workers' generators
+            number_of_workers (int): number of processes; one per CPU
+                if None
+            shuffled_decks (bool): deal cards from shuffled decks
+                instead of drawing with replacement
+            instrumentation (:obj: Instrumentation): optional counters
+                of the rules that fire, summed over the workers
+
+        Returns:
+            float array: the landings of the simulated players only
+        """
+        if not hasattr(self, "diceroller"):
+            raise Exception("Must assign dice before rolling via move, "+\
+                            "by calling assign_dice().")
+        visits = simulate_parallel(self.diceroller, number_of_players,
+                                   number_of_turns, seed, number_of_workers,
+                                   self.number_of_spaces, shuffled_decks,
+                                   instrumentation, self.rules)
+        self.space_visits += visits
+        return visits
+
 def main():
     mb = MonopolyBoard()
     print(mb)
@@ -2,7 +2,8 @@
 The rules for moving a monopoly player via rolling. 
 This allows for simulating the roll and action matrices.
 """
-import numpy.random as rand
+from .cards import CardDeck, NUMBER_OF_CARDS
+from .rules import Rules
 
 class MonopolyRollMover(object):
     """
@@ -10,101 +11,138 @@ class MonopolyRollMover(object):
 
     Args:
        diceroller (:obj: DiceRoller): object for rolling dice
+       shuffled_decks (bool): deal cards from shuffled decks
+           instead of drawing with replacement
+       rng (:obj: numpy.random.Generator): random number generator for
+           the cards; the global `numpy.random` state if None
+       instrumentation (:obj: Instrumentation): counts the rules that
+           fire and times every move; off if None
+       rules (:obj: Rules): the house rules; the standard rules for
+           the size of the board if None
     """
-    def __init__(self, diceroller):
+    def __init__(self, diceroller, shuffled_decks=False, rng=None,
+                 instrumentation=None, rules=None):
         self.diceroller = diceroller
+        self.instrumentation = instrumentation
+        self.rules = rules
         #Keep track of the number of consecutive doubles rolled
         self.N_doubles = 0
         self.in_jail = False
         self.time_in_jail = 0
+        chance_cards = community_chest_cards = NUMBER_OF_CARDS
+        if rules is not None:
+            chance_cards = len(rules.chance_cards)
+            community_chest_cards = len(rules.community_chest_cards)
+        self.chance_deck = CardDeck(chance_cards, shuffled=shuffled_decks,
+                                    rng=rng)
+        self.community_chest_deck = CardDeck(community_chest_cards,
+                                             shuffled=shuffled_decks, rng=rng)
+        if instrumentation is not None:
+            instrumentation.size_decks(chance_cards, community_chest_cards)
+        self._compiled_rules = {}
+
+    def _get_rules(self, number_of_spaces: int):
+        #Compiled once per board size, as lists and sets for fast
+        #scalar lookups
+        if number_of_spaces not in self._compiled_rules:
+            rules = self.rules
+            if rules is None:
+                rules = Rules(number_of_spaces)
+            elif rules.number_of_spaces != number_of_spaces:
+                raise Exception("The rules are for a board of %d spaces."%
+                                rules.number_of_spaces)
+            chance, community_chest = rules.card_tables()
+            self._compiled_rules[number_of_spaces] = (
+                rules, chance.tolist(), community_chest.tolist(),
+                frozenset(rules.chance_spaces),
+                frozenset(rules.community_chest_spaces),
+                rules.go_to_jail_table().tolist())
+        return self._compiled_rules[number_of_spaces]
 
     def update_position(self, current_position: int,
-                        spaces: List[MonopolySpace],
                         number_of_spaces=40) -> int:
         #The variable to be output
         new_position = None
-        
+        counters = self.instrumentation
+        if counters is not None:
+            start = counters.begin_turn()
+
+        rules, chance, community_chest, chance_spaces, \
+            community_chest_spaces, go_to_jail = \
+            self._get_rules(number_of_spaces)
+        jail_position = rules.jail_position
+
         #Roll the dice roller
         roll, dice_rolls, doubles = self.diceroller.roll()
 
-        #Rule - getting out of jail on doubles or time
+        #Rule - getting out of jail on doubles, by paying or on time
         if self.in_jail:
             self.time_in_jail += 1
-            #Roll doubles and you are out now
-            if doubles:
-                self.N_doubles += 1
+            #Roll doubles or pay and you are out now
+            #(the doubles rule below counts this roll)
+            if doubles or rules.jail_strategy == "pay":
                 self.in_jail = False
                 self.time_in_jail = 0
-                new_position = (10 + roll) % number_of_spaces
+                new_position = (rules.visiting_position + roll) % \
+                    number_of_spaces
+                if counters is not None and rules.jail_strategy == "pay":
+                    counters.jail_exits_paid += 1
+                elif counters is not None:
+                    counters.jail_exits_doubles += 1
             #Out on time and you are now just visiting
-            if (self.time_in_jail >= 3):
+            elif (self.time_in_jail >= rules.jail_turns):
                 self.N_doubles = 0
                 self.in_jail = False
                 self.time_in_jail = 0
-                new_position = 10
+                new_position = rules.visiting_position
+                if counters is not None:
+                    counters.jail_exits_timeout += 1
             else:
-                new_position = 30 #still in jail
+                new_position = jail_position #still in jail
         else:
             new_position = (current_position + roll) % number_of_spaces
-            
+
         #Determine rules about the new position
         #Rule - doubles
         if not doubles:
             self.N_doubles = 0
         else:
             self.N_doubles += 1
-            if self.N_doubles == 3:
-                new_position = 30 #Go to jail!
+            if self.N_doubles == rules.max_doubles:
+                new_position = jail_position #Go to jail!
                 self.in_jail = True
+                if counters is not None:
+                    counters.triple_doubles += 1
+        #Landing on Go To Jail, rather than being jailed by doubles
+        if counters is not None and not self.in_jail and \
+           go_to_jail[new_position] == jail_position:
+            counters.go_to_jail += 1
         
         #Rule - chance cards
-        if new_position in [7, 22, 36]:
-            draw = rand.randint(0, 16)
-            if draw == 0: #Proceed to Go
-                new_position = 0
-            elif draw == 1: #Illinois Ave
-                new_position = 24
-            elif draw == 2: #St. Charles Pl.
-                new_position = 11
-            elif draw == 3: #Nearest Utility
-                if new_position == 7:
-                    new_position = 12
-                else:
-                    new_position = 28
-            elif draw == 4: #Nearest Railroad
-                if new_position == 7:
-                    new_position = 5
-                elif new_position == 22:
-                    new_position = 25
-                else:
-                    new_position = 35
-            elif draw == 7: #Back 3 spaces
-                new_position -= 3
-            elif draw == 8: #Go to jail
-                new_position = 30
-            elif draw == 11: #Reading Railroad
-                new_position = 5
-            elif draw == 12: #Boardwalk
-                new_position = 39
-            #else do nothing
-                
+        if new_position in chance_spaces:
+            draw = self.chance_deck.draw()
+            new_position = chance[new_position][draw]
+            if counters is not None:
+                counters.chance_draws[draw] += 1
+
         #Rule - community chest cards
-        if new_position in [2, 17, 33]:
-            draw = rand.randint(0, 16)
-            if draw == 0: #Proceed to Go
-                new_position = 0
-            elif draw == 5: #Go to Jail
-                new_position = 30
-            #else do nothing
+        if new_position in community_chest_spaces:
+            draw = self.community_chest_deck.draw()
+            new_position = community_chest[new_position][draw]
+            if counters is not None:
+                counters.community_chest_draws[draw] += 1
 
         #Rule - going into jail
-        if new_position == 30:
+        new_position = go_to_jail[new_position]
+        if new_position == jail_position:
             self.in_jail = True
             self.N_doubles = 0
 
-        if (new_position < 0) or (new_position > 40):
+        if (new_position < 0) or (new_position >= number_of_spaces):
             raise Exception("Something went wrong. "+\
                             "Roller position = %d."%new_position)
 
+        if counters is not None:
+            counters.end_turn(start, new_position)
         #Return the new position
         return new_position
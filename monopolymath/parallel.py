@@ -0,0 +1,102 @@
+"""
+Running large batch simulations on a pool of processes. The players are
+split into one shard per worker, and every shard draws from its own
+random number generator spawned from a single seed, so that a result
+only depends on the seed and the number of workers.
+"""
+import os
+import numpy as np
+from .batchmover import BatchRollMover
+from .instrumentation import Instrumentation
+
+#Players are moved in blocks of at most this many at a time
+#to bound the memory used by each worker
+MAXIMUM_BLOCK_SIZE = 2**20
+
+def _simulate_shard(diceroller, number_of_players, number_of_turns,
+                    number_of_spaces, seed_sequence, shuffled_decks,
+                    rules=None, instrumentation=None):
+    """
+    Simulate the players of one shard, block by block, with
+    a generator made from the shard's seed sequence.
+
+    Returns:
+        (float array, :obj: Instrumentation): the landings of the
+            shard, and its instrumentation
+    """
+    rng = np.random.default_rng(seed_sequence)
+    visits = np.zeros(number_of_spaces)
+    number_of_blocks = -(-number_of_players//MAXIMUM_BLOCK_SIZE)
+    for block_size in _split_sizes(number_of_players, number_of_blocks):
+        mover = BatchRollMover(diceroller, block_size, number_of_spaces,
+                               rng=rng, shuffled_decks=shuffled_decks,
+                               instrumentation=instrumentation, rules=rules)
+        visits += mover.run(number_of_turns)
+    return visits, instrumentation
+
+def _split_sizes(total: int, parts: int) -> list:
+    #The sizes of np.array_split, without making the array
+    size, extra = divmod(total, parts)
+    return [size + 1]*extra + [size]*(parts - extra)
+
+def shard_sizes(number_of_players: int, number_of_workers: int) -> list:
+    """
+    The number of players simulated by each worker.
+    """
+    return _split_sizes(number_of_players, number_of_workers)
+
+def simulate_parallel(diceroller, number_of_players: int,
+                      number_of_turns: int, seed=None,
+                      number_of_workers=None, number_of_spaces=40,
+                      shuffled_decks=False, instrumentation=None,
+                      rules=None) -> np.ndarray:
+    """
+    Move many independent players on a pool of processes and merge
+    their landings. For a given seed and number of workers the
+    result is the same bit for bit, however the pool schedules work.
+
+    Args:
+        diceroller (:obj: DiceRoller): dice that the players roll
+        number_of_players (int): total number of players
+        number_of_turns (int): number of rolls for each player
+        seed (int or :obj: numpy.random.SeedSequence): root seed that
+            the generator of every worker is spawned from; fresh
+            entropy if None
+        number_of_workers (int): number of processes; one per CPU if
+            None. With one worker no pool is started.
+        number_of_spaces (int): number of spaces on the board
+        shuffled_decks (bool): deal cards from shuffled decks
+        instrumentation (:obj: Instrumentation): if given, the counts
+            of every worker are added to it. Its hooks are only called
+            with one worker, when the players are moved in this process.
+        rules (:obj: Rules): the house rules; the standard rules if None
+
+    Returns:
+        float array: the `space_visits` histogram of all the players
+    """
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count() or 1
+    number_of_workers = min(number_of_workers, number_of_players)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(number_of_workers)
+    sizes = shard_sizes(number_of_players, number_of_workers)
+    arguments = [(diceroller, size, number_of_turns, number_of_spaces,
+                  shard_seed, shuffled_decks, rules)
+                 for size, shard_seed in zip(sizes, seeds)]
+    if number_of_workers == 1:
+        return _simulate_shard(*arguments[0], instrumentation)[0]
+    shard_instrumentation = None if instrumentation is None \
+        else Instrumentation()
+    #Imported here, as the pool is slow to import and rarely needed
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(number_of_workers) as executor:
+        futures = [executor.submit(_simulate_shard, *args,
+                                   shard_instrumentation)
+                   for args in arguments]
+        results = [future.result() for future in futures]
+    if instrumentation is not None:
+        for _, counts in results:
+            instrumentation.merge(counts)
+    #Merged in shard order; the counts are exact in floating point
+    return np.sum([visits for visits, _ in results], axis=0)
@@ -0,0 +1,291 @@
+"""
+House rules. A `Rules` object declares the rules a player moves by:
+how many doubles send a player to jail, how jail is left, which spaces
+send a player to jail and what is in the card decks. The rules compile
+once into the lookup tables of the `BatchRollMover` and into the exact
+transition matrix, so both always play the same game.
+
+Many variants of the rules can be evaluated at once with `sweep`,
+which shares the roll matrices between variants and spreads the
+variants over a pool of processes.
+"""
+import itertools
+import os
+import numpy as np
+from .cards import (CHANCE_CARDS, CHANCE_SPACES, COMMUNITY_CHEST_CARDS,
+                    COMMUNITY_CHEST_SPACES, compile_deck, compile_passes_go,
+                    table_matrix)
+from . import markovchain
+
+JAIL_STRATEGIES = ["wait", "pay"]
+
+class Rules(object):
+    """
+    A set of house rules.
+
+    Args:
+        number_of_spaces (int): number of spaces on the board
+        max_doubles (int): number of doubles in a row that send a
+            player to jail
+        jail_turns (int): number of turns a player waiting in jail
+            rolls for doubles before being let out
+        jail_strategy (str): "wait" to roll for doubles in jail, or
+            "pay" to pay out of jail immediately on the next turn
+        jail_position (int): the space where jailed players are
+        visiting_position (int): the space a player leaves jail from
+        go_to_jail_spaces (list of ints): spaces sending a player to
+            jail; just the jail position if None
+        chance_cards (list): the effect of every chance card, as in
+            `cards.CHANCE_CARDS`
+        chance_spaces (list of ints): spaces where chance is drawn
+        community_chest_cards (list): the effect of every community
+            chest card
+        community_chest_spaces (list of ints): spaces where community
+            chest is drawn
+    """
+    def __init__(self, number_of_spaces=40, max_doubles=3, jail_turns=3,
+                 jail_strategy="wait", jail_position=30,
+                 visiting_position=10, go_to_jail_spaces=None,
+                 chance_cards=CHANCE_CARDS, chance_spaces=CHANCE_SPACES,
+                 community_chest_cards=COMMUNITY_CHEST_CARDS,
+                 community_chest_spaces=COMMUNITY_CHEST_SPACES):
+        if jail_strategy not in JAIL_STRATEGIES:
+            raise Exception("Unknown jail strategy '%s'."%jail_strategy)
+        if max_doubles < 1 or jail_turns < 1:
+            raise Exception("'max_doubles' and 'jail_turns' must be "+\
+                            "at least 1.")
+        if len(chance_cards) == 0 or len(community_chest_cards) == 0:
+            raise Exception("Card decks cannot be empty.")
+        if go_to_jail_spaces is None:
+            go_to_jail_spaces = [jail_position]
+        spaces = [jail_position, visiting_position] + \
+            list(go_to_jail_spaces) + list(chance_spaces) + \
+            list(community_chest_spaces)
+        if min(spaces) < 0 or max(spaces) >= number_of_spaces:
+            raise Exception("Every rule must refer to a space on the board.")
+        self.number_of_spaces = number_of_spaces
+        self.max_doubles = max_doubles
+        self.jail_strategy = jail_strategy
+        #Players who pay are never in jail for more than one turn
+        self.jail_turns = 1 if jail_strategy == "pay" else jail_turns
+        self.jail_position = jail_position
+        self.visiting_position = visiting_position
+        self.go_to_jail_spaces = sorted(set(go_to_jail_spaces) |
+                                        {jail_position})
+        self.chance_cards = list(chance_cards)
+        self.chance_spaces = list(chance_spaces)
+        self.community_chest_cards = list(community_chest_cards)
+        self.community_chest_spaces = list(community_chest_spaces)
+        self._tables = None
+
+    def __repr__(self):
+        return "Rules(max_doubles=%d, jail_turns=%d, jail_strategy='%s', "\
+            "go_to_jail_spaces=%s, %d chance cards, %d community chest "\
+            "cards)"%(self.max_doubles, self.jail_turns, self.jail_strategy,
+                      self.go_to_jail_spaces, len(self.chance_cards),
+                      len(self.community_chest_cards))
+
+    def go_to_jail_table(self) -> np.ndarray:
+        """
+        Where a player ends up after landing on each space, when
+        the go to jail spaces send them to the jail position.
+        """
+        table = np.arange(self.number_of_spaces)
+        table[self.go_to_jail_spaces] = self.jail_position
+        return table
+
+    def card_tables(self):
+        """
+        The compiled lookup tables of the decks. The community chest
+        table also applies the go to jail spaces, so that one lookup
+        per deck carries out every action of a space.
+
+        Returns:
+            (int array, int array): the (spaces, cards) chance and
+                community chest tables
+        """
+        if self._tables is None:
+            N = self.number_of_spaces
+            chance = compile_deck(self.chance_cards, self.chance_spaces, N)
+            community_chest = compile_deck(self.community_chest_cards,
+                                           self.community_chest_spaces, N)
+            self._tables = (chance, self.go_to_jail_table()[community_chest])
+        return self._tables
+
+    def card_passes_go_tables(self):
+        """
+        Which cards move a player forward past Go, in the layout of
+        `card_tables`. Cards sending a player to jail do not pass Go.
+
+        Returns:
+            (boolean array, boolean array): the (spaces, cards) chance
+                and community chest tables
+        """
+        N = self.number_of_spaces
+        chance, community_chest = self.card_tables()
+        go_to_jail = self.go_to_jail_table()
+        return (compile_passes_go(self.chance_cards, self.chance_spaces, N)
+                & (go_to_jail[chance] != self.jail_position),
+                compile_passes_go(self.community_chest_cards,
+                                  self.community_chest_spaces, N)
+                & (community_chest != self.jail_position))
+
+    def action_matrix(self) -> np.ndarray:
+        """
+        The probability of ending up on each space after landing on a
+        space, drawing any cards there and being sent to jail.
+
+        Returns:
+            float array: the (spaces, spaces) action matrix
+        """
+        chance, community_chest = self.card_tables()
+        return table_matrix(chance) @ table_matrix(community_chest)
+
+    def transition_matrix(self, diceroller, rolls=None) -> np.ndarray:
+        """
+        The transition matrix of a player moving by these rules.
+
+        Args:
+            diceroller (:obj: DiceRoller): dice that the player rolls
+            rolls (float arrays): the roll matrices from
+                `markovchain.roll_matrices`, to share between rules
+
+        Returns:
+            float array: the (states, states) transition matrix
+        """
+        return markovchain.transition_matrix(
+            diceroller, self.number_of_spaces, self.action_matrix(),
+            self.jail_position, self.visiting_position, self.max_doubles,
+            self.jail_turns, self.jail_strategy, rolls)
+
+    def state_positions(self) -> np.ndarray:
+        return markovchain.state_positions(self.number_of_spaces,
+                                           self.max_doubles, self.jail_turns,
+                                           self.jail_position)
+
+    def stationary_distribution(self, diceroller, rolls=None) -> np.ndarray:
+        """
+        The long-run probability of being on each space.
+
+        Returns:
+            float array: probability of being on each space
+        """
+        pi = markovchain.stationary_distribution(
+            self.transition_matrix(diceroller, rolls))
+        return np.bincount(self.state_positions(), weights=pi,
+                           minlength=self.number_of_spaces)
+
+def rule_grid(**options) -> list:
+    """
+    Every combination of some options of the rules, e.g.
+    `rule_grid(max_doubles=[2, 3, 4], jail_strategy=["wait", "pay"])`
+    gives six rules.
+
+    Args:
+        options: lists of values of arguments of `Rules`
+
+    Returns:
+        list: a `Rules` for every combination
+    """
+    names = list(options)
+    return [Rules(**dict(zip(names, values)))
+            for values in itertools.product(*[options[n] for n in names])]
+
+def evaluate_variants(diceroller, variants, rolls=None,
+                      number_of_players=None, number_of_turns=100,
+                      seeds=None) -> list:
+    """
+    The landing distribution of each of some variants of the rules, in
+    this process, exactly or by simulation when a number of players is
+    given. `sweep` spreads chunks of variants over workers with it.
+
+    Args:
+        diceroller (:obj: DiceRoller): dice that the players roll
+        variants (list): the `Rules` of every variant
+        rolls (dict): roll matrices from `markovchain.roll_matrices`
+            by number of spaces, shared by the variants; computed
+            when needed if None
+        number_of_players (int): players simulated for each variant;
+            exact distributions if None
+        number_of_turns (int): turns simulated for each player
+        seeds (list): a seed or :obj: numpy.random.SeedSequence for
+            every variant; fresh entropy if None
+
+    Returns:
+        list: the landing distribution of every variant
+    """
+    from .batchmover import BatchRollMover
+    variants = list(variants)
+    if rolls is None:
+        rolls = {}
+    if seeds is None:
+        seeds = [None]*len(variants)
+    results = []
+    for rules, seed in zip(variants, seeds):
+        if number_of_players is None:
+            N = rules.number_of_spaces
+            if N not in rolls:
+                rolls[N] = markovchain.roll_matrices(diceroller, N)
+            results.append(rules.stationary_distribution(diceroller,
+                                                         rolls[N]))
+        else:
+            mover = BatchRollMover(diceroller, number_of_players,
+                                   rules.number_of_spaces,
+                                   rng=np.random.default_rng(seed),
+                                   rules=rules)
+            visits = mover.run(number_of_turns)
+            results.append(visits/visits.sum())
+    return results
+
+def sweep(diceroller, variants, number_of_workers=1, number_of_players=None,
+          number_of_turns=100, seed=None) -> np.ndarray:
+    """
+    The landing distribution of every variant of the rules. By default
+    the distributions are exact, from the transition matrices; the roll
+    matrices are computed once and shared by every variant. With a
+    number of players each variant is simulated instead.
+
+    Args:
+        diceroller (:obj: DiceRoller): dice that the players roll
+        variants (list): the `Rules` of every variant
+        number_of_workers (int): number of processes the variants are
+            spread over; one per CPU if None
+        number_of_players (int): players simulated for each variant;
+            exact distributions if None
+        number_of_turns (int): turns simulated for each player
+        seed (int or :obj: numpy.random.SeedSequence): root seed of
+            the simulations; every variant gets its own stream
+
+    Returns:
+        float array: (variants, spaces) landing distributions; the
+            variants must all have the same number of spaces
+    """
+    variants = list(variants)
+    if len(set(rules.number_of_spaces for rules in variants)) > 1:
+        raise Exception("Every variant must be on the same size of board.")
+    rolls = {}
+    if number_of_players is None:
+        for rules in variants:
+            N = rules.number_of_spaces
+            if N not in rolls:
+                rolls[N] = markovchain.roll_matrices(diceroller, N)
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(len(variants))
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count() or 1
+    number_of_workers = max(min(number_of_workers, len(variants)), 1)
+    chunks = np.array_split(np.arange(len(variants)), number_of_workers)
+    arguments = [(diceroller, [variants[i] for i in chunk], rolls,
+                  number_of_players, number_of_turns,
+                  [seeds[i] for i in chunk]) for chunk in chunks]
+    if number_of_workers == 1:
+        results = [evaluate_variants(*arguments[0])]
+    else:
+        #Imported here, as the pool is slow to import and rarely needed
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(number_of_workers) as executor:
+            futures = [executor.submit(evaluate_variants, *args)
+                       for args in arguments]
+            results = [future.result() for future in futures]
+    return np.array([pi for chunk in results for pi in chunk])
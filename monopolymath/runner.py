@@ -0,0 +1,273 @@
+"""
+Unattended batches of analyses. A sweep specification lists dice,
+rule variants and simulation sizes; every combination of them is one
+job, which finds the landing distribution exactly or by simulation.
+
+The jobs run on a pool of processes. Each finished job is saved to a
+checkpoint directory next to the output, so a sweep that is stopped
+picks up where it left off when run again. When every job is done the
+results are gathered into one compressed .npz file. Run it with
+
+    python -m monopolymath sweep.json --output results.npz
+
+where sweep.json is, for example,
+
+    {"dice": [{"sides": 6, "number": 2}, {"dice_array": [4, 8]}],
+     "rules": [{}, {"jail_strategy": "pay"}],
+     "simulations": [null, {"players": 10000, "turns": 100}],
+     "seed": 0}
+
+A simulation of null is an exact solve. Every job of a sweep gets its
+own random stream from the seed, whatever order the jobs run in; a
+sweep without a seed keeps the entropy it drew with its checkpoints.
+Jobs that fail are reported once every other job is done and saved.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import numpy as np
+from . import __version__
+from .diceroller import DiceRoller
+from .rules import Rules, evaluate_variants
+
+SPEC_KEYS = {"dice", "rules", "simulations", "seed"}
+CHECKPOINT_FILE = "job_%06d.npz"
+SPEC_FILE = "sweep.json"
+#The root entropy of a sweep without a seed, kept so a resumed sweep
+#gives its jobs the same streams
+ENTROPY_FILE = "entropy.json"
+
+def load_spec(path) -> dict:
+    """
+    Read and check a sweep specification from a JSON file.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+    unknown = set(spec) - SPEC_KEYS
+    if unknown:
+        raise Exception("Unknown keys in the sweep: %s."%sorted(unknown))
+    spec.setdefault("dice", [{}])
+    spec.setdefault("rules", [{}])
+    spec.setdefault("simulations", [None])
+    spec.setdefault("seed", None)
+    return spec
+
+def expand_jobs(spec) -> list:
+    """
+    Every combination of dice, rules and simulation of a sweep.
+
+    Returns:
+        list: a dict for each job with its "index", "dice", "rules"
+            and "simulation"
+    """
+    return [{"index": i, "dice": dice, "rules": rules,
+             "simulation": simulation}
+            for i, (dice, rules, simulation) in enumerate(itertools.product(
+                spec["dice"], spec["rules"], spec["simulations"]))]
+
+def run_job(job, seed) -> dict:
+    """
+    Find the landing distribution of one job.
+
+    Args:
+        job (dict): the job, from `expand_jobs`
+        seed (:obj: numpy.random.SeedSequence): the job's random stream
+
+    Returns:
+        dict: the "distribution" and the "seconds" it took
+    """
+    start = time.perf_counter()
+    diceroller = DiceRoller(**job["dice"])
+    rules = Rules(**job["rules"])
+    simulation = job["simulation"]
+    if simulation is None:
+        distribution, = evaluate_variants(diceroller, [rules],
+                                          seeds=[seed])
+    else:
+        distribution, = evaluate_variants(diceroller, [rules], None,
+                                          simulation["players"],
+                                          simulation["turns"], [seed])
+    return {"distribution": distribution,
+            "seconds": time.perf_counter() - start}
+
+def _save_checkpoint(directory, index, result) -> None:
+    #Written whole and then renamed, so a checkpoint is never half there
+    path = os.path.join(directory, CHECKPOINT_FILE%index)
+    temporary = path + ".tmp.npz"
+    np.savez(temporary, **result)
+    os.replace(temporary, path)
+    return
+
+def _load_checkpoint(directory, index):
+    path = os.path.join(directory, CHECKPOINT_FILE%index)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+def run_sweep(spec, output, number_of_workers=None, progress=sys.stderr,
+              keep_checkpoints=False) -> dict:
+    """
+    Run every job of a sweep, resuming from the checkpoints of an
+    earlier run, and write the results to a compressed .npz file.
+
+    Args:
+        spec (dict): the sweep specification
+        output (str): path of the .npz file of results
+        number_of_workers (int): number of processes; one per CPU if
+            None. With one worker the jobs run in this process.
+        progress (file): where progress is reported; silent if None
+        keep_checkpoints (bool): keep the checkpoint directory after
+            the results are written
+
+    Returns:
+        dict: the arrays written to the output
+    """
+    jobs = expand_jobs(spec)
+    checkpoints = output + ".checkpoints"
+    os.makedirs(checkpoints, exist_ok=True)
+    #Checkpoints are only used by the sweep that made them
+    spec_path = os.path.join(checkpoints, SPEC_FILE)
+    if os.path.exists(spec_path):
+        with open(spec_path) as f:
+            if json.load(f) != spec:
+                raise Exception("The checkpoints in '%s' are of another "
+                                "sweep."%checkpoints)
+    else:
+        with open(spec_path, "w") as f:
+            json.dump(spec, f)
+    seed = _root_seed(spec, checkpoints)
+    seeds = seed.spawn(len(jobs))
+    results = {}
+    for job in jobs:
+        result = _load_checkpoint(checkpoints, job["index"])
+        if result is not None:
+            results[job["index"]] = result
+    todo = [job for job in jobs if job["index"] not in results]
+    if progress is not None and results:
+        print("Resuming: %d of %d jobs already done."%(len(results),
+                                                       len(jobs)),
+              file=progress)
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    failures = {}
+    #Every job that finishes is checkpointed, even after others fail
+    for done, (job, result) in enumerate(
+            _run_jobs(todo, seeds, number_of_workers), 1):
+        if isinstance(result, Exception):
+            failures[job["index"]] = result
+            if progress is not None:
+                print("[%d/%d] job %d failed: %r"%(done, len(todo),
+                                                   job["index"], result),
+                      file=progress)
+            continue
+        _save_checkpoint(checkpoints, job["index"], result)
+        results[job["index"]] = result
+        if progress is not None:
+            print("[%d/%d] job %d done in %.3f s (%.1f s elapsed)"%(
+                done, len(todo), job["index"], result["seconds"],
+                time.perf_counter() - start), file=progress)
+    if failures:
+        raise Exception("%d of %d jobs failed; run the sweep again to "
+                        "retry them. Job %d: %r"%(
+                            len(failures), len(jobs), min(failures),
+                            failures[min(failures)]))
+    arrays = _gather(spec, jobs, results)
+    np.savez_compressed(output, **arrays)
+    if not keep_checkpoints:
+        for job in jobs:
+            os.remove(os.path.join(checkpoints,
+                                   CHECKPOINT_FILE%job["index"]))
+        os.remove(spec_path)
+        if os.path.exists(os.path.join(checkpoints, ENTROPY_FILE)):
+            os.remove(os.path.join(checkpoints, ENTROPY_FILE))
+        os.rmdir(checkpoints)
+    return arrays
+
+def _root_seed(spec, checkpoints):
+    """
+    The root seed of a sweep. Without a seed in the spec, fresh
+    entropy is drawn once and kept with the checkpoints.
+    """
+    if spec["seed"] is not None:
+        return np.random.SeedSequence(spec["seed"])
+    path = os.path.join(checkpoints, ENTROPY_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return np.random.SeedSequence(json.load(f))
+    seed = np.random.SeedSequence()
+    with open(path, "w") as f:
+        json.dump(seed.entropy, f)
+    return seed
+
+def _run_jobs(jobs, seeds, number_of_workers):
+    """
+    Run jobs, in this process with one worker or else on a pool,
+    yielding each job with its result, or the exception it raised,
+    as it finishes.
+    """
+    if number_of_workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            try:
+                yield job, run_job(job, seeds[job["index"]])
+            except Exception as exception:
+                yield job, exception
+        return
+    #Imported here, as the pool is slow to import and rarely needed
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(number_of_workers) as executor:
+        futures = {executor.submit(run_job, job, seeds[job["index"]]): job
+                   for job in jobs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except Exception as exception:
+                yield futures[future], exception
+    return
+
+def _gather(spec, jobs, results) -> dict:
+    """
+    The results of every job as columns, one row per job.
+    """
+    simulations = [job["simulation"] or {} for job in jobs]
+    distributions = [results[job["index"]]["distribution"] for job in jobs]
+    if len(set(len(d) for d in distributions)) > 1:
+        #Boards of different sizes are padded with zeros
+        size = max(len(d) for d in distributions)
+        distributions = [np.pad(d, (0, size - len(d)))
+                         for d in distributions]
+    return {"distributions": np.array(distributions),
+            "seconds": np.array([float(results[job["index"]]["seconds"])
+                                 for job in jobs]),
+            "dice": np.array([json.dumps(job["dice"], sort_keys=True)
+                              for job in jobs]),
+            "rules": np.array([json.dumps(job["rules"], sort_keys=True)
+                               for job in jobs]),
+            "exact": np.array([job["simulation"] is None for job in jobs]),
+            "players": np.array([s.get("players", 0) for s in simulations]),
+            "turns": np.array([s.get("turns", 0) for s in simulations]),
+            "spec": np.array(json.dumps(spec, sort_keys=True)),
+            "version": np.array(__version__)}
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m monopolymath",
+        description="Run a sweep of landing distributions over dice, "
+        "rule variants and simulation sizes.")
+    parser.add_argument("spec", help="JSON sweep specification")
+    parser.add_argument("--output", "-o", default="results.npz",
+                        help="compressed .npz file of results")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="number of processes; one per CPU by default")
+    parser.add_argument("--quiet", "-q", action="store_true",
+                        help="do not report progress")
+    parser.add_argument("--keep-checkpoints", action="store_true",
+                        help="keep the checkpoints after finishing")
+    args = parser.parse_args(argv)
+    run_sweep(load_spec(args.spec), args.output, args.workers,
+              None if args.quiet else sys.stderr, args.keep_checkpoints)
+    return
@@ -0,0 +1,142 @@
+"""
+How the long-run landing probabilities change with the dice and the
+cards, from perturbation theory of the Markov chain of a player.
+
+If the transition matrix moves by dT, keeping its rows summing to one,
+the stationary distribution moves by
+
+    dpi = pi dT Z,    Z = (I - T + 1 pi^T)^-1
+
+where Z is the fundamental matrix, which differs from the group inverse
+of I - T by 1 pi^T; that term drops out because the rows of dT sum to
+zero. Z is found with a single solve, and the derivatives with respect
+to every parameter then follow from one batched product.
+
+The parameters are the probability of every roll total and of drawing
+every card. Each derivative is along the direction that raises one
+probability and lowers all the others in proportion, so that they
+still sum to one. The transition matrix is linear (for the rolls) or
+affine (for the cards) in these probabilities, so along such a
+direction dT is the matrix with all of the probability on one roll
+total or card, less T itself.
+"""
+import numpy as np
+from . import markovchain
+
+def stationary_derivatives(T, directions, pi=None) -> np.ndarray:
+    """
+    The derivatives of the stationary distribution of a chain along
+    many directions of change of its transition matrix.
+
+    Args:
+        T (float array): (states, states) transition matrix
+        directions (float array): (parameters, states, states) changes
+            of T, each with rows summing to zero
+        pi (float array): the stationary distribution of T, if known
+
+    Returns:
+        float array: (parameters, states) derivatives
+    """
+    if markovchain._is_sparse(T):
+        T = T.toarray()
+    T = np.asarray(T, dtype=float)
+    if pi is None:
+        pi = markovchain.stationary_distribution(T)
+    S = len(T)
+    #pi dT Z for all directions: solve Z^T x = (pi dT)^T at once
+    A = np.identity(S) - T + np.outer(np.ones(S), pi)
+    return np.linalg.solve(A.T, np.einsum("s,pst->tp", pi,
+                                          directions)).T
+
+def _rules_transition_matrix(board, action_matrix=None, rolls=None):
+    rules = board.rules
+    if action_matrix is None:
+        action_matrix = board.action_matrix
+    return markovchain.transition_matrix(
+        board.diceroller, board.number_of_spaces, action_matrix,
+        rules.jail_position, rules.visiting_position, rules.max_doubles,
+        rules.jail_turns, rules.jail_strategy, rolls)
+
+def roll_directions(board) -> np.ndarray:
+    """
+    The change of the transition matrix of a board when all of the
+    probability of the dice moves onto each roll total in turn. The
+    share of doubles of each total is kept.
+
+    Returns:
+        float array: (roll totals, states, states) directions
+    """
+    diceroller = board.diceroller
+    N = board.number_of_spaces
+    p_non_doubles, p_doubles = diceroller.split_probability_array()
+    p = p_non_doubles + p_doubles
+    with np.errstate(divide="ignore", invalid="ignore"):
+        doubles = np.where(p > 0, p_doubles/p, 0.)
+    minimum_roll = diceroller.minimum_roll()
+    T = board.transition_matrix
+    directions = []
+    for total in range(len(p)):
+        unit = np.zeros(len(p))
+        unit[total] = 1.
+        rolls = (markovchain.roll_matrix(unit*(1. - doubles), minimum_roll,
+                                         N),
+                 markovchain.roll_matrix(unit*doubles, minimum_roll, N))
+        directions.append(_rules_transition_matrix(board, rolls=rolls) - T)
+    return np.array(directions)
+
+def card_directions(board):
+    """
+    The change of the transition matrix of a board when each card is
+    drawn every time from its deck instead of at random.
+
+    Returns:
+        (float array, float array): (cards, states, states) directions
+            of the chance and of the community chest cards
+    """
+    chance, community_chest = board.rules.card_tables()
+    N = board.number_of_spaces
+    identity = np.identity(N)
+    chance_matrix = identity[chance].mean(axis=1)
+    community_chest_matrix = identity[community_chest].mean(axis=1)
+    rolls = markovchain.roll_matrices(board.diceroller, N)
+    T = board.transition_matrix
+    chance_directions = [
+        _rules_transition_matrix(board, identity[chance[:, c]] @
+                                 community_chest_matrix, rolls) - T
+        for c in range(chance.shape[1])]
+    community_chest_directions = [
+        _rules_transition_matrix(board, chance_matrix @
+                                 identity[community_chest[:, c]], rolls) - T
+        for c in range(community_chest.shape[1])]
+    return np.array(chance_directions), np.array(community_chest_directions)
+
+def stationary_jacobian(board) -> dict:
+    """
+    The derivatives of the long-run probability of being on each space
+    with respect to the probability of every roll total and of
+    drawing every chance and community chest card.
+
+    Args:
+        board (:obj: MonopolyBoard): a board with dice assigned
+
+    Returns:
+        dict: (parameters, spaces) Jacobians "rolls", "chance" and
+            "community_chest", and the "roll_totals" of the rows of
+            the "rolls" Jacobian
+    """
+    if not hasattr(board, "transition_matrix"):
+        raise Exception("Must assign dice to the board first.")
+    chance, community_chest = card_directions(board)
+    rolls = roll_directions(board)
+    directions = np.concatenate([rolls, chance, community_chest])
+    derivatives = stationary_derivatives(board.transition_matrix,
+                                         directions)
+    S = len(board.state_positions)
+    projection = np.zeros((S, board.number_of_spaces))
+    projection[np.arange(S), board.state_positions] = 1.
+    derivatives = derivatives @ projection
+    R, C = len(rolls), len(chance)
+    return {"rolls": derivatives[:R],
+            "chance": derivatives[R:R + C],
+            "community_chest": derivatives[R + C:],
+            "roll_totals": board.diceroller.get_possible_rolls()}
@@ -0,0 +1,284 @@
+"""
+Recording the full paths of many players to disk, and reading them back.
+
+Every turn of every player is one record of the position, the dice,
+doubles, the jail state and the cards drawn. Records are written into
+chunks of a fixed number of turns, each a memory-mapped .npy file, so
+that a recording can be far larger than memory. The reader maps one
+chunk at a time to replay the records or aggregate them.
+"""
+import json
+import os
+import numpy as np
+
+METADATA_FILE = "trajectory.json"
+CHUNK_FILE = "chunk_%06d.npy"
+
+#Records hold dice of up to this many sides, and card numbers and
+#turns in jail up to this large
+MAXIMUM_SIDES = np.iinfo(np.uint16).max
+MAXIMUM_COUNT = np.iinfo(np.int16).max
+
+def record_dtype(number_of_dice=2) -> np.dtype:
+    """
+    The structured dtype of one record. Movers with larger dice, decks
+    or times in jail than the dtype holds are refused by the recorder.
+
+    Args:
+        number_of_dice (int): number of dice rolled each turn
+
+    Returns:
+        :obj: numpy.dtype: fields "position", "dice", "doubles",
+            "in_jail", "time_in_jail", "chance" and "community_chest";
+            the cards are -1 when none was drawn
+    """
+    return np.dtype([("position", np.int32),
+                     ("dice", np.uint16, (number_of_dice,)),
+                     ("doubles", bool),
+                     ("in_jail", bool),
+                     ("time_in_jail", np.int16),
+                     ("chance", np.int16),
+                     ("community_chest", np.int16)])
+
+class TrajectoryRecorder(object):
+    """
+    Streams the turns of a `BatchRollMover` into chunked,
+    memory-mapped files in a directory.
+
+    Args:
+        directory (str): where the chunks are written; made if needed
+        number_of_players (int): number of players recorded each turn
+        number_of_spaces (int): number of spaces on the board
+        number_of_dice (int): number of dice rolled each turn
+        chunk_turns (int): number of turns in each chunk file
+    """
+    def __init__(self, directory, number_of_players, number_of_spaces=40,
+                 number_of_dice=2, chunk_turns=1024):
+        if chunk_turns < 1:
+            raise Exception("Chunks must hold at least one turn.")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.number_of_players = number_of_players
+        self.number_of_spaces = number_of_spaces
+        self.number_of_dice = number_of_dice
+        self.chunk_turns = chunk_turns
+        self.dtype = record_dtype(number_of_dice)
+        self.number_of_turns = 0
+        self._chunk = None
+        self._checked_mover = None
+
+    def _check_mover(self, mover) -> None:
+        #Values too large for the records would silently wrap around
+        if np.max(mover._dice_high) - 1 > MAXIMUM_SIDES:
+            raise Exception("Dice of more than %d sides cannot be "
+                            "recorded."%MAXIMUM_SIDES)
+        if max(mover._chance_cards, mover._community_chest_cards,
+               mover.rules.jail_turns) > MAXIMUM_COUNT:
+            raise Exception("Decks or turns in jail of more than %d "
+                            "cannot be recorded."%MAXIMUM_COUNT)
+        self._checked_mover = mover
+        return
+
+    def _open_chunk(self) -> None:
+        path = os.path.join(self.directory, CHUNK_FILE%(
+            self.number_of_turns//self.chunk_turns))
+        self._chunk = np.lib.format.open_memmap(
+            path, mode="w+", dtype=self.dtype,
+            shape=(self.chunk_turns, self.number_of_players))
+        return
+
+    def record(self, mover) -> None:
+        """
+        Record the last turn of a mover, after `update_positions()`.
+
+        Args:
+            mover (:obj: BatchRollMover): the mover of the players
+        """
+        if mover.number_of_players != self.number_of_players:
+            raise Exception("The mover must move %d players."%
+                            self.number_of_players)
+        if mover is not self._checked_mover:
+            self._check_mover(mover)
+        if self._chunk is None:
+            self._open_chunk()
+        row = self._chunk[self.number_of_turns % self.chunk_turns]
+        row["position"] = mover.position
+        row["dice"] = mover.dice.T
+        row["doubles"] = mover.doubles
+        row["in_jail"] = mover.in_jail
+        row["time_in_jail"] = mover.time_in_jail
+        row["chance"], row["community_chest"] = mover.card_draws()
+        self.number_of_turns += 1
+        if self.number_of_turns % self.chunk_turns == 0:
+            self.flush()
+            self._chunk = None
+        return
+
+    def run(self, mover, number_of_turns: int) -> None:
+        """
+        Move the players of a mover `number_of_turns` times,
+        recording every turn.
+        """
+        for _ in range(number_of_turns):
+            mover.update_positions()
+            self.record(mover)
+        return
+
+    def flush(self) -> None:
+        """
+        Write the current chunk and the metadata to disk. The recording
+        can be read up to the last flush.
+        """
+        if self._chunk is not None:
+            self._chunk.flush()
+        metadata = {"number_of_players": self.number_of_players,
+                    "number_of_spaces": self.number_of_spaces,
+                    "number_of_dice": self.number_of_dice,
+                    "chunk_turns": self.chunk_turns,
+                    "number_of_turns": self.number_of_turns}
+        with open(os.path.join(self.directory, METADATA_FILE), "w") as f:
+            json.dump(metadata, f)
+        return
+
+    def close(self) -> None:
+        self.flush()
+        self._chunk = None
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+        return False
+
+class TrajectoryReader(object):
+    """
+    Reads a recording made by a `TrajectoryRecorder`. Chunks are
+    memory-mapped one at a time as they are needed, so only the
+    turns being looked at are read from disk.
+
+    Args:
+        directory (str): the directory of the recording
+    """
+    def __init__(self, directory):
+        path = os.path.join(directory, METADATA_FILE)
+        if not os.path.exists(path):
+            raise Exception("No trajectory recorded in '%s'."%directory)
+        with open(path) as f:
+            metadata = json.load(f)
+        self.directory = directory
+        self.number_of_players = metadata["number_of_players"]
+        self.number_of_spaces = metadata["number_of_spaces"]
+        self.number_of_dice = metadata["number_of_dice"]
+        self.chunk_turns = metadata["chunk_turns"]
+        self.number_of_turns = metadata["number_of_turns"]
+
+    def _turn_window(self, start, stop):
+        if stop is None or stop > self.number_of_turns:
+            stop = self.number_of_turns
+        return max(start, 0), stop
+
+    def chunks(self, start=0, stop=None, players=None):
+        """
+        Iterate over the recorded turns `start` to `stop`, a chunk
+        at a time.
+
+        Args:
+            start (int): first turn
+            stop (int): turn to stop before; the last turn if None
+            players (index): the players to read; all if None
+
+        Yields:
+            (int, record array): the first turn of the block, and the
+                memory-mapped (turns, players) records of the block
+        """
+        start, stop = self._turn_window(start, stop)
+        T = self.chunk_turns
+        for chunk in range(start//T, -(-stop//T)):
+            records = np.load(os.path.join(self.directory, CHUNK_FILE%chunk),
+                              mmap_mode="r")
+            first = max(start, chunk*T)
+            block = records[first - chunk*T:min(stop, (chunk + 1)*T) - chunk*T]
+            if players is not None:
+                block = block[:, players]
+            yield first, block
+        return
+
+    def replay(self, player=0, start=0, stop=None):
+        """
+        Replay the turns of one player.
+
+        Yields:
+            record: the record of every turn of the player, in order
+        """
+        for _, block in self.chunks(start, stop, player):
+            for record in block:
+                yield record
+        return
+
+    def read(self, field, start=0, stop=None, players=None) -> np.ndarray:
+        """
+        Read one field of a window of turns into memory.
+
+        Args:
+            field (str): the name of the field, e.g. "position"
+
+        Returns:
+            array: the (turns, players, ...) values of the field
+        """
+        return np.concatenate([np.array(block[field]) for _, block in
+                               self.chunks(start, stop, players)])
+
+    def visit_counts(self, start=0, stop=None, players=None) -> np.ndarray:
+        """
+        The number of turns ending on each space, in a window of turns.
+
+        Returns:
+            float array: the visits of each space, like `space_visits`
+        """
+        visits = np.zeros(self.number_of_spaces)
+        for _, block in self.chunks(start, stop, players):
+            visits += np.bincount(np.ravel(block["position"]),
+                                  minlength=self.number_of_spaces)
+        return visits
+
+    def transition_counts(self, n=2, start=0, stop=None,
+                          players=None) -> np.ndarray:
+        """
+        Count the n-grams of consecutive positions of every player,
+        i.e. how often a player went from one space to the next over
+        `n - 1` turns. With n = 2 this is the matrix of one-turn
+        transitions, which normalized gives the transition matrix.
+
+        Args:
+            n (int): length of the sequences counted
+            start (int): first turn
+            stop (int): turn to stop before; the last turn if None
+            players (index): the players to count; all if None
+
+        Returns:
+            float array: counts with n axes of length `number_of_spaces`,
+                indexed by the positions in order
+        """
+        if n < 1:
+            raise Exception("The n-grams must be at least one turn long.")
+        N = self.number_of_spaces
+        counts = np.zeros(N**n)
+        #The last turns of the previous block begin the next n-grams
+        carry = None
+        for _, block in self.chunks(start, stop, players):
+            positions = np.array(block["position"], dtype=np.int64)
+            if positions.ndim == 1:
+                positions = positions[:, None]
+            if carry is not None:
+                positions = np.concatenate([carry, positions])
+            if len(positions) >= n:
+                T = len(positions) - n + 1
+                index = np.zeros(positions[:T].shape, dtype=np.int64)
+                for k in range(n):
+                    index = index*N + positions[k:k + T]
+                counts += np.bincount(index.ravel(), minlength=N**n)
+            carry = positions[max(0, len(positions) - (n - 1)):] if n > 1 \
+                else None
+        return counts.reshape((N,)*n)
@@ -0,0 +1,250 @@
+"""
+Variance reduction for estimating landing frequencies by simulation,
+and for comparing two variants of the dice or the rules.
+
+Three techniques can be combined:
+
+- common random numbers: the variants are simulated from the same
+  random stream, so their players roll the same dice and draw the same
+  cards until the rules make them part ways, and most of the noise
+  cancels in the difference;
+- antithetic draws: half of the players roll the mirror image of the
+  dice of the other half (see `BatchRollMover`);
+- a control variate from the exact transition matrix: the probability
+  of landing on each space from the state a player is in is known
+  exactly, so the landings minus those probabilities average to zero,
+  and subtracting the part of the estimate correlated with them leaves
+  only the noise that the exact matrix cannot explain.
+
+The noise of every estimate is found by batch means, as in
+`convergence.ConvergenceMonitor`, and is compared with the noise of
+plain, independent simulations of the same length to give the variance
+reduction achieved.
+"""
+import numpy as np
+from .batchmover import BatchRollMover
+from .rules import Rules
+
+def state_indices(mover) -> np.ndarray:
+    """
+    The index in the transition matrix of the state of every player of
+    a `BatchRollMover`, as given by `markovchain.state_index`.
+    """
+    rules = mover.rules
+    N = mover.number_of_spaces
+    return np.where(mover.in_jail,
+                    rules.max_doubles*N + mover.time_in_jail,
+                    mover.N_doubles*N + mover.position)
+
+class _Arm(object):
+    """
+    One simulated variant, moved a batch of turns at a time, keeping
+    both the landings and their exact expectation given the states the
+    players were in before each turn.
+    """
+    def __init__(self, diceroller, rules, number_of_players, seed,
+                 antithetic, turns_per_batch):
+        if rules is None:
+            rules = Rules()
+        self.mover = BatchRollMover(diceroller, number_of_players,
+                                    rules.number_of_spaces,
+                                    rng=np.random.default_rng(seed),
+                                    rules=rules, antithetic=antithetic)
+        T = rules.transition_matrix(diceroller)
+        S = len(T)
+        projection = np.zeros((S, rules.number_of_spaces))
+        projection[np.arange(S), rules.state_positions()] = 1.
+        #Probability of landing on each space from each state
+        self.landing = T @ projection
+        self.number_of_states = S
+        self.turns_per_batch = turns_per_batch
+
+    def run(self):
+        """
+        Returns:
+            (float array, float array): the landing frequencies of the
+                batch, and their expectation from the exact matrix
+        """
+        mover = self.mover
+        states = np.zeros(self.number_of_states)
+        before = mover.space_visits.copy()
+        for _ in range(self.turns_per_batch):
+            states += np.bincount(state_indices(mover),
+                                  minlength=self.number_of_states)
+            mover.update_positions()
+        moves = self.turns_per_batch*mover.number_of_players
+        return (mover.space_visits - before)/moves, \
+            (states @ self.landing)/moves
+
+def _batch_variance(x) -> np.ndarray:
+    #The variance of the mean of the batches
+    return np.var(x, axis=0, ddof=1)/len(x)
+
+def _control(x, c):
+    """
+    The control-variate estimate from batch values x and controls c
+    with a known mean of zero, with the coefficient that minimizes the
+    variance fitted separately for every space.
+    """
+    dx = x - x.mean(axis=0)
+    dc = c - c.mean(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        beta = np.sum(dx*dc, axis=0)/np.sum(dc*dc, axis=0)
+    beta = np.nan_to_num(beta)
+    return x - beta*c
+
+def _result(x, control, plain_variance, control_variate):
+    estimates = _control(x, control) if control_variate else x
+    variance = _batch_variance(estimates)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        reduction = plain_variance/variance
+        total_reduction = np.divide(plain_variance.sum(), variance.sum())
+    return {"estimate": estimates.mean(axis=0),
+            "standard_error": np.sqrt(variance),
+            "plain_standard_error": np.sqrt(plain_variance),
+            "variance_reduction": reduction,
+            "total_variance_reduction": total_reduction}
+
+def _seeds(seed, common_random_numbers):
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    if common_random_numbers:
+        return seed, seed
+    return tuple(seed.spawn(2))
+
+def _check_batches(number_of_batches):
+    if number_of_batches < 2:
+        raise Exception("At least two batches are needed for the errors.")
+    return
+
+def estimate_frequencies(diceroller, rules=None, number_of_players=10000,
+                         number_of_batches=20, turns_per_batch=50,
+                         burn_in_turns=20, seed=None, antithetic=False,
+                         control_variate=True) -> dict:
+    """
+    Estimate the landing frequencies of the players by simulation,
+    with the variance reduction options.
+
+    Args:
+        diceroller (:obj: DiceRoller): dice that the players roll
+        rules (:obj: Rules): the house rules; the standard rules if None
+        number_of_players (int): number of players moved at once
+        number_of_batches (int): number of batches of turns
+        turns_per_batch (int): number of turns in each batch
+        burn_in_turns (int): turns discarded at the start
+        seed (int or :obj: numpy.random.SeedSequence): seed of the
+            random stream
+        antithetic (bool): use antithetic dice and cards
+        control_variate (bool): use the exact transition matrix as a
+            control variate
+
+    Returns:
+        dict: "estimate" and "standard_error" of the frequency of each
+            space, the "plain_standard_error" of a plain simulation of
+            the same length, their ratio of variances as
+            "variance_reduction" and the ratio of the summed variances
+            as "total_variance_reduction"
+    """
+    _check_batches(number_of_batches)
+    seed, _ = _seeds(seed, True)
+    arm = _Arm(diceroller, rules, number_of_players, seed, antithetic,
+               turns_per_batch)
+    arm.mover.run(burn_in_turns)
+    x, expected = map(np.array, zip(*[arm.run()
+                                      for _ in range(number_of_batches)]))
+    plain_variance = _plain_variance(arm, x)
+    return _result(x, x - expected, plain_variance, control_variate)
+
+def _plain_variance(arm, x) -> np.ndarray:
+    """
+    The batch-means variance a plain simulation would have had. Without
+    antithetic draws the players are independent and this is just the
+    variance of the batches x. Only the first half of antithetic players
+    are independent of each other, so as many batches of them alone are
+    simulated further.
+    """
+    mover = arm.mover
+    if not mover.antithetic:
+        return _batch_variance(x)
+    n = mover.number_of_players//2
+    plain = BatchRollMover(mover.diceroller, n, mover.number_of_spaces,
+                           rng=np.random.default_rng(
+                               mover.rng.integers(2**63)),
+                           rules=mover.rules)
+    plain.position = mover.position[:n].copy()
+    plain.N_doubles = mover.N_doubles[:n].copy()
+    plain.in_jail = mover.in_jail[:n].copy()
+    plain.time_in_jail = mover.time_in_jail[:n].copy()
+    turns = arm.turns_per_batch
+    batches = []
+    for _ in range(len(x)):
+        before = plain.space_visits.copy()
+        plain.run(turns)
+        batches.append((plain.space_visits - before)/(turns*n))
+    #Half as many players per batch have twice the variance
+    return _batch_variance(np.array(batches))/2.
+
+def compare(diceroller_a, diceroller_b=None, rules_a=None, rules_b=None,
+            number_of_players=10000, number_of_batches=20,
+            turns_per_batch=50, burn_in_turns=20, seed=None,
+            common_random_numbers=True, antithetic=False,
+            control_variate=True) -> dict:
+    """
+    Estimate the difference of the landing frequencies of two variants
+    of the dice or the rules, A minus B, by simulation with the variance
+    reduction options.
+
+    The variants are coupled best when they roll the same number of
+    dice and have decks of the same sizes, so that every turn uses the
+    same random numbers in both. With common random numbers the plain
+    variance is that of two independent simulations, which is the sum
+    of the variances of each variant alone.
+
+    Args:
+        diceroller_a (:obj: DiceRoller): dice of variant A
+        diceroller_b (:obj: DiceRoller): dice of variant B; those of
+            A if None
+        rules_a (:obj: Rules): rules of variant A; standard if None
+        rules_b (:obj: Rules): rules of variant B; standard if None
+        number_of_players (int): number of players of each variant
+        number_of_batches (int): number of batches of turns
+        turns_per_batch (int): number of turns in each batch
+        burn_in_turns (int): turns discarded at the start
+        seed (int or :obj: numpy.random.SeedSequence): seed of the
+            random streams
+        common_random_numbers (bool): simulate both variants from the
+            same random stream, rather than from independent streams
+        antithetic (bool): use antithetic dice and cards
+        control_variate (bool): use the exact transition matrices as
+            control variates
+
+    Returns:
+        dict: the "estimate" and "standard_error" of the difference of
+            the frequency of each space, the "plain_standard_error" of
+            independent plain simulations of the same length, their
+            ratio of variances as "variance_reduction" and the ratio of
+            the summed variances as "total_variance_reduction"
+    """
+    _check_batches(number_of_batches)
+    if diceroller_b is None:
+        diceroller_b = diceroller_a
+    seed_a, seed_b = _seeds(seed, common_random_numbers)
+    arms = [_Arm(diceroller_a, rules_a, number_of_players, seed_a,
+                 antithetic, turns_per_batch),
+            _Arm(diceroller_b, rules_b, number_of_players, seed_b,
+                 antithetic, turns_per_batch)]
+    if arms[0].mover.number_of_spaces != arms[1].mover.number_of_spaces:
+        raise Exception("Both variants must be on the same size of board.")
+    for arm in arms:
+        arm.mover.run(burn_in_turns)
+    #(batches, variants, landings and expectations, spaces)
+    batches = np.array([[arm.run() for arm in arms]
+                        for _ in range(number_of_batches)])
+    x = batches[:, :, 0]
+    expected = batches[:, :, 1]
+    #Independent simulations of A and B have the sum of their variances
+    plain_variance = _plain_variance(arms[0], x[:, 0]) + \
+        _plain_variance(arms[1], x[:, 1])
+    difference = x[:, 0] - x[:, 1]
+    control = (x[:, 0] - expected[:, 0]) - (x[:, 1] - expected[:, 1])
+    return _result(difference, control, plain_variance, control_variate)
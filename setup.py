@@ -7,10 +7,10 @@ dist = setup(
     description="Tool for simulating Monopoly.",
     license="MIT",
     url="https://github.com/tmcclintock/MonopolyMath",
-    python_requires=">=3.5",
+    python_requires=">=3.8",
     packages=["monopolymath"],
     package_dir={"monopolymath": "monopolymath"},
-    package_data={"monopolymath": ["*.txt"]},
+    package_data={"monopolymath": ["*.txt", "*.npy"]},
     include_package_data=True,
     long_description=open("README.md").read(),
 )
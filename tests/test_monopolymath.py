@@ -1,3 +1,7 @@
+import itertools
+import json
+import os
+import tempfile
 import numpy as np
 import numpy.testing as npt
 import monopolymath as mm
@@ -8,16 +12,6 @@ def test_diceroller_exceptions():
         dr = mm.DiceRoller(sides=6.)
     with npt.assert_raises(Exception):
         dr = mm.DiceRoller(number=6.)
-    #Check that the probability_array() function raises exceptions
-    with npt.assert_raises(Exception):
-        dr = mm.DiceRoller(dice_array=[6, 6])
-        dr.probability_array()
-    with npt.assert_raises(Exception):
-        dr = mm.DiceRoller(sides=4)
-        dr.probability_array()
-    with npt.assert_raises(Exception):
-        dr = mm.DiceRoller(number=4)
-        dr.probability_array()
     return
 
 def test_diceroller_without_dice_array():
@@ -71,6 +65,66 @@ def test_diceroller_with_dice_array():
         npt.assert_equal(rolls[0]==rolls[1]==rolls[2], doubles)
     return
 
+def test_diceroller_buffered():
+    with npt.assert_raises(Exception):
+        mm.DiceRoller(buffer_size=-1)
+    for dice_array in [None, [4, 5, 8]]:
+        dr = mm.DiceRoller(dice_array=dice_array, buffer_size=100,
+                           rng=np.random.default_rng(0))
+        tot, rolls, doubles = dr.roll()
+        npt.assert_equal(np.int64, type(tot))
+        npt.assert_equal(list, type(rolls))
+        npt.assert_equal(bool, type(doubles))
+        #The buffer is refilled as it runs out
+        results = [dr.roll() for _ in range(1000)]
+        for tot, rolls, doubles in results:
+            npt.assert_equal(sum(rolls), tot)
+            npt.assert_equal(len(set(rolls)) == 1, doubles)
+        totals = np.array([tot for tot, _, _ in results])
+        npt.assert_equal(True, dr.minimum_roll() <= totals.min())
+        npt.assert_equal(True, totals.max() <= dr.maximum_roll())
+    #The rolls follow the distribution of the dice
+    dr = mm.DiceRoller(buffer_size=4096, rng=np.random.default_rng(1))
+    totals = [dr.roll()[0] for _ in range(36000)]
+    npt.assert_allclose(dr.probability_array(),
+                        np.bincount(totals, minlength=13)[2:]/36000.,
+                        atol=5e-3)
+    #Buffered rolls from the global state are seeded with it
+    np.random.seed(2)
+    first = [mm.DiceRoller(buffer_size=10).roll()[1] for _ in range(3)]
+    np.random.seed(2)
+    npt.assert_equal(first, [mm.DiceRoller(buffer_size=10).roll()[1]
+                             for _ in range(3)])
+    return
+
+def test_diceroller_probability_array():
+    #Compare against counting every combination of the dice
+    for dice_array in [[6, 6], [4, 5, 8], [3, 3, 3], [10]]:
+        dr = mm.DiceRoller(dice_array=dice_array)
+        combinations = np.zeros(dr.maximum_roll() - dr.minimum_roll() + 1)
+        doubles = np.zeros_like(combinations)
+        for rolls in itertools.product(*[range(1, s+1) for s in dice_array]):
+            combinations[sum(rolls) - dr.minimum_roll()] += 1
+            if len(set(rolls)) == 1:
+                doubles[sum(rolls) - dr.minimum_roll()] += 1
+        npt.assert_allclose(combinations, dr.probability_array(unnormalized=True))
+        npt.assert_equal(np.prod(dice_array), dr.N_combinations)
+        p_non_doubles, p_doubles = dr.split_probability_array()
+        npt.assert_allclose(doubles/dr.N_combinations, p_doubles, atol=1e-15)
+        npt.assert_allclose((combinations - doubles)/dr.N_combinations,
+                            p_non_doubles, atol=1e-15)
+    #Standard dice give the same as a dice array
+    npt.assert_allclose(mm.DiceRoller(sides=4, number=3).probability_array(),
+                        mm.DiceRoller(dice_array=[4, 4, 4]).probability_array())
+    #Large pools use FFTs, and agree with direct convolution
+    dr = mm.DiceRoller(number=40)
+    p = np.ones(1)
+    for _ in range(40):
+        p = np.convolve(p, np.ones(6)/6)
+    npt.assert_allclose(p, dr.probability_array(), atol=1e-15)
+    npt.assert_equal(len(dr.get_possible_rolls()), len(p))
+    return
+
 def test_monopolyboard():
     #Test that a monopoly board object builds and has attributes
     mb = mm.MonopolyBoard()
@@ -94,6 +148,584 @@ def test_monopolyboard():
     npt.assert_equal("Mediterranean Ave", mb._space_names()[mb.position])
     return
 
+def test_monopolyboard_columns():
+    mb = mm.MonopolyBoard()
+    #Names map to indices
+    for i, name in enumerate(mb._space_names()):
+        npt.assert_equal(i, mb._space_index_from_name(name))
+    npt.assert_equal(39, mb._space_index_from_name("Boardwalk"))
+    #The columns agree with the space objects
+    for i, space in enumerate(mb.spaces):
+        npt.assert_equal(mm.monopolyboard.KIND_CODES[space.kind],
+                         mb.kind_codes[i])
+        npt.assert_equal(space.group, mb.groups[i])
+        npt.assert_equal(space.cost, mb.costs[i])
+        if space.kind == "Property":
+            npt.assert_equal(space.rent, mb.rents[i])
+            npt.assert_equal(space.building_rents, mb.building_rents[i])
+        if space.kind == "Railroad":
+            npt.assert_equal(space.RR_rents, mb.RR_rents[i])
+        npt.assert_equal(False, hasattr(space, "__dict__"))
+    npt.assert_equal(22, np.sum(mb.kind_codes == 1))
+    npt.assert_equal([2, 3, 3, 3, 3, 3, 3, 2, 4, 2],
+                     np.bincount(mb.groups[mb.groups >= 0]))
+    npt.assert_equal([200, 2000], mb.building_rents[39, [0, 4]])
+    npt.assert_equal(-1, mb.spaces[0].group)
+    return
+
+def test_economics():
+    from monopolymath import economics
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    pi = mb.stationary_distribution()
+    #Boardwalk with a hotel, by hand
+    rents = economics.expected_rents(mb, pi)
+    npt.assert_equal((40, 7), rents.shape)
+    npt.assert_allclose(pi[39]*2000, rents[39, -1])
+    npt.assert_allclose(pi[39]*100, rents[39, 1])
+    npt.assert_equal(0, rents[5].sum())
+    #Dark blue group with hotels
+    income = economics.group_income(mb, pi)
+    npt.assert_allclose(pi[37]*1500 + pi[39]*2000, income[7, -1])
+    turns = economics.break_even_turns(mb, pi, number_of_opponents=3)
+    cost = 350 + 400 + 2*5*200
+    npt.assert_allclose(cost/(3*income[7, -1]), turns[7, -1])
+    npt.assert_allclose(400/(3*pi[39]*50), turns[7, 0])
+    #Railroads and utilities
+    railroads = mb.groups == mm.monopolyboard.RAILROAD_GROUP
+    npt.assert_allclose(800/(200*pi[railroads].sum()),
+                        economics.railroad_break_even_turns(mb, pi))
+    npt.assert_allclose(pi[12]*70, economics.utility_income(
+        mb, pi, mb.diceroller)[12, 1])
+    #Many landing distributions at once
+    landing = np.stack([pi, np.ones(40)/40])
+    npt.assert_equal((2, 8, 7), economics.break_even_turns(mb, landing).shape)
+    npt.assert_allclose(turns, economics.break_even_turns(mb, landing, 3)[0])
+    return
+
+def test_decisions():
+    from monopolymath import decisions
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    landing = mb.stationary_distribution()
+    rents = mb.building_rents[[37, 39], 0]
+    amounts, p = decisions.income_distribution(rents, landing[[37, 39]], 2)
+    npt.assert_allclose(1, p.sum())
+    npt.assert_allclose(2*np.dot(rents, landing[[37, 39]]), np.dot(amounts, p))
+    policies = decisions.optimal_build_policies(mb, number_of_opponents=3)
+    npt.assert_equal(8, len(policies))
+    for policy in policies.values():
+        #Rich players build hotels at once, and nobody builds past them
+        npt.assert_equal(5, policy.policy[:, -1])
+        npt.assert_equal(np.inf, policy.thresholds()[-1])
+        npt.assert_equal(True, np.all(np.diff(policy.values, axis=1) >= -1e-6))
+    npt.assert_equal(0, policies[7].build_to(0, 0.))
+    npt.assert_equal(5, policies[7].build_to(0, 1e4))
+    #Players who may have to pay keep cash in reserve
+    expenses = ([0., 200., 1000.], [0.8, 0.15, 0.05])
+    careful = decisions.optimal_build_policies(
+        mb, number_of_opponents=3, expenses=expenses)
+    for group in policies:
+        npt.assert_equal(True, np.all(careful[group].thresholds() >=
+                                      policies[group].thresholds()))
+        npt.assert_equal(True, np.all(careful[group].values <=
+                                      policies[group].values + 1e-6))
+    #By default players pay the taxes, so cash can go down
+    untaxed = decisions.optimal_build_policies(
+        mb, number_of_opponents=3, expenses=([0.], [1.]))
+    npt.assert_equal(True, np.all(untaxed[7].values >=
+                                  policies[7].values - 1e-6))
+    npt.assert_equal(True, np.any(untaxed[7].values >
+                                  policies[7].values + 1e-6))
+    #Bankrupt players collect nothing and never build
+    ruined = decisions.optimal_build_policies(
+        mb, number_of_opponents=3, expenses=([1e5], [1.]))
+    for policy in ruined.values():
+        npt.assert_equal(0, policy.values)
+        npt.assert_equal(0, policy.policy[0])
+    #Starting from the values of a similar problem converges sooner
+    warm = decisions.optimal_build_policies(
+        mb, landing*1.01, number_of_opponents=3, expenses=expenses,
+        previous=careful)
+    npt.assert_equal(True, warm[7].iterations < careful[7].iterations)
+    with npt.assert_raises(Exception):
+        decisions.optimal_build_policies(mb, discount=1.)
+    return
+
+def test_gamesimulator():
+    from monopolymath.gamesimulator import GameSimulator
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    with npt.assert_raises(Exception):
+        GameSimulator(mb, 10, number_of_players=9)
+    #Games are played by the rules the dice were assigned with
+    from monopolymath.rules import Rules
+    board = mm.MonopolyBoard()
+    board.assign_dice(rules=Rules(jail_strategy="pay"))
+    npt.assert_equal(True, GameSimulator(board, 10).mover.rules is
+                     board.rules)
+    #Paying out of jail costs the fine
+    from monopolymath.gamesimulator import GO_SALARY, JAIL_FINE
+    sim = GameSimulator(board, 100, buy_reserve=1e9,
+                        rng=np.random.default_rng(3))
+    sim._taxes[:] = 0.
+    sim.in_jail[:, 0] = True
+    sim.position[:, 0] = board.rules.jail_position
+    sim.step()
+    npt.assert_allclose(1500. - JAIL_FINE + GO_SALARY*sim.mover.passed_go,
+                        sim.cash[:, 0])
+    #Money only comes from the bank: a player selling houses to pay
+    #rent pays the owner in full, and sells no more than needed
+    from monopolymath.gamesimulator import GO_SALARY
+    sim = GameSimulator(mb, 500, number_of_players=2, build_reserve=1e9,
+                        rng=np.random.default_rng(1))
+    sim._taxes[:] = 0.
+    mine = np.isin(np.arange(40), [37, 39])
+    theirs = sim._purchasable & ~mine
+    sim.owner[:, theirs] = 1
+    sim.owner[:, mine] = 0
+    groups = sim.group_counts.shape[2]
+    sim.group_counts[:, 0] = np.bincount(mb.groups[mine], minlength=groups)
+    sim.group_counts[:, 1] = np.bincount(mb.groups[theirs],
+                                         minlength=groups)
+    sim.houses[:, 37] = 4
+    sim.houses[:, 39] = 3
+    sim.cash[:, 0] = 100.
+    sim.position[:, 0] = np.random.default_rng(2).choice(
+        np.delete(np.arange(40), 30), 500)
+    def worth():
+        return sim.cash.sum(axis=1) + \
+            np.sum(sim.houses*mb.house_costs/2, axis=1)
+    before = worth()
+    sim.step()
+    npt.assert_allclose(before + GO_SALARY*sim.mover.passed_go, worth())
+    sold = sim.houses[:, 37] + sim.houses[:, 39] < 7
+    npt.assert_equal(True, sold.any())
+    npt.assert_equal(True, np.all(sim.alive))
+    npt.assert_equal(True, np.all((0 <= sim.cash[sold, 0]) &
+                                  (sim.cash[sold, 0] < 100)))
+    sim = GameSimulator(mb, 200, number_of_players=3,
+                        rng=np.random.default_rng(0))
+    results = sim.run(max_moves=300, record_every=10)
+    npt.assert_equal((200,), results["game_length"].shape)
+    npt.assert_equal((31, 200, 3), results["cash"].shape)
+    npt.assert_equal(True, np.all(sim.cash >= 0))
+    npt.assert_equal(True, results["win_rates"].sum() <= 1)
+    #Finished games have exactly one player left, who won
+    finished = results["winner"] >= 0
+    npt.assert_equal(True, np.any(finished))
+    npt.assert_equal(1, sim.alive[finished].sum(axis=1))
+    npt.assert_equal(True, np.all(
+        sim.alive[finished, results["winner"][finished]]))
+    #Spaces are owned by players still in the game, and the group
+    #counts agree with the owners
+    owner = sim.owner[~finished]
+    npt.assert_equal(True, np.all(
+        sim.alive[~finished][np.flatnonzero(owner >= 0)//40,
+                             owner[owner >= 0]]))
+    for p in range(3):
+        counts = [np.sum((sim.owner == p) & (mb.groups == g), axis=1)
+                  for g in range(10)]
+        npt.assert_equal(np.array(counts).T, sim.group_counts[:, p])
+    return
+
+def test_instrumentation():
+    from monopolymath.instrumentation import Instrumentation
+    def jailings(counters):
+        #Every way into jail, including the go to jail cards
+        return counters.triple_doubles + counters.go_to_jail + \
+            counters.chance_draws[8] + counters.community_chest_draws[5]
+    #One player moved by the roll mover, with a timing hook
+    times = []
+    counters = Instrumentation(hooks=[lambda seconds, position:
+                                      times.append(seconds)])
+    mr = mm.MonopolyRollMover(mm.DiceRoller(), instrumentation=counters)
+    position = 0
+    for _ in range(2000):
+        position = mr.update_position(position)
+    npt.assert_equal(2000, counters.moves)
+    npt.assert_equal(2000, len(times))
+    npt.assert_allclose(np.sum(times), counters.turn_time)
+    npt.assert_equal(jailings(counters) - counters.jail_exits_doubles -
+                     counters.jail_exits_timeout, int(mr.in_jail))
+    npt.assert_equal(True, counters.chance_draws.sum() > 0)
+    #Instrumenting the batch mover does not change the simulation
+    dr = mm.DiceRoller()
+    counters = Instrumentation()
+    mover = mm.BatchRollMover(dr, 1000, rng=np.random.default_rng(1),
+                              instrumentation=counters)
+    visits = mover.run(50).copy()
+    plain = mm.BatchRollMover(dr, 1000, rng=np.random.default_rng(1))
+    npt.assert_equal(visits, plain.run(50))
+    npt.assert_equal(50, counters.turns)
+    npt.assert_equal(50000, counters.moves)
+    npt.assert_equal(jailings(counters) - counters.jail_exits_doubles -
+                     counters.jail_exits_timeout, mover.in_jail.sum())
+    #Triple doubles jail a player on 1/216 of free moves
+    npt.assert_equal(True, 0 < counters.triple_doubles < 0.01*50000)
+    #Counts from every worker are merged
+    counters = Instrumentation()
+    mm.parallel.simulate_parallel(dr, 100, 20, seed=0, number_of_workers=2,
+                                  instrumentation=counters)
+    npt.assert_equal(2000, counters.moves)
+    npt.assert_equal(2000, counters.as_dict()["moves"])
+    #Decks of any size are counted, and merged with the standard decks
+    from monopolymath.rules import Rules
+    rules = Rules(chance_cards=[None]*20 + [("to", 0)])
+    counters = Instrumentation()
+    mr = mm.MonopolyRollMover(dr, instrumentation=counters, rules=rules)
+    position = 0
+    for _ in range(500):
+        position = mr.update_position(position)
+    mover = mm.BatchRollMover(dr, 100, instrumentation=counters,
+                              rules=rules)
+    mover.run(20)
+    npt.assert_equal((21, 16), counters.deck_sizes)
+    npt.assert_equal(True, counters.chance_draws.sum() > 0)
+    total = counters.chance_draws.sum()
+    standard = Instrumentation()
+    mm.BatchRollMover(dr, 100, instrumentation=standard).run(20)
+    total += standard.chance_draws.sum()
+    npt.assert_equal(21, len(standard.merge(counters).chance_draws))
+    npt.assert_equal(total, standard.chance_draws.sum())
+    #Paying to leave jail is not counted as rolling doubles
+    counters = Instrumentation()
+    mover = mm.BatchRollMover(dr, 1000, instrumentation=counters,
+                              rules=Rules(jail_strategy="pay"))
+    mover.run(50)
+    npt.assert_equal(0, counters.jail_exits_doubles)
+    npt.assert_equal(0, counters.jail_exits_timeout)
+    npt.assert_equal(jailings(counters) - counters.jail_exits_paid,
+                     mover.in_jail.sum())
+    counters = Instrumentation()
+    mr = mm.MonopolyRollMover(dr, instrumentation=counters,
+                              rules=Rules(jail_strategy="pay"))
+    position = 0
+    for _ in range(2000):
+        position = mr.update_position(position)
+    npt.assert_equal(0, counters.jail_exits_doubles)
+    npt.assert_equal(jailings(counters) - counters.jail_exits_paid,
+                     int(mr.in_jail))
+    return
+
+def test_trajectory():
+    from monopolymath.trajectory import TrajectoryReader
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    directory = tempfile.mkdtemp()
+    before = mb.space_visits.copy()
+    #Chunks that do not divide the number of turns
+    reader = mb.record_players(directory, 50, 70, chunk_turns=16,
+                               rng=np.random.default_rng(2))
+    npt.assert_equal(70, reader.number_of_turns)
+    npt.assert_equal(mb.space_visits - before, reader.visit_counts())
+    reader = TrajectoryReader(directory)
+    npt.assert_equal(mb.space_visits - before, np.bincount(
+        reader.read("position").ravel(), minlength=40))
+    #Records agree with the rules
+    records = reader.read("dice")
+    npt.assert_equal((70, 50, 2), records.shape)
+    npt.assert_equal(reader.read("doubles"), records[..., 0] == records[..., 1])
+    in_jail = reader.read("in_jail")
+    npt.assert_equal(True, np.all(reader.read("position")[in_jail] == 30))
+    chance = reader.read("chance")
+    npt.assert_equal(True, np.all((chance >= -1) & (chance < 16)))
+    #Transitions across chunk boundaries
+    positions = reader.read("position", 10, 40, players=[3, 7])
+    counts = reader.transition_counts(2, 10, 40, players=[3, 7])
+    expected = np.zeros((40, 40))
+    np.add.at(expected, (positions[:-1].ravel(), positions[1:].ravel()), 1)
+    npt.assert_equal(expected, counts)
+    npt.assert_equal(50*68, reader.transition_counts(3).sum())
+    replayed = [r["position"] for r in reader.replay(4, 0, 20)]
+    npt.assert_equal(reader.read("position", 0, 20)[:, 4], replayed)
+    #Sequences longer than a chunk
+    reader = mb.record_players(tempfile.mkdtemp(), 10, 15, chunk_turns=2,
+                               rng=np.random.default_rng(2))
+    positions = reader.read("position")
+    expected = np.zeros((40,)*4)
+    np.add.at(expected, tuple(positions[k:k + 12].ravel()
+                              for k in range(4)), 1)
+    npt.assert_equal(expected, reader.transition_counts(4))
+    #Big dice and decks are recorded whole, and bigger ones refused
+    from monopolymath.rules import Rules
+    from monopolymath.trajectory import TrajectoryRecorder
+    board = mm.MonopolyBoard()
+    board.assign_dice(sides=300, rules=Rules(chance_cards=[None]*200))
+    reader = board.record_players(tempfile.mkdtemp(), 20, 30,
+                                  rng=np.random.default_rng(3))
+    npt.assert_equal(True, reader.read("dice").max() > 255)
+    npt.assert_equal(True, reader.read("chance").max() > 127)
+    mover = mm.BatchRollMover(mm.DiceRoller(sides=70000), 5)
+    recorder = TrajectoryRecorder(tempfile.mkdtemp(), 5)
+    mover.update_positions()
+    with npt.assert_raises(Exception):
+        recorder.record(mover)
+    return
+
+def test_analytics():
+    from monopolymath import analytics
+    #Powers by squaring, from the cache or not
+    T = np.array([[0.9, 0.1], [0.3, 0.7]])
+    powers = analytics.MatrixPowers(T)
+    npt.assert_allclose(np.linalg.matrix_power(T, 13), powers.power(13))
+    npt.assert_allclose(np.linalg.matrix_power(T, 6), powers.powers([6])[0])
+    npt.assert_allclose(np.linalg.matrix_power(T, 20), powers.power(20))
+    #Two states: the first step to the second state takes 1/0.1 steps
+    npt.assert_allclose([10, 0], analytics.hitting_times(T, [False, True]))
+    npt.assert_allclose([10, 1 + 0.3*10],
+                        analytics.first_passage_times(T, [False, True]))
+    #The powers of a board are kept until its matrix changes, also
+    #when the matrix is sparse
+    import scipy.sparse
+    board = mm.MonopolyBoard()
+    board.assign_dice()
+    powers = analytics.matrix_powers(board)
+    npt.assert_equal(True, powers is analytics.matrix_powers(board))
+    board.transition_matrix = scipy.sparse.csr_matrix(board.transition_matrix)
+    powers = analytics.matrix_powers(board)
+    npt.assert_equal(True, powers is analytics.matrix_powers(board))
+    npt.assert_allclose(board.transition_matrix.toarray(), powers.power(1))
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    #All starts at once agree with stepping one start
+    distributions = analytics.n_step_distributions(mb, np.arange(1, 201))
+    npt.assert_equal((200, 40, 40), distributions.shape)
+    npt.assert_allclose(1, distributions.sum(axis=2))
+    initial = np.zeros(len(mb.transition_matrix))
+    initial[5] = 1
+    npt.assert_allclose(mb._positions_from_states(
+        mm.markovchain.n_step_distribution(mb.transition_matrix, initial, 37)),
+                        distributions[36, 5], atol=1e-15)
+    npt.assert_allclose(distributions[36],
+                        analytics.n_step_distributions(mb, 37))
+    pi = mb.stationary_distribution()
+    npt.assert_allclose(pi, analytics.n_step_distributions(mb, 1000)[0],
+                        atol=1e-12)
+    #Kac's lemma
+    blue = np.flatnonzero(mb.groups == 7)
+    npt.assert_allclose(1/pi[blue].sum(),
+                        analytics.expected_return_times(mb, blue))
+    turns = analytics.expected_turns_to_land(mb, blue)
+    npt.assert_equal(40, len(turns))
+    #Just before the dark blues, they are a roll away
+    npt.assert_equal(True, turns[34] < turns[10])
+    return
+
+def test_rules():
+    from monopolymath.rules import Rules, evaluate_variants, rule_grid, \
+        sweep
+    dr = mm.DiceRoller()
+    with npt.assert_raises(Exception):
+        Rules(jail_strategy="bribe")
+    with npt.assert_raises(Exception):
+        Rules(go_to_jail_spaces=[40])
+    #The standard rules compile to the standard chain
+    npt.assert_allclose(mm.markovchain.transition_matrix(dr),
+                        Rules().transition_matrix(dr))
+    #Simulations by house rules agree with their transition matrices
+    variants = [Rules(jail_strategy="pay"),
+                Rules(max_doubles=2, jail_turns=2),
+                Rules(go_to_jail_spaces=[20]),
+                Rules(chance_cards=[("to", 0), None, ("back", 3)],
+                      community_chest_cards=[("to", 30), None])]
+    for rules in variants:
+        T = rules.transition_matrix(dr)
+        npt.assert_allclose(1, T.sum(axis=1))
+        mover = mm.BatchRollMover(dr, 10000, rng=np.random.default_rng(0),
+                                  rules=rules)
+        mover.run(20)
+        mover.space_visits[:] = 0
+        visits = mover.run(100)
+        npt.assert_allclose(rules.stationary_distribution(dr),
+                            visits/visits.sum(), atol=2e-3)
+    #Free parking sends players to jail, and nobody stays there
+    pi = variants[2].stationary_distribution(dr)
+    npt.assert_equal(0, pi[20])
+    npt.assert_equal(True, pi[30] > Rules().stationary_distribution(dr)[30])
+    #Boards use the rules for both moving and the transition matrix
+    mb = mm.MonopolyBoard()
+    mb.assign_dice(rules=variants[0])
+    npt.assert_allclose(variants[0].stationary_distribution(dr),
+                        mb.stationary_distribution())
+    #Sweeps
+    grid = rule_grid(max_doubles=[2, 3], jail_strategy=["wait", "pay"])
+    npt.assert_equal(4, len(grid))
+    distributions = sweep(dr, grid)
+    npt.assert_equal((4, 40), distributions.shape)
+    npt.assert_allclose(grid[3].stationary_distribution(dr),
+                        distributions[3])
+    simulated = sweep(dr, grid, number_of_players=2000, number_of_turns=50,
+                      seed=3)
+    npt.assert_allclose(distributions, simulated, atol=1e-2)
+    npt.assert_equal(simulated, sweep(dr, grid, number_of_players=2000,
+                                      number_of_turns=50, seed=3))
+    #Variants evaluated in this process
+    npt.assert_allclose(distributions, evaluate_variants(dr, grid))
+    return
+
+def test_variance():
+    from monopolymath import variance
+    from monopolymath.rules import Rules
+    dr = mm.DiceRoller()
+    with npt.assert_raises(Exception):
+        mm.BatchRollMover(dr, 3, antithetic=True)
+    #Antithetic players roll the mirror image of the dice
+    mover = mm.BatchRollMover(dr, 4, rng=np.random.default_rng(0),
+                              antithetic=True)
+    mover.update_positions()
+    npt.assert_equal(7, mover.dice[:, :2] + mover.dice[:, 2:])
+    npt.assert_equal(14, mover.roll_totals[:2] + mover.roll_totals[2:])
+    #Players all start on Go, not in jail
+    npt.assert_equal(np.zeros(4), variance.state_indices(
+        mm.BatchRollMover(dr, 4)))
+    #The control variate removes most of the noise, without a bias
+    pi = Rules().stationary_distribution(dr)
+    result = variance.estimate_frequencies(dr, number_of_players=1000,
+                                           number_of_batches=10,
+                                           turns_per_batch=20, seed=0)
+    npt.assert_equal(True, result["total_variance_reduction"] > 3)
+    npt.assert_array_less(np.abs(result["estimate"] - pi),
+                          5*result["standard_error"] + 1e-6)
+    #Differences of rule variants
+    rules = Rules(jail_strategy="pay")
+    exact = pi - rules.stationary_distribution(dr)
+    result = variance.compare(dr, rules_b=rules, number_of_players=1000,
+                              number_of_batches=10, turns_per_batch=20,
+                              seed=0, antithetic=True)
+    npt.assert_equal(True, result["total_variance_reduction"] > 3)
+    npt.assert_array_less(np.abs(result["estimate"] - exact),
+                          5*result["standard_error"] + 1e-6)
+    #Common random numbers make comparing a variant with itself exact
+    result = variance.compare(dr, number_of_players=100, number_of_batches=2,
+                              turns_per_batch=5, seed=0,
+                              control_variate=False)
+    npt.assert_equal(0, result["estimate"])
+    return
+
+def _cache_worker(directory, seed):
+    from monopolymath.cache import ResultCache
+    cache = ResultCache(directory, max_bytes=4000)
+    for i in np.random.default_rng(seed).integers(0, 8, 20):
+        value = cache.get_or_compute("range", lambda: np.arange(100.)*i, i)
+        npt.assert_equal(np.arange(100.)*i, value)
+    return
+
+def test_cache():
+    from concurrent.futures import ProcessPoolExecutor
+    from monopolymath.cache import ResultCache, fingerprint
+    from monopolymath.rules import Rules
+    dr = mm.DiceRoller()
+    #Keys depend on the definitions, not the objects
+    npt.assert_equal(fingerprint(dr, Rules()),
+                     fingerprint(mm.DiceRoller(), Rules()))
+    npt.assert_equal(False, fingerprint(dr, Rules()) ==
+                     fingerprint(dr, Rules(jail_strategy="pay")))
+    npt.assert_equal(False, fingerprint(dr) ==
+                     fingerprint(mm.DiceRoller(dice_array=[6, 6])))
+    with npt.assert_raises(Exception):
+        fingerprint(object())
+    with tempfile.TemporaryDirectory() as directory:
+        mb = mm.MonopolyBoard()
+        mb.assign_dice()
+        pi = mb.stationary_distribution()
+        cache = ResultCache(directory)
+        mb.assign_dice(cache=cache)
+        npt.assert_allclose(pi, mb.stationary_distribution())
+        npt.assert_equal(3, cache.misses)
+        #A new cache on the same directory finds everything on disk
+        cache = ResultCache(directory)
+        mb.assign_dice(cache=cache)
+        mb.stationary_distribution()
+        npt.assert_equal((3, 3, 0), (cache.hits, cache.disk_hits,
+                                     cache.misses))
+        npt.assert_equal(False, mb.transition_matrix.flags.writeable)
+        #Economics tables are cached by their inputs too
+        landing = mb.stationary_distribution()
+        rents = cache.get_or_compute(
+            "expected_rents", lambda: mm.economics.expected_rents(
+                mb, landing), mb, landing)
+        npt.assert_equal(mm.economics.expected_rents(mb, landing), rents)
+        #Least recently used results are evicted first
+        cache.clear()
+        npt.assert_equal(0, cache.disk_size())
+        small = ResultCache(directory, max_bytes=3000, memory_bytes=0)
+        for i in range(3):
+            small.put(fingerprint(i), np.full(100, float(i)))
+            os.utime(os.path.join(directory, fingerprint(i)+".npy"),
+                     (i, i))
+        small.get(fingerprint(0))
+        small.put(fingerprint(3), np.full(100, 3.))
+        npt.assert_equal(True, small.disk_size() <= 3000)
+        npt.assert_equal(None, small.get(fingerprint(1)))
+        npt.assert_equal(0, small.get(fingerprint(0)))
+        #Processes share a directory safely
+        with ProcessPoolExecutor(2) as executor:
+            for future in [executor.submit(_cache_worker, directory, seed)
+                           for seed in range(4)]:
+                future.result()
+    return
+
+def test_runner():
+    from monopolymath import runner
+    from monopolymath.rules import Rules
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sweep.json")
+        with open(path, "w") as f:
+            json.dump({"dice": [{}, {"dice_array": [4, 8]}],
+                       "rules": [{}, {"jail_strategy": "pay"}],
+                       "simulations": [None, {"players": 500, "turns": 20}],
+                       "seed": 1}, f)
+        spec = runner.load_spec(path)
+        jobs = runner.expand_jobs(spec)
+        npt.assert_equal(8, len(jobs))
+        output = os.path.join(directory, "results.npz")
+        #A checkpoint left by an earlier run is used rather than rerun
+        os.makedirs(output + ".checkpoints")
+        runner._save_checkpoint(output + ".checkpoints", 0,
+                                {"distribution": np.full(40, 0.025),
+                                 "seconds": 0.})
+        runner.main([path, "-o", output, "-w", "1", "-q"])
+        npt.assert_equal(False, os.path.exists(output + ".checkpoints"))
+        results = np.load(output)
+        npt.assert_equal((8, 40), results["distributions"].shape)
+        npt.assert_equal(0.025, results["distributions"][0])
+        npt.assert_equal([False, True]*4, ~results["exact"])
+        npt.assert_allclose(Rules(jail_strategy="pay").stationary_distribution(
+            mm.DiceRoller()), results["distributions"][2])
+        npt.assert_allclose(results["distributions"][2],
+                            results["distributions"][3], atol=2e-2)
+        npt.assert_equal(500, results["players"][3])
+        npt.assert_equal({"dice_array": [4, 8]},
+                         json.loads(str(results["dice"][4])))
+        #Simulated jobs are reproducible
+        arrays = runner.run_sweep(spec, os.path.join(directory, "again.npz"),
+                                  number_of_workers=1, progress=None)
+        npt.assert_equal(results["distributions"][1:],
+                         arrays["distributions"][1:])
+        #A failing job does not stop the others being saved, and a
+        #sweep without a seed keeps its entropy for resuming
+        spec = {"dice": [{}], "rules": [{}, {"jail_strategy": "bail"}],
+                "simulations": [{"players": 100, "turns": 5}],
+                "seed": None}
+        output = os.path.join(directory, "failing.npz")
+        with npt.assert_raises(Exception):
+            runner.run_sweep(spec, output, number_of_workers=1,
+                             progress=None)
+        checkpoints = output + ".checkpoints"
+        with open(os.path.join(checkpoints, runner.ENTROPY_FILE)) as f:
+            seed = np.random.SeedSequence(json.load(f))
+        saved = runner._load_checkpoint(checkpoints, 0)
+        npt.assert_equal(None, runner._load_checkpoint(checkpoints, 1))
+        job = runner.expand_jobs(spec)[0]
+        npt.assert_equal(runner.run_job(job, seed.spawn(2)[0])[
+            "distribution"], saved["distribution"])
+        with open(path, "w") as f:
+            json.dump({"dices": []}, f)
+        with npt.assert_raises(Exception):
+            runner.load_spec(path)
+    return
+
 def test_monopolyroller():
     dr = mm.DiceRoller()
     mr = mm.MonopolyRollMover(dr)
@@ -105,11 +737,387 @@ def test_monopolyroller():
             npt.assert_equal(True, 0 <= n <= 39)
             continue
         continue
+    #Larger boards use the whole board
+    from monopolymath.rules import Rules
+    mr = mm.MonopolyRollMover(dr, rules=Rules(number_of_spaces=60))
+    positions = [0]
+    for _ in range(2000):
+        positions.append(mr.update_position(positions[-1], 60))
+    npt.assert_equal(True, 40 < max(positions) <= 59)
+    return
+
+def test_batchrollmover():
+    dr = mm.DiceRoller()
+    br = mm.BatchRollMover(dr, 1000, rng=np.random.default_rng(0))
+    #Every player lands somewhere on the board each turn
+    for _ in range(100):
+        positions = br.update_positions()
+        npt.assert_equal(True, np.all((0 <= positions) & (positions <= 39)))
+        npt.assert_equal(True, np.all(br.in_jail == (positions == 30)))
+    npt.assert_equal(100*1000, br.space_visits.sum())
+    #The batch and scalar paths give the same landing distribution
+    np.random.seed(0)
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    for _ in range(20000):
+        mb.move_player()
+    scalar = mb.space_visits/mb.space_visits.sum()
+    batch = mb.move_players(2000, 100, rng=np.random.default_rng(1))
+    batch /= batch.sum()
+    npt.assert_allclose(scalar, batch, atol=0.005)
+    return
+
+def test_parallel():
+    dr = mm.DiceRoller()
+    #Reproducible for a given seed and number of workers
+    v1 = mm.parallel.simulate_parallel(dr, 3000, 50, seed=5,
+                                       number_of_workers=3)
+    v2 = mm.parallel.simulate_parallel(dr, 3000, 50, seed=5,
+                                       number_of_workers=3)
+    npt.assert_equal(v1, v2)
+    npt.assert_equal(3000*50, v1.sum())
+    npt.assert_equal([1000, 1000, 1000], mm.parallel.shard_sizes(3000, 3))
+    npt.assert_equal([3, 3, 2, 2], mm.parallel.shard_sizes(10, 4))
+    #A single worker runs in process and equals its one shard
+    v3 = mm.parallel.simulate_parallel(dr, 500, 50, seed=5,
+                                       number_of_workers=1)
+    seed = np.random.SeedSequence(5).spawn(1)[0]
+    mover = mm.BatchRollMover(dr, 500, rng=np.random.default_rng(seed))
+    npt.assert_equal(mover.run(50), v3)
+    #The scalar roller can also use its own generator
+    rolls = [mm.DiceRoller(rng=np.random.default_rng(7)).roll()[1]
+             for _ in range(2)]
+    npt.assert_equal(rolls[0], rolls[1])
+    return
+
+def test_transition_matrix():
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    #Every row of the transition matrix is a probability distribution
+    T = mb.transition_matrix
+    npt.assert_equal((123, 123), T.shape)
+    npt.assert_allclose(1., T.sum(axis=1))
+    npt.assert_equal(True, np.all(T >= 0))
+    #The direct and power iteration solutions agree
+    pi = mb.stationary_distribution()
+    npt.assert_allclose(1., pi.sum())
+    npt.assert_allclose(pi, mb.stationary_distribution("power"), atol=1e-10)
+    #Jail is the most visited space, and chance the least
+    npt.assert_equal(30, np.argmax(pi))
+    npt.assert_equal(36, np.argmin(pi))
+    #Moving via the matrix converges to the stationary distribution
+    for _ in range(200):
+        mb.move_player(via_roll=False)
+    npt.assert_allclose(pi, mb.position_vector, atol=1e-10)
+    npt.assert_allclose(201, mb.get_total_number_of_moves())
+    #The simulation agrees with the exact distribution
+    visits = mb.move_players(10000, 200, rng=np.random.default_rng(2))
+    npt.assert_allclose(pi, visits/visits.sum(), atol=0.001)
+    return
+
+def test_incremental():
+    from monopolymath import analytics, incremental
+    from monopolymath.cards import CHANCE_CARDS
+    from monopolymath.markovchain import stationary_distribution as stationary
+    from monopolymath.rules import Rules
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    chain = incremental.incremental_chain(mb)
+    npt.assert_equal(True, chain is incremental.incremental_chain(mb))
+    npt.assert_allclose(mb.stationary_distribution(),
+                        np.bincount(mb.state_positions, weights=chain.pi))
+    #Edits of a card or a go to jail space are of low rank
+    cards = list(CHANCE_CARDS)
+    cards[0] = ("to", 5)
+    edits = [Rules(chance_cards=cards), Rules(go_to_jail_spaces=[20]),
+             Rules(chance_cards=cards, community_chest_cards=[None])]
+    for rules in edits:
+        T = rules.transition_matrix(mb.diceroller)
+        npt.assert_allclose(stationary(T),
+                            chain.stationary_distribution(T), atol=1e-12)
+        npt.assert_allclose(rules.stationary_distribution(mb.diceroller),
+                            incremental.what_if(mb, rules), atol=1e-12)
+        npt.assert_allclose(stationary(T), chain.warm_start(T),
+                            atol=1e-9)
+    U, V = incremental.low_rank_factors(
+        edits[0].transition_matrix(mb.diceroller) - chain.T)
+    npt.assert_equal(True, U.shape[1] <= 6)
+    #Updates one after another, against solving from scratch
+    for rules in edits:
+        chain.update(rules.transition_matrix(mb.diceroller))
+    fresh = incremental.IncrementalChain(chain.T)
+    npt.assert_allclose(fresh.pi, chain.pi, atol=1e-12)
+    npt.assert_allclose(fresh.Z, chain.Z, atol=1e-10)
+    #Passage times from the fundamental matrix
+    targets = np.zeros(len(chain.T), dtype=bool)
+    targets[5] = True
+    npt.assert_allclose(analytics.first_passage_times(chain.T, targets),
+                        chain.mean_first_passage_times()[:, 5])
+    with npt.assert_raises(Exception):
+        incremental.what_if(mb, Rules(jail_strategy="pay"))
+    return
+def test_sensitivity():
+    from monopolymath import sensitivity
+    from monopolymath.cards import CHANCE_CARDS
+    from monopolymath.markovchain import stationary_distribution
+    from monopolymath.rules import Rules
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    jacobian = sensitivity.stationary_jacobian(mb)
+    npt.assert_equal((11, 40), jacobian["rolls"].shape)
+    npt.assert_equal((16, 40), jacobian["chance"].shape)
+    npt.assert_equal((16, 40), jacobian["community_chest"].shape)
+    npt.assert_equal(np.arange(2, 13), jacobian["roll_totals"])
+    #The probabilities still sum to one
+    npt.assert_allclose(0, jacobian["rolls"].sum(axis=1), atol=1e-12)
+    #Against finite differences
+    T = mb.transition_matrix
+    directions = sensitivity.roll_directions(mb)
+    epsilon = 1e-6
+    difference = (stationary_distribution(T + epsilon*directions[5]) -
+                  stationary_distribution(T - epsilon*directions[5]))
+    npt.assert_allclose(mb._positions_from_states(difference)/(2*epsilon),
+                        jacobian["rolls"][5], atol=1e-7)
+    #One more Go card in a deck of 17 is a step of 1/17 towards it
+    rules = Rules(chance_cards=CHANCE_CARDS + [CHANCE_CARDS[0]])
+    change = rules.stationary_distribution(mb.diceroller) - \
+        mb.stationary_distribution()
+    npt.assert_allclose(change, jacobian["chance"][0]/17, atol=1e-4)
+    return
+
+def test_jumps():
+    from monopolymath.analytics import hitting_times
+    from monopolymath.board import Board
+    from monopolymath.markovchain import roll_matrix
+    from monopolymath.rules import Rules
+    dr = mm.DiceRoller()
+    #The Monopoly board: card spaces are random jumps
+    rules = Rules()
+    chance, community_chest = rules.card_tables()
+    table = Board(40).jump_table()
+    for deck in [chance, community_chest]:
+        for space in np.flatnonzero((deck != np.arange(40)[:, None]).any(
+                axis=1)):
+            table.random_jump(space, deck[space])
+    rolls = roll_matrix(dr.probability_array(), dr.minimum_roll(), 40)
+    npt.assert_allclose(rolls @ rules.action_matrix(),
+                        table.transition_matrix(dr), atol=1e-12)
+    #The simulator agrees with the exact matrix
+    visits, _ = table.simulate(dr, 5000, 40, np.random.default_rng(1))
+    npt.assert_allclose(table.stationary_distribution(dr),
+                        visits/visits.sum(), atol=3e-3)
+    #Snakes and ladders on 30 spaces, ending on exactly the last one
+    board = Board(30, ["s%d"%i for i in range(30)])
+    die = mm.DiceRoller(number=1)
+    table = board.jump_table("stay")
+    table.teleport("s3", 21).teleport(8, 16).teleport(16, 26)
+    table.teleport(27, 1).teleport(19, 7)
+    T = table.transition_matrix(die)
+    npt.assert_allclose(1, T.sum(axis=1))
+    npt.assert_equal(26, table.compile(die)[0][2, 5])
+    npt.assert_allclose(1, T[29, 29])
+    steps = hitting_times(T, np.arange(30) == 29)
+    npt.assert_equal(True, np.isfinite(steps[0]) and steps[0] > 5)
+    _, position = table.simulate(die, 4000, 60, np.random.default_rng(2))
+    finished = np.mean(position == 29)
+    npt.assert_allclose(np.linalg.matrix_power(T, 60)[0, 29], finished,
+                        atol=0.03)
+    #A ladder from 4 only taken with a roll of 4; clipping at the end
+    table = Board(10).jump_table("clip")
+    table.conditional_jump(4, 9, [4])
+    moves = table.compile(die)[0]
+    npt.assert_equal(9, moves[0, 3])
+    npt.assert_equal(4, moves[1, 2])
+    npt.assert_equal(9, moves[8, 5])
+    #Rolling again from space 2, at most twice a turn
+    for max_rolls in [None, 2]:
+        table = Board(12).jump_table(max_rolls=max_rolls)
+        table.roll_again(2)
+        T = table.transition_matrix(die)
+        npt.assert_allclose(1, T.sum(axis=1))
+        #Straight to 4, or by way of 2
+        npt.assert_allclose(1/6 + 1/36, T[0, 4])
+        visits, _ = table.simulate(die, 4000, 30, np.random.default_rng(3))
+        npt.assert_allclose(table.stationary_distribution(die),
+                            visits/visits.sum(), atol=5e-3)
+    #Only the turns that reach 2 with the last roll end there
+    npt.assert_equal(0, T[2:8, 2])
+    #Loops and spaces that are not on the board
+    with npt.assert_raises(Exception):
+        Board(10).jump_table().teleport(1, 2).teleport(2, 1).compile(die)
+    #Rolling again on every space never ends a turn, unless limited
+    table = Board(6).jump_table()
+    for space in range(6):
+        table.roll_again(space)
+    with npt.assert_raises(Exception):
+        table.simulate(die, 10, 1)
+    with npt.assert_raises(Exception):
+        table.transition_matrix(die)
+    table = Board(6).jump_table(max_rolls=3)
+    for space in range(6):
+        table.roll_again(space)
+    npt.assert_allclose(1/6, table.transition_matrix(die))
+    with npt.assert_raises(Exception):
+        Board(10).jump_table().teleport(1, 10)
+    with npt.assert_raises(Exception):
+        Board(10).jump_table().random_jump(1, [2, 3], [0.5, 0.6])
+    with npt.assert_raises(Exception):
+        Board(10).jump_table(overshoot="bounce")
+    return
+
+def test_convergence():
+    from monopolymath.convergence import ConvergenceMonitor, run_until_converged
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    pi = mb.stationary_distribution()
+    monitor = run_until_converged(mb.diceroller, tolerance=2e-3,
+                                  number_of_players=2000,
+                                  rng=np.random.default_rng(4))
+    npt.assert_equal(True, monitor.converged())
+    npt.assert_equal(True, np.all(monitor.half_widths() <= 2e-3))
+    npt.assert_allclose(pi, monitor.frequencies(), atol=2e-3)
+    ess = monitor.effective_sample_size()
+    npt.assert_equal(True, np.all((0 < ess) & np.isfinite(ess)))
+    #Nothing is trusted before enough batches
+    monitor = ConvergenceMonitor(tolerance=1.)
+    npt.assert_equal(False, monitor.update(np.ones(40)))
+    npt.assert_equal(np.inf, monitor.half_widths()[0])
+    with npt.assert_raises(Exception):
+        monitor.update(np.zeros(40))
+    #House rules
+    from monopolymath.rules import Rules
+    rules = Rules(jail_strategy="pay")
+    monitor = run_until_converged(mb.diceroller, tolerance=2e-3,
+                                  number_of_players=2000,
+                                  rng=np.random.default_rng(5), rules=rules)
+    npt.assert_allclose(rules.stationary_distribution(mb.diceroller),
+                        monitor.frequencies(), atol=2e-3)
+    return
+
+def test_roll_matrix():
+    dr = mm.DiceRoller()
+    p = dr.probability_array()
+    #Compare to filling the matrix one entry at a time, including
+    #boards shorter than the longest roll
+    for N in [5, 40]:
+        R = np.zeros((N, N))
+        for i in range(N):
+            for j in range(len(p)):
+                R[i, (i+j+2)%N] += p[j]
+        b = mm.board.Board(N)
+        npt.assert_allclose(R, b.compute_roll_matrix(dr))
+        npt.assert_allclose(R, b.compute_roll_matrix(dr, sparse=True).toarray())
+    #Large boards are sparse by default and can be solved without
+    #ever making them dense
+    N = 20000
+    R = mm.board.Board(N).compute_roll_matrix(dr)
+    npt.assert_equal(False, isinstance(R, np.ndarray))
+    npt.assert_equal(N*len(p), R.nnz)
+    pi = mm.markovchain.stationary_distribution(R)
+    npt.assert_allclose(np.ones(N)/N, pi)
+    v = np.zeros(N)
+    v[0] = 1
+    v = mm.markovchain.n_step_distribution(R, v, 2)
+    npt.assert_allclose(1., v.sum())
+    npt.assert_allclose(p[0]**2, v[4]) #double ones twice
+    #The sparse solver agrees with the dense one
+    mb = mm.MonopolyBoard()
+    mb.assign_dice()
+    T = mb.transition_matrix
+    import scipy.sparse
+    npt.assert_allclose(mm.markovchain.stationary_distribution(T),
+        mm.markovchain.stationary_distribution(scipy.sparse.csr_matrix(T)))
+    return
+
+def test_cards():
+    chance, community_chest = mm.cards.card_tables()
+    npt.assert_equal((40, 16), chance.shape)
+    #Nearest railroad and utility, back 3 spaces and go to jail
+    npt.assert_equal([5, 25, 35], chance[[7, 22, 36], 4])
+    npt.assert_equal([12, 28, 28], chance[[7, 22, 36], 3])
+    npt.assert_equal([4, 19, 33], chance[[7, 22, 36], 7])
+    npt.assert_equal(30, community_chest[17, 5])
+    npt.assert_equal(np.arange(40), chance[:, 9])
+    #Cards moving forward past Go, but not to jail or backwards
+    from monopolymath.rules import Rules
+    passes, _ = Rules().card_passes_go_tables()
+    npt.assert_equal([True, True, True, False, False, False, False, False],
+                     passes[36, [0, 1, 2, 3, 4, 7, 8, 12]])
+    npt.assert_equal([True, True, True], passes[[7, 22, 36], 11])
+    for shuffled_decks in [False, True]:
+        mover = mm.BatchRollMover(mm.DiceRoller(), 2000,
+                                  rng=np.random.default_rng(4),
+                                  shuffled_decks=shuffled_decks)
+        mover.position[:] = 26
+        for _ in range(3):
+            mover.update_positions()
+            drawn, _ = mover.card_draws()
+            forward = passes[mover._card_draws[0], np.maximum(drawn, 0)] & \
+                (drawn >= 0)
+            npt.assert_equal(True, forward.any())
+            npt.assert_equal(True, np.all(mover.passed_go[forward]))
+    C = mm.cards.table_matrix(chance)
+    npt.assert_allclose(1., C.sum(axis=1))
+    npt.assert_allclose(7./16, C[7, 7])
+    #A shuffled deck deals every card once per pass
+    deck = mm.cards.CardDeck(shuffled=True)
+    npt.assert_equal(np.arange(16), np.sort([deck.draw() for _ in range(16)]))
+    deck = mm.cards.CardDeck(shuffled=True, number_of_players=100,
+                             rng=np.random.default_rng(0))
+    drawing = np.arange(100) < 50
+    first = deck.draw(drawing)
+    cards = np.array([deck.draw() for _ in range(15)])
+    npt.assert_equal(first[50:], cards[0, 50:])
+    npt.assert_equal(np.arange(16), np.sort(np.vstack([first, cards])[:, 0]))
+    #Shuffled decks land the same on average
+    np.random.seed(1)
+    mb = mm.MonopolyBoard()
+    mb.assign_dice(shuffled_decks=True)
+    for _ in range(5000):
+        mb.move_player()
+    pi = mb.stationary_distribution()
+    visits = mb.move_players(5000, 200, rng=np.random.default_rng(3),
+                             shuffled_decks=True)
+    npt.assert_allclose(pi, visits/visits.sum(), atol=0.002)
+    return
+
+def test_property_data():
+    data = mm.monopolyboard.load_property_data()
+    npt.assert_equal((22, 10), data.shape)
+    #Loaded once and shared by every board
+    npt.assert_equal(True, data is mm.monopolyboard.load_property_data())
+    npt.assert_equal(True, data is mm.monopolyboard.property_data)
+    with tempfile.TemporaryDirectory() as directory:
+        path = mm.monopolyboard.compile_property_data(directory+"/data.npy")
+        npt.assert_equal(data, np.load(path))
     return
 
 if __name__ == "__main__":
     test_diceroller_exceptions()
     test_diceroller_without_dice_array()
     test_diceroller_with_dice_array()
+    test_diceroller_buffered()
+    test_diceroller_probability_array()
     test_monopolyboard()
+    test_monopolyboard_columns()
+    test_economics()
+    test_gamesimulator()
+    test_decisions()
     test_monopolyroller()
+    test_batchrollmover()
+    test_instrumentation()
+    test_trajectory()
+    test_parallel()
+    test_transition_matrix()
+    test_rules()
+    test_variance()
+    test_runner()
+    test_cache()
+    test_analytics()
+    test_incremental()
+    test_sensitivity()
+    test_jumps()
+    test_convergence()
+    test_roll_matrix()
+    test_cards()
+    test_property_data()